@@ -55,6 +55,7 @@ setup(
     install_requires=['boto3>=1.28.60', 'numpy>=1.24.4', 'six>=1.16.0',
                       'retrying>=1.3.4', 'scipy>=1.10.1', 'psutil>=5.9.5'],
     extras_require={
+        'orjson': ['orjson>=3.8.3'],
         'test': ['coverage==7.3.2', 'docker-compose==1.29.2', 'flake8==6.1.0', 'Flask==3.0.0',
                  'mock==5.1.0', 'pytest==7.4.2', 'pytest-cov==4.1.0', 'pytest-xdist==3.3.1',
                  'PyYAML==5.4.1', 'sagemaker==2.125.0', 'requests==2.31.0',
@@ -19,4 +19,5 @@ OCTET_STREAM = "application/octet-stream"
 ANY = "*/*"
 NPY = "application/x-npy"
 NPZ = "application/x-npz"
+SAFETENSORS = "application/x-safetensors"
 UTF8_TYPES = [JSON, CSV]
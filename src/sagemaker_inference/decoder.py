@@ -15,17 +15,44 @@ files and objects to NumPy arrays."""
 from __future__ import absolute_import
 
 import json
+import struct
 
 import numpy as np
-import scipy.sparse
 from six import BytesIO, StringIO
 
 from sagemaker_inference import content_types, errors
 
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+
+def _stdlib_json_loads(string_like):  # type: (object) -> object
+    """Deserialize a JSON document with the standard library ``json`` module."""
+    return json.loads(string_like)
+
+
+def _orjson_loads(string_like):  # type: (object) -> object
+    """Deserialize a JSON document with ``orjson``, falling back to the standard library
+    for documents orjson does not accept, such as ``NaN`` and ``Infinity`` literals.
+    """
+    try:
+        return orjson.loads(string_like)
+    except orjson.JSONDecodeError:
+        return json.loads(string_like)
+
+
+_json_loads = _orjson_loads if orjson is not None else _stdlib_json_loads
+
 
 def _json_to_numpy(string_like, dtype=None):  # type: (str) -> np.array
     """Convert a JSON object to a numpy array.
 
+    The JSON document is parsed with orjson when it is installed, and with the
+    standard library ``json`` module otherwise. When ``dtype`` is given, the
+    parsed lists are converted directly to a contiguous array of that type.
+
     Args:
         string_like (str): JSON string.
         dtype (dtype, optional):  Data type of the resulting array.
@@ -37,13 +64,18 @@ def _json_to_numpy(string_like, dtype=None):  # type: (str) -> np.array
     Returns:
         (np.array): numpy array
     """
-    data = json.loads(string_like)
+    data = _json_loads(string_like)
     return np.array(data, dtype=dtype)
 
 
 def _csv_to_numpy(string_like, dtype=None):  # type: (str) -> np.array
     """Convert a CSV object to a numpy array.
 
+    When ``dtype`` is given, the CSV is first parsed as strictly numeric data
+    with ``np.loadtxt``, which parses in C directly into an array of that type.
+    Input it rejects, such as rows with missing or non-numeric values, is
+    parsed with ``np.genfromtxt``.
+
     Args:
         string_like (str): CSV string.
         dtype (dtype, optional):  Data type of the resulting array. If None,
@@ -54,19 +86,59 @@ def _csv_to_numpy(string_like, dtype=None):  # type: (str) -> np.array
     Returns:
         (np.array): numpy array
     """
+    if dtype is not None:
+        try:
+            return np.loadtxt(StringIO(string_like), dtype=dtype, delimiter=",")
+        except ValueError:
+            pass
     stream = StringIO(string_like)
     return np.genfromtxt(stream, dtype=dtype, delimiter=",")
 
 
+_NPY_HEADER_READERS = {
+    (1, 0): (np.lib.format.read_array_header_1_0, "<H"),
+    (2, 0): (np.lib.format.read_array_header_2_0, "<I"),
+}
+
+
 def _npy_to_numpy(npy_array):  # type: (object) -> np.array
     """Convert a NPY array into numpy.
 
+    The NPY header is parsed directly and the array is returned as a view over
+    the payload, without copying it. The array is read-only if the payload is
+    immutable (e.g. ``bytes``). Arrays of object dtype, which are pickled, and
+    unknown NPY format versions are loaded with ``np.load``.
+
     Args:
         npy_array (npy array): to be converted to numpy array
 
     Returns:
         (np.array): converted numpy array.
     """
+    try:
+        buffer = memoryview(npy_array)
+    except TypeError:
+        return _load_npy(npy_array)
+
+    magic_length = np.lib.format.MAGIC_LEN
+    version = np.lib.format.read_magic(BytesIO(buffer[:magic_length].tobytes()))
+    if version not in _NPY_HEADER_READERS:
+        return _load_npy(npy_array)
+
+    read_array_header, header_length_format = _NPY_HEADER_READERS[version]
+    header_start = magic_length + struct.calcsize(header_length_format)
+    (header_length,) = struct.unpack(header_length_format, buffer[magic_length:header_start])
+    offset = header_start + header_length
+    shape, fortran_order, dtype = read_array_header(BytesIO(buffer[magic_length:offset].tobytes()))
+    if dtype.hasobject:
+        return _load_npy(npy_array)
+
+    array = np.frombuffer(buffer, dtype=dtype, count=int(np.prod(shape)), offset=offset)
+    return array.reshape(shape, order="F" if fortran_order else "C")
+
+
+def _load_npy(npy_array):  # type: (object) -> np.array
+    """Load a NPY array with ``np.load``, which copies the payload."""
     stream = BytesIO(npy_array)
     return np.load(stream, allow_pickle=True)
 
@@ -80,30 +152,93 @@ def _npz_to_sparse(npz_bytes):  # type: (object) -> scipy.sparse.spmatrix
     Returns:
         (scipy.sparse.spmatrix): A sparse matrix.
     """
+    # scipy is imported on first use, so that workers which never decode NPZ do not load it.
+    import scipy.sparse  # pylint: disable=import-outside-toplevel
+
     buffer = BytesIO(npz_bytes)
     return scipy.sparse.load_npz(buffer)
 
 
+_SAFETENSORS_DTYPES = {
+    "F64": np.dtype("<f8"),
+    "F32": np.dtype("<f4"),
+    "F16": np.dtype("<f2"),
+    "I64": np.dtype("<i8"),
+    "I32": np.dtype("<i4"),
+    "I16": np.dtype("<i2"),
+    "I8": np.dtype("i1"),
+    "U64": np.dtype("<u8"),
+    "U32": np.dtype("<u4"),
+    "U16": np.dtype("<u2"),
+    "U8": np.dtype("u1"),
+    "BOOL": np.dtype("?"),
+}
+
+
+def _safetensors_to_numpy(safetensors):  # type: (object) -> dict
+    """Convert a payload in the safetensors format to a dict of numpy arrays.
+
+    The payload is a little-endian 64-bit header size, a JSON header giving the
+    dtype, shape and data offsets of each named tensor, and the raw tensor data.
+    The arrays are views over the payload, without copying it.
+
+    Args:
+        safetensors (object): Bytes encoding named tensors in the safetensors format.
+
+    Returns:
+        (dict): numpy arrays by tensor name.
+    """
+    buffer = memoryview(safetensors)
+    (header_length,) = struct.unpack("<Q", buffer[:8])
+    data_start = 8 + header_length
+    if data_start > len(buffer):
+        raise ValueError("Invalid safetensors header size: {}".format(header_length))
+    header = json.loads(buffer[8:data_start].tobytes())
+
+    arrays = {}
+    for name, tensor_info in header.items():
+        if name == "__metadata__":
+            continue
+        dtype = _SAFETENSORS_DTYPES.get(tensor_info["dtype"])
+        if dtype is None:
+            raise ValueError(
+                "Unsupported safetensors dtype {} for tensor {}".format(tensor_info["dtype"], name)
+            )
+        shape = tuple(tensor_info["shape"])
+        begin, end = tensor_info["data_offsets"]
+        count = int(np.prod(shape))
+        if end - begin != count * dtype.itemsize:
+            raise ValueError("Invalid safetensors data offsets for tensor {}".format(name))
+        array = np.frombuffer(buffer, dtype=dtype, count=count, offset=data_start + begin)
+        arrays[name] = array.reshape(shape)
+    return arrays
+
+
 _decoder_map = {
     content_types.NPY: _npy_to_numpy,
     content_types.CSV: _csv_to_numpy,
     content_types.JSON: _json_to_numpy,
     content_types.NPZ: _npz_to_sparse,
+    content_types.SAFETENSORS: _safetensors_to_numpy,
 }
 
 
-def decode(obj, content_type):
+def decode(obj, content_type, dtype=None):
     """Decode an object that is encoded as one of the default content types.
 
     Args:
         obj (object): to be decoded.
         content_type (str): content type to be used.
+        dtype (dtype, optional): data type of the resulting array. Only supported
+            for the JSON and CSV content types.
 
     Returns:
         object: decoded object for prediction.
     """
     try:
         decoder = _decoder_map[content_type]
-        return decoder(obj)
     except KeyError:
         raise errors.UnsupportedFormatError(content_type)
+    if dtype is None:
+        return decoder(obj)
+    return decoder(obj, dtype=dtype)
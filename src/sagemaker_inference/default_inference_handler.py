@@ -43,6 +43,19 @@ class DefaultInferenceHandler(object):
             )
         )
 
+    def default_post_model_fn(self, model, context=None):  # pylint: disable=no-self-use
+        """Function responsible for preparing the model for inference, once, after it is loaded.
+
+        Args:
+            model (obj): model loaded by the model_fn.
+            context (obj): the request context (default: None).
+
+        Returns:
+            obj: the model ready for predictions.
+
+        """
+        return model
+
     def default_input_fn(self, input_data, content_type, context=None):
         # pylint: disable=unused-argument, no-self-use
         """Function responsible for deserializing the input data into an object for prediction.
@@ -14,12 +14,20 @@
 to various types of objects and files."""
 from __future__ import absolute_import
 
+import functools
 import json
+import os
+import struct
 
 import numpy as np
 from six import BytesIO, StringIO
 
-from sagemaker_inference import content_types, errors
+from sagemaker_inference import content_types, errors, parameters
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
 
 
 def _array_to_json(array_like):
@@ -44,12 +52,70 @@ def _array_to_json(array_like):
     return json.dumps(array_like, default=default)
 
 
+def _array_to_json_bytes(array_like):
+    """Convert an array-like object to JSON encoded in UTF-8.
+
+    numpy arrays, and tensors providing ``detach().cpu().numpy()``, are serialized
+    straight from their buffer with orjson when it is installed, without creating a
+    Python object per element. Floating point arrays holding NaN or infinity, which
+    orjson would serialize as ``null``, are serialized with ``_array_to_json`` instead,
+    as ``NaN``, ``Infinity`` and ``-Infinity``, whether orjson is installed or not. If
+    SAGEMAKER_JSON_FLOAT_PRECISION is set, floating point arrays are rounded to that
+    number of decimals. Other objects are serialized with ``_array_to_json``.
+
+    Args:
+        array_like (np.array or Iterable or int or float): array-like object
+            to be converted to JSON.
+
+    Returns:
+        (bytes): object serialized to JSON
+    """
+    array_like = _to_numpy(array_like)
+    if isinstance(array_like, np.ndarray):
+        float_precision = os.environ.get(parameters.JSON_FLOAT_PRECISION_ENV)
+        if float_precision and array_like.dtype.kind == "f":
+            array_like = np.round(array_like, int(float_precision))
+        if (
+            orjson is not None
+            and not array_like.dtype.hasobject
+            and (array_like.dtype.kind != "f" or np.isfinite(array_like).all())
+        ):
+            if not array_like.flags.c_contiguous:
+                array_like = array_like.copy(order="C")
+            return orjson.dumps(
+                array_like, default=_orjson_default, option=orjson.OPT_SERIALIZE_NUMPY
+            )
+
+    return _array_to_json(array_like).encode("utf-8")
+
+
+def _orjson_default(obj):
+    """Serialize the numpy arrays and scalars orjson does not support natively."""
+    if hasattr(obj, "tolist"):
+        return obj.tolist()
+    raise TypeError("Object of type {} is not JSON serializable".format(type(obj).__name__))
+
+
+def _to_numpy(array_like):
+    """Convert a tensor providing ``detach().cpu().numpy()``, such as a PyTorch tensor,
+    to a numpy array. Other objects are returned unchanged.
+    """
+    if hasattr(array_like, "detach") and hasattr(array_like, "numpy"):
+        return array_like.detach().cpu().numpy()
+    return array_like
+
+
 def _array_to_npy(array_like):
     """Convert an array-like object to the NPY format.
 
     To understand better what an array-like object is see:
     https://docs.scipy.org/doc/numpy/user/basics.creation.html#converting-python-array-like-objects-to-numpy-arrays
 
+    The array data is copied once, straight into the response buffer after a NPY
+    header cached per dtype, memory layout and shape. Tensors providing
+    ``detach().cpu().numpy()`` are converted to numpy first. Arrays of object dtype
+    are pickled with ``np.save``.
+
     Args:
         array_like (np.array or Iterable or int or float): array-like object
             to be converted to NPY.
@@ -57,11 +123,114 @@ def _array_to_npy(array_like):
     Returns:
         (obj): NPY array.
     """
+    array = np.asarray(_to_numpy(array_like))
+    if array.dtype.hasobject:
+        buffer = BytesIO()
+        np.save(buffer, array)
+        return buffer.getvalue()
+
+    fortran_order = array.flags.f_contiguous and not array.flags.c_contiguous
+    header = _npy_header(array.dtype, fortran_order, array.shape)
+    npy = bytearray(len(header) + array.nbytes)
+    npy[: len(header)] = header
+    np.ndarray(
+        array.shape,
+        dtype=array.dtype,
+        buffer=npy,
+        offset=len(header),
+        order="F" if fortran_order else "C",
+    )[...] = array
+    return npy
+
+
+@functools.lru_cache(maxsize=256)
+def _npy_header(dtype, fortran_order, shape):
+    """Build the NPY header of an array with the given dtype, memory layout and shape."""
+    header = {
+        "descr": np.lib.format.dtype_to_descr(dtype),
+        "fortran_order": fortran_order,
+        "shape": shape,
+    }
     buffer = BytesIO()
-    np.save(buffer, array_like)
+    try:
+        np.lib.format.write_array_header_1_0(buffer, header)
+    except ValueError:
+        np.lib.format.write_array_header_2_0(buffer, header)
     return buffer.getvalue()
 
 
+_SAFETENSORS_DTYPE_NAMES = {
+    np.dtype("<f8"): "F64",
+    np.dtype("<f4"): "F32",
+    np.dtype("<f2"): "F16",
+    np.dtype("<i8"): "I64",
+    np.dtype("<i4"): "I32",
+    np.dtype("<i2"): "I16",
+    np.dtype("i1"): "I8",
+    np.dtype("<u8"): "U64",
+    np.dtype("<u4"): "U32",
+    np.dtype("<u2"): "U16",
+    np.dtype("u1"): "U8",
+    np.dtype("?"): "BOOL",
+}
+
+
+def _array_to_safetensors(array_like):
+    """Convert array-like objects to the safetensors format.
+
+    A dict is encoded as tensors named by its keys, a tuple as tensors named
+    ``output_0``, ``output_1``, ..., and any other array-like object as a tensor
+    named ``output``. Tensors are laid out by decreasing item size, so that each
+    one is aligned on its item size, and their data is copied once.
+
+    Args:
+        array_like (dict or tuple or np.array or Iterable or int or float):
+            array-like objects to be converted to the safetensors format.
+
+    Returns:
+        (bytearray): named tensors in the safetensors format.
+    """
+    if isinstance(array_like, dict):
+        named_arrays = array_like.items()
+    elif isinstance(array_like, tuple):
+        named_arrays = (("output_{}".format(i), array) for i, array in enumerate(array_like))
+    else:
+        named_arrays = [("output", array_like)]
+
+    arrays = {}
+    for name, array in named_arrays:
+        array = np.asarray(_to_numpy(array))
+        if array.dtype.byteorder == ">":
+            array = array.astype(array.dtype.newbyteorder("<"))
+        if array.dtype not in _SAFETENSORS_DTYPE_NAMES:
+            raise ValueError("Unsupported dtype {} for safetensors tensor {}".format(array.dtype, name))
+        arrays[str(name)] = array
+
+    names = sorted(arrays, key=lambda name: (-arrays[name].dtype.itemsize, name))
+    header = {}
+    data_length = 0
+    for name in names:
+        array = arrays[name]
+        header[name] = {
+            "dtype": _SAFETENSORS_DTYPE_NAMES[array.dtype],
+            "shape": list(array.shape),
+            "data_offsets": [data_length, data_length + array.nbytes],
+        }
+        data_length += array.nbytes
+
+    header_bytes = json.dumps(header, separators=(",", ":")).encode("utf-8")
+    header_bytes += b" " * (-len(header_bytes) % 8)
+    data_start = 8 + len(header_bytes)
+    safetensors = bytearray(data_start + data_length)
+    struct.pack_into("<Q", safetensors, 0, len(header_bytes))
+    safetensors[8:data_start] = header_bytes
+    for name in names:
+        array = arrays[name]
+        offset = data_start + header[name]["data_offsets"][0]
+        np.ndarray(array.shape, dtype=array.dtype, buffer=safetensors, offset=offset)[...] = array
+    return safetensors
+
+
 def _array_to_csv(array_like):
     """Convert an array-like object to CSV.
 
@@ -83,7 +252,8 @@ def _array_to_csv(array_like):
 _encoder_map = {
     content_types.NPY: _array_to_npy,
     content_types.CSV: _array_to_csv,
-    content_types.JSON: _array_to_json,
+    content_types.JSON: _array_to_json_bytes,
+    content_types.SAFETENSORS: _array_to_safetensors,
 }
 
 
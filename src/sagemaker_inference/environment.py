@@ -16,13 +16,15 @@ characteristics, environment variables and configuration settings.
 from __future__ import absolute_import
 
 import os
-from typing import Optional
+from typing import List, Optional, Tuple
 
 from sagemaker_inference import content_types, parameters
 
 DEFAULT_MODULE_NAME = "inference.py"
 DEFAULT_MODEL_SERVER_TIMEOUT = "60"
 DEFAULT_HTTP_PORT = "8080"
+DEFAULT_WARMUP_INPUT_DTYPE = "float32"
+DEFAULT_WARMUP_BATCH_SIZES = "1"
 
 SAGEMAKER_BASE_PATH = os.path.join("/opt", "ml")  # type: str
 
@@ -59,6 +61,12 @@ class Environment(object):
         safe_port_range (str): HTTP port range that can be used by customers to avoid collisions
             with the HTTP port specified by SageMaker for handling pings and invocations.
             For example: 1111-2222
+        batched_inference (bool): Whether requests batched by the model server should be
+            predicted together in a single call. Default is False.
+        warmup_input_shapes (list[tuple]): Shapes of the synthetic inputs used to warm up the
+            model, without the batch dimension. For example: 3,224,224;128
+        warmup_input_dtype (str): Data type of the synthetic warmup inputs. Default is float32.
+        warmup_batch_sizes (list[int]): Batch sizes the model is warmed up with. Default is 1.
 
     """
 
@@ -76,6 +84,16 @@ class Environment(object):
         self._inference_http_port = os.environ.get(parameters.BIND_TO_PORT_ENV, DEFAULT_HTTP_PORT)
         self._management_http_port = os.environ.get(parameters.BIND_TO_PORT_ENV, DEFAULT_HTTP_PORT)
         self._safe_port_range = os.environ.get(parameters.SAFE_PORT_RANGE_ENV)
+        self._batched_inference = (
+            os.environ.get(parameters.BATCHED_INFERENCE_ENV, "false") == "true"
+        )
+        self._warmup_input_shapes = os.environ.get(parameters.WARMUP_INPUT_SHAPES_ENV, "")
+        self._warmup_input_dtype = os.environ.get(
+            parameters.WARMUP_INPUT_DTYPE_ENV, DEFAULT_WARMUP_INPUT_DTYPE
+        )
+        self._warmup_batch_sizes = os.environ.get(
+            parameters.WARMUP_BATCH_SIZES_ENV, DEFAULT_WARMUP_BATCH_SIZES
+        )
 
     @staticmethod
     def _parse_module_name(program_param):
@@ -131,3 +149,29 @@ class Environment(object):
         specified by SageMaker for handling pings and invocations.
         """
         return self._safe_port_range
+
+    @property
+    def batched_inference(self) -> bool:
+        """bool: Whether requests batched by the model server are predicted in a single call."""
+        return self._batched_inference
+
+    @property
+    def warmup_input_shapes(self) -> List[Tuple[int, ...]]:
+        """list[tuple]: Shapes of the synthetic warmup inputs, without the batch dimension,
+        given as semicolon-separated lists of comma-separated dimensions.
+        """
+        return [
+            tuple(int(dim) for dim in shape.split(",") if dim.strip())
+            for shape in self._warmup_input_shapes.split(";")
+            if shape.strip()
+        ]
+
+    @property
+    def warmup_input_dtype(self) -> str:
+        """str: Data type of the synthetic warmup inputs."""
+        return self._warmup_input_dtype
+
+    @property
+    def warmup_batch_sizes(self) -> List[int]:
+        """list[int]: Batch sizes the model is warmed up with, given as a comma-separated list."""
+        return [int(size) for size in self._warmup_batch_sizes.split(",") if size.strip()]
@@ -19,8 +19,6 @@ import re
 import subprocess
 import sys
 
-import boto3
-
 from sagemaker_inference import logging
 from sagemaker_inference.environment import code_dir
 
@@ -72,6 +70,9 @@ def _get_codeartifact_index():
         repository,
         region,
     )
+    # boto3 is imported on first use, as it is only needed with CodeArtifact.
+    import boto3  # pylint: disable=import-outside-toplevel
+
     try:
         client = boto3.client("codeartifact", region_name=region)
         auth_token_response = client.get_authorization_token(domain=domain, domainOwner=owner)
@@ -23,3 +23,8 @@ MODEL_SERVER_TIMEOUT_ENV = "SAGEMAKER_MODEL_SERVER_TIMEOUT"  # type: str
 BIND_TO_PORT_ENV = "SAGEMAKER_BIND_TO_PORT"  # type: str
 SAFE_PORT_RANGE_ENV = "SAGEMAKER_SAFE_PORT_RANGE"  # type: str
 MULTI_MODEL_ENV = "SAGEMAKER_MULTI_MODEL"  # type: str
+BATCHED_INFERENCE_ENV = "SAGEMAKER_BATCHED_INFERENCE"  # type: str
+JSON_FLOAT_PRECISION_ENV = "SAGEMAKER_JSON_FLOAT_PRECISION"  # type: str
+WARMUP_INPUT_SHAPES_ENV = "SAGEMAKER_WARMUP_INPUT_SHAPES"  # type: str
+WARMUP_INPUT_DTYPE_ENV = "SAGEMAKER_WARMUP_INPUT_DTYPE"  # type: str
+WARMUP_BATCH_SIZES_ENV = "SAGEMAKER_WARMUP_BATCH_SIZES"  # type: str
@@ -0,0 +1,179 @@
+# Copyright 2019-2020 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the 'License'). You
+# may not use this file except in compliance with the License. A copy of
+# the License is located at
+#
+#     http://aws.amazon.com/apache2.0/
+#
+# or in the 'license' file accompanying this file. This file is
+# distributed on an 'AS IS' BASIS, WITHOUT WARRANTIES OR CONDITIONS OF
+# ANY KIND, either express or implied. See the License for the specific
+# language governing permissions and limitations under the License.
+"""This module contains functionality to time the stages of the inference
+pipeline, export the times as TorchServe metrics and aggregate them into
+per-model latency histograms.
+"""
+from __future__ import absolute_import
+
+import bisect
+import logging
+import time
+
+logger = logging.getLogger()
+
+DECODE = "decode"
+INPUT_FN = "input_fn"
+PREDICT_FN = "predict_fn"
+OUTPUT_FN = "output_fn"
+ENCODE = "encode"
+TRANSFORM_FN = "transform_fn"
+STAGES = (DECODE, INPUT_FN, PREDICT_FN, OUTPUT_FN, ENCODE, TRANSFORM_FN)
+
+METRIC_NAMES = {
+    DECODE: "DecodeTime",
+    INPUT_FN: "InputFnTime",
+    PREDICT_FN: "PredictFnTime",
+    OUTPUT_FN: "OutputFnTime",
+    ENCODE: "EncodeTime",
+    TRANSFORM_FN: "TransformFnTime",
+}
+
+# Bucket upper bounds in milliseconds, four per doubling from 10 microseconds to about 5 minutes.
+HISTOGRAM_BOUNDS = tuple(0.01 * 2 ** (i / 4.0) for i in range(100))
+SUMMARY_INTERVAL = 300.0
+
+
+class StageTimer(object):
+    """Accumulates the time spent in each stage while a batch of requests is handled."""
+
+    __slots__ = ("times",)
+
+    def __init__(self):
+        self.times = {}
+
+    def add(self, stage, start):
+        """Adds the time elapsed since ``start`` to a stage.
+
+        Args:
+            stage (str): the stage.
+            start (float): the ``time.perf_counter()`` value the stage started at.
+        """
+        elapsed = time.perf_counter() - start
+        self.times[stage] = self.times.get(stage, 0.0) + elapsed
+
+
+class LatencyHistogram(object):
+    """A latency histogram with logarithmic buckets, so that percentiles are known within
+    about 20% whatever the scale of the latencies, at a fixed memory cost.
+    """
+
+    def __init__(self):
+        self.counts = [0] * (len(HISTOGRAM_BOUNDS) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        """Records a latency.
+
+        Args:
+            value (float): the latency in milliseconds.
+        """
+        self.counts[bisect.bisect_left(HISTOGRAM_BOUNDS, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def percentile(self, percent):
+        """Returns the upper bound of the bucket of a percentile.
+
+        Args:
+            percent (float): the percentile, between 0 and 100.
+
+        Returns:
+            float: the latency in milliseconds, or None if no latency was recorded.
+        """
+        if not self.count:
+            return None
+        rank = percent / 100.0 * self.count
+        cumulative = 0
+        for bucket, count in enumerate(self.counts):
+            cumulative += count
+            if count and cumulative >= rank:
+                return HISTOGRAM_BOUNDS[bucket] if bucket < len(HISTOGRAM_BOUNDS) else float("inf")
+        return float("inf")
+
+
+class StageMetrics(object):
+    """Aggregates the stage times of each model into latency histograms, and logs a
+    summary of them every ``summary_interval`` seconds.
+    """
+
+    def __init__(self, summary_interval=SUMMARY_INTERVAL):
+        self._summary_interval = summary_interval
+        self._histograms = {}
+        self._last_summary = {}
+
+    def histograms(self, model_name):
+        """Returns the latency histogram of each stage of a model.
+
+        Args:
+            model_name (str): the name of the model.
+
+        Returns:
+            dict: the ``LatencyHistogram`` of each stage timed so far.
+        """
+        return self._histograms.setdefault(model_name, {})
+
+    def report(self, context, timer):
+        """Records the stage times of a batch in the histograms of its model, and emits
+        them as TorchServe metrics when the context provides them.
+
+        Args:
+            context (obj): metadata on the batch of requests.
+            timer (StageTimer): the stage times of the batch.
+        """
+        model_name = getattr(context, "model_name", None)
+        histograms = self.histograms(model_name)
+        metrics = getattr(context, "metrics", None)
+
+        for stage, elapsed in timer.times.items():
+            milliseconds = elapsed * 1000
+            histogram = histograms.get(stage)
+            if histogram is None:
+                histogram = histograms[stage] = LatencyHistogram()
+            histogram.observe(milliseconds)
+            if metrics is not None:
+                try:
+                    metrics.add_time(METRIC_NAMES[stage], milliseconds)
+                except Exception as e:  # pylint: disable=broad-except
+                    logger.debug("Unable to emit metric %s: %s", METRIC_NAMES[stage], e)
+
+        now = time.monotonic()
+        last_summary = self._last_summary.setdefault(model_name, now)
+        if now - last_summary >= self._summary_interval:
+            self._last_summary[model_name] = now
+            logger.info("Stage latencies of model %s: %s", model_name, self.summary(model_name))
+
+    def summary(self, model_name):
+        """Returns the median and 99th percentile latency of each stage of a model.
+
+        Args:
+            model_name (str): the name of the model.
+
+        Returns:
+            str: the percentiles in milliseconds, stage by stage.
+        """
+        histograms = self.histograms(model_name)
+        return ", ".join(
+            "{} p50 {:.3g} ms p99 {:.3g} ms ({} batches)".format(
+                stage,
+                histograms[stage].percentile(50),
+                histograms[stage].percentile(99),
+                histograms[stage].count,
+            )
+            for stage in STAGES
+            if stage in histograms
+        )
+
+
+stage_metrics = StageMetrics()
@@ -16,8 +16,13 @@ requests.
 """
 from __future__ import absolute_import
 
+import functools
+import glob
 import importlib
+import inspect
 import logging
+import os
+import time
 import traceback
 
 try:
@@ -51,45 +56,70 @@ except ImportError:
             return None
 
 
+try:
+    from ts.protocol.otf_message_handler import send_intermediate_predict_response
+except ImportError:
+    send_intermediate_predict_response = None
+
+import numpy as np
 from six.moves import http_client
 
-from sagemaker_inference import content_types, environment, utils
+from sagemaker_inference import content_types, encoder, environment, stage_metrics, utils
 from sagemaker_inference.default_inference_handler import DefaultInferenceHandler
 from sagemaker_inference.errors import BaseInferenceToolkitError, GenericInferenceToolkitError
 
 logger = logging.getLogger()
 
+WARMUP_PAYLOAD_FILENAME = "warmup_payload"
+WARMUP_PAYLOAD_CONTENT_TYPES = {
+    ".json": content_types.JSON,
+    ".csv": content_types.CSV,
+    ".npy": content_types.NPY,
+    ".npz": content_types.NPZ,
+    ".safetensors": content_types.SAFETENSORS,
+}
+
 
 class Transformer(object):
     """Represents the execution workflow for handling inference requests
     sent to the model server.
     """
 
-    def __init__(self, default_inference_handler=None):
+    def __init__(self, default_inference_handler=None, model_loader=None):
         """Initialize a ``Transformer``.
 
         Args:
             default_inference_handler (DefaultInferenceHandler): default implementation of
                 inference handlers to use in absence of expected serving functions within
                 the user module. Defaults to ``DefaultInferenceHandler``.
+            model_loader (callable): loads the model, called as
+                ``model_loader(model_fn, model_dir)`` where ``model_fn`` takes the model
+                directory. Defaults to calling ``model_fn`` directly.
 
         """
         self._default_inference_handler = default_inference_handler or DefaultInferenceHandler()
+        self._model_loader = model_loader
         self._initialized = False
         self._environment = None
         self._model = None
 
         self._pre_model_fn = None
+        self._post_model_fn = None
+        self._optimize_model_fn = None
         self._model_warmup_fn = None
         self._model_fn = None
         self._transform_fn = None
         self._input_fn = None
         self._predict_fn = None
         self._output_fn = None
+        self._batch_transform_fn = None
+        self._batch_predict_fn = None
         self._context = None
+        self._handler_dispatch = {}
+        self._stage_timer = stage_metrics.StageTimer()
 
     @staticmethod
-    def handle_error(context, inference_exception, trace):
+    def handle_error(context, inference_exception, trace, idx=0):
         """Set context appropriately for error response.
 
         Args:
@@ -97,6 +127,7 @@ class Transformer(object):
             inference_exception (sagemaker_inference.errors.BaseInferenceToolkitError): An exception
                 raised during inference, with information for the error response.
             trace (traceback): The stacktrace of the error.
+            idx (int): The position of the failed request in the batch (default: 0).
 
         Returns:
             str: The error message and stacktrace from the exception.
@@ -109,6 +140,7 @@ class Transformer(object):
         context.set_response_status(
             code=inference_exception.status_code,
             phrase=utils.remove_crlf(inference_exception.phrase),
+            idx=idx,
         )
         return ["{}\n{}".format(inference_exception.message, trace)]
 
@@ -116,69 +148,246 @@ class Transformer(object):
         """Take a request with input data, deserialize it, make a prediction, and return a
         serialized response.
 
+        Requests of a batch are handled independently: the response of a request that
+        fails carries its own error status, without failing the rest of the batch.
+
+        A generator returned by ``predict_fn``, ``output_fn`` or ``transform_fn`` is
+        streamed: its chunks are sent to the client as they are produced.
+
+        The time spent decoding the requests, in ``input_fn``, ``predict_fn``,
+        ``output_fn``, ``transform_fn`` and encoding the responses is emitted as
+        TorchServe metrics, and aggregated into latency histograms of the model, see
+        ``sagemaker_inference.stage_metrics``.
+
         Args:
             data (obj): the request data.
             context (obj): metadata on the incoming request data.
 
         Returns:
-            list[obj]: The serialized prediction result wrapped in a list if
-                inference is successful. Otherwise returns an error message
-                with the context set appropriately.
+            list[obj]: The serialized prediction result of each request if
+                inference is successful. Otherwise the error message of each
+                failed request, with the context set appropriately.
         """
+        timer = self._stage_timer = stage_metrics.StageTimer()
+        try:
+            return self._transform(data, context)
+        finally:
+            if timer.times:
+                stage_metrics.stage_metrics.report(context, timer)
+
+    def _transform(self, data, context):
         try:
             properties = context.system_properties
             model_dir = properties.get("model_dir")
             self.validate_and_initialize(model_dir=model_dir, context=context)
 
-            response_list = []
+            if self._batch_transform_fn is not None:
+                return self._transform_batch(data, context)
+        except Exception as e:  # pylint: disable=broad-except
+            trace = traceback.format_exc()
+            return [self._handle_exception(context, e, trace, i) for i in range(len(data))]
+
+        response_list = []
 
-            for i in range(len(data)):
-                input_data = data[i].get("body")
+        for i in range(len(data)):
+            try:
+                start = time.perf_counter()
+                input_data, content_type, accept = self._parse_request(data, context, i)
+                self._stage_timer.add(stage_metrics.DECODE, start)
 
-                request_processor = context.request_processor[0]
+                result = self._run_stage(
+                    stage_metrics.TRANSFORM_FN,
+                    self._transform_fn,
+                    *(self._model, input_data, content_type, accept)
+                )
 
-                request_property = request_processor.get_request_properties()
-                content_type = utils.retrieve_content_type_header(request_property)
-                accept = request_property.get("Accept") or request_property.get("accept")
+                start = time.perf_counter()
+                response_list.append(self._set_response(context, i, result, accept))
+                self._stage_timer.add(stage_metrics.ENCODE, start)
+            except Exception as e:  # pylint: disable=broad-except
+                trace = traceback.format_exc()
+                response_list.append(self._handle_exception(context, e, trace, i))
 
-                if not accept or accept == content_types.ANY:
-                    accept = self._environment.default_accept
+        return response_list
 
-                if content_type in content_types.UTF8_TYPES:
-                    input_data = input_data.decode("utf-8")
+    def _handle_exception(self, context, exception, trace, idx):
+        """Set context appropriately for the error response of a single request.
 
-                result = self._run_handler_function(
-                    self._transform_fn, *(self._model, input_data, content_type, accept)
-                )
+        Args:
+            context (obj): metadata on the incoming request data.
+            exception (Exception): the exception raised while handling the request.
+            trace (str): The stacktrace of the error.
+            idx (int): The position of the failed request in the batch.
 
-                response = result
-                response_content_type = accept
+        Returns:
+            str: The error message and stacktrace from the exception.
+        """
+        if not isinstance(exception, BaseInferenceToolkitError):
+            exception = GenericInferenceToolkitError(
+                http_client.INTERNAL_SERVER_ERROR, str(exception)
+            )
+        return self.handle_error(context, exception, trace, idx)[0]
 
-                if isinstance(result, tuple):
-                    # handles tuple for backwards compatibility
-                    response = result[0]
-                    response_content_type = result[1]
+    def _transform_batch(self, data, context):
+        """Deserialize every request in a batch, make a single prediction for the whole
+        batch, and return one serialized response per request.
 
-                context.set_response_content_type(0, response_content_type)
+        ``batch_transform_fn`` may return an exception in place of the result of a request
+        that failed, in which case only that request gets an error response.
 
-                response_list.append(response)
+        Args:
+            data (obj): the batch of request data.
+            context (obj): metadata on the incoming request data.
 
+        Returns:
+            list[obj]: The serialized prediction results, in the order of the requests.
+        """
+        response_list = [None] * len(data)
+        indices = []
+        input_data_list = []
+        content_type_list = []
+        accept_list = []
+
+        start = time.perf_counter()
+        for i in range(len(data)):
+            try:
+                input_data, content_type, accept = self._parse_request(data, context, i)
+            except Exception as e:  # pylint: disable=broad-except
+                response_list[i] = self._handle_exception(context, e, traceback.format_exc(), i)
+                continue
+            indices.append(i)
+            input_data_list.append(input_data)
+            content_type_list.append(content_type)
+            accept_list.append(accept)
+        self._stage_timer.add(stage_metrics.DECODE, start)
+
+        if not indices:
             return response_list
-        except Exception as e:  # pylint: disable=broad-except
-            trace = traceback.format_exc()
-            if isinstance(e, BaseInferenceToolkitError):
-                return self.handle_error(context, e, trace)
+
+        results = self._run_stage(
+            stage_metrics.TRANSFORM_FN,
+            self._batch_transform_fn,
+            *(self._model, input_data_list, content_type_list, accept_list)
+        )
+
+        if len(results) != len(indices):
+            raise ValueError(
+                "batch_transform_fn returned {} results for a batch of {} requests.".format(
+                    len(results), len(indices)
+                )
+            )
+
+        start = time.perf_counter()
+        for i, result, accept in zip(indices, results, accept_list):
+            if isinstance(result, Exception):
+                trace = "".join(
+                    traceback.format_exception(type(result), result, result.__traceback__)
+                )
+                response_list[i] = self._handle_exception(context, result, trace, i)
             else:
-                return self.handle_error(
+                response_list[i] = self._set_response(context, i, result, accept)
+        self._stage_timer.add(stage_metrics.ENCODE, start)
+
+        return response_list
+
+    def _parse_request(self, data, context, idx):
+        """Retrieve the payload, content type and accept type of a request.
+
+        Args:
+            data (obj): the batch of request data.
+            context (obj): metadata on the incoming request data.
+            idx (int): the position of the request in the batch.
+
+        Returns:
+            tuple: the request payload, its content type and the accept type.
+        """
+        input_data = data[idx].get("body")
+
+        request_processor = context.request_processor[idx]
+
+        request_property = request_processor.get_request_properties()
+        content_type = utils.retrieve_content_type_header(request_property)
+        accept = request_property.get("Accept") or request_property.get("accept")
+
+        if not accept or accept == content_types.ANY:
+            accept = self._environment.default_accept
+
+        if content_type in content_types.UTF8_TYPES:
+            input_data = input_data.decode("utf-8")
+
+        return input_data, content_type, accept
+
+    @staticmethod
+    def _set_response(context, idx, result, accept):
+        """Set the response content type and return the response body.
+
+        Args:
+            context (obj): metadata on the incoming request data.
+            idx (int): the position of the request in the batch.
+            result (obj): the result of the transform function.
+            accept (str): accept header expected by the client.
+
+        Returns:
+            obj: the serialized prediction result.
+        """
+        response = result
+        response_content_type = accept
+
+        if isinstance(result, tuple):
+            # handles tuple for backwards compatibility
+            response = result[0]
+            response_content_type = result[1]
+
+        context.set_response_content_type(idx, response_content_type)
+
+        if inspect.isgenerator(response):
+            return Transformer._stream_response(context, idx, response)
+        return response
+
+    @staticmethod
+    def _stream_response(context, idx, chunks):
+        """Send the chunks of a streamed response as they are produced.
+
+        Every chunk but the last one is sent with TorchServe's
+        ``send_intermediate_predict_response``. The last chunk is returned as the
+        final response, which closes the stream. When the model server does not
+        support streaming, the chunks are joined into one response.
+
+        Args:
+            context (obj): metadata on the incoming request data.
+            idx (int): the position of the request in the batch.
+            chunks (generator): the chunks of the serialized prediction result.
+
+        Returns:
+            obj: the last chunk, or all chunks joined if streaming is not supported.
+        """
+        if send_intermediate_predict_response is None:
+            return b"".join(
+                chunk.encode("utf-8") if isinstance(chunk, str) else bytes(chunk)
+                for chunk in chunks
+            )
+
+        request_id_map = {idx: context.request_ids[idx]}
+        last_chunk = None
+        for i, chunk in enumerate(chunks):
+            if i > 0:
+                send_intermediate_predict_response(
+                    {idx: last_chunk},
+                    request_id_map,
+                    "Intermediate Prediction success",
+                    http_client.OK,
                     context,
-                    GenericInferenceToolkitError(http_client.INTERNAL_SERVER_ERROR, str(e)),
-                    trace,
                 )
+            last_chunk = chunk
+        return b"" if last_chunk is None else last_chunk
 
     def validate_and_initialize(self, model_dir=environment.model_dir, context=None):
         """Validates the user module against the SageMaker inference contract.
 
-        Load the model as defined by the ``model_fn`` to prepare handling predictions.
+        Load the model as defined by the ``model_fn`` to prepare handling predictions,
+        prepare it once for inference with ``post_model_fn`` (by default, only when the
+        predictions are made by the default inference handler), optimize it with
+        ``optimize_model_fn`` and warm it up with the configured warmup payloads.
 
         """
         if not self._initialized:
@@ -189,13 +398,129 @@ class Transformer(object):
             if self._pre_model_fn is not None:
                 self._run_handler_function(self._pre_model_fn, *(model_dir,))
 
-            self._model = self._run_handler_function(self._model_fn, *(model_dir,))
+            model_fn = functools.partial(self._run_handler_function, self._model_fn)
+            if self._model_loader is not None:
+                self._model = self._model_loader(model_fn, model_dir)
+            else:
+                self._model = model_fn(model_dir)
+
+            if self._post_model_fn is not None:
+                self._model = self._run_handler_function(self._post_model_fn, *(self._model,))
+
+            if self._optimize_model_fn is not None:
+                self._model = self._run_handler_function(self._optimize_model_fn, *(self._model,))
 
             if self._model_warmup_fn is not None:
                 self._run_handler_function(self._model_warmup_fn, *(model_dir, self._model))
 
+            self._warmup(model_dir)
+
             self._initialized = True
 
+    def _warmup(self, model_dir):
+        """Run warmup payloads through the whole input, predict and output pipeline, so that
+        the first requests don't pay for cold kernels, lazy allocations and JIT compilation.
+
+        Payloads are read from ``warmup_payload.*`` files in the model directory, and
+        synthesized as NPY arrays from the input shapes in SAGEMAKER_WARMUP_INPUT_SHAPES.
+        Each payload is run once per batch size in SAGEMAKER_WARMUP_BATCH_SIZES: as a batch
+        of requests with batched inference, otherwise as a single synthetic request with the
+        batch size as first dimension. Failures are logged without preventing the model from
+        serving.
+
+        Args:
+            model_dir (str): the directory where the model is saved.
+        """
+        try:
+            for name, input_data, content_type, batch_size in self._warmup_payloads(model_dir):
+                self._warmup_payload(name, input_data, content_type, batch_size)
+        except Exception:  # pylint: disable=broad-except
+            # Invalid warmup settings or unreadable payloads.
+            logger.warning("Warmup failed.", exc_info=True)
+
+    def _warmup_payload(self, name, input_data, content_type, batch_size):
+        """Run a warmup payload, logging how long it took or why it failed."""
+        accept = self._environment.default_accept
+        start = time.perf_counter()
+        try:
+            if self._batch_transform_fn is not None:
+                results = self._run_handler_function(
+                    self._batch_transform_fn,
+                    *(
+                        self._model,
+                        [input_data] * batch_size,
+                        [content_type] * batch_size,
+                        [accept] * batch_size,
+                    )
+                )
+                for result in results:
+                    if isinstance(result, Exception):
+                        raise result
+                    self._consume(result)
+            else:
+                self._consume(
+                    self._run_handler_function(
+                        self._transform_fn, *(self._model, input_data, content_type, accept)
+                    )
+                )
+        except Exception:  # pylint: disable=broad-except
+            logger.warning("Warmup with %s failed.", name, exc_info=True)
+        else:
+            logger.info(
+                "Warmup with %s took %.1f ms.", name, (time.perf_counter() - start) * 1000
+            )
+
+    def _warmup_payloads(self, model_dir):
+        """Generate the warmup payloads.
+
+        Args:
+            model_dir (str): the directory where the model is saved.
+
+        Returns:
+            generator: tuples of a description of the payload, the payload, its content type
+                and the number of requests it is sent as.
+        """
+        batched = self._batch_transform_fn is not None
+        batch_sizes = self._environment.warmup_batch_sizes
+
+        if model_dir:
+            pattern = os.path.join(glob.escape(model_dir), WARMUP_PAYLOAD_FILENAME + ".*")
+            for path in sorted(glob.glob(pattern)):
+                content_type = WARMUP_PAYLOAD_CONTENT_TYPES.get(os.path.splitext(path)[1])
+                if content_type is None:
+                    logger.warning("Skipping warmup payload %s of unknown content type.", path)
+                    continue
+                with open(path, "rb") as f:
+                    input_data = f.read()
+                if content_type in content_types.UTF8_TYPES:
+                    input_data = input_data.decode("utf-8")
+                for batch_size in batch_sizes if batched else [1]:
+                    name = "{} x {}".format(os.path.basename(path), batch_size)
+                    yield name, input_data, content_type, batch_size
+
+        input_shapes = list(self._environment.warmup_input_shapes)
+        if not input_shapes:
+            return
+
+        dtype = np.dtype(self._environment.warmup_input_dtype)
+        rng = np.random.default_rng(0)
+        for shape in input_shapes:
+            for batch_size in batch_sizes:
+                array_shape = (1 if batched else batch_size,) + shape
+                array = rng.random(array_shape).astype(dtype)
+                name = "synthetic input {} x {}".format(shape, batch_size)
+                input_data = encoder.encode(array, content_types.NPY)
+                yield name, input_data, content_types.NPY, batch_size if batched else 1
+
+    @staticmethod
+    def _consume(result):
+        """Exhaust a streamed warmup result, so that the whole prediction is made."""
+        if isinstance(result, tuple):
+            result = result[0]
+        if inspect.isgenerator(result):
+            for _ in result:
+                pass
+
     def _validate_user_module_and_set_functions(self):
         """Retrieves and validates the inference handlers provided within the user module.
 
@@ -206,6 +531,12 @@ class Transformer(object):
         user_module_name = self._environment.module_name
 
         self._pre_model_fn = getattr(self._default_inference_handler, "default_pre_model_fn", None)
+        self._post_model_fn = getattr(
+            self._default_inference_handler, "default_post_model_fn", None
+        )
+        self._optimize_model_fn = getattr(
+            self._default_inference_handler, "default_optimize_model_fn", None
+        )
         self._model_warmup_fn = getattr(
             self._default_inference_handler, "default_model_warmup_fn", None
         )
@@ -222,7 +553,11 @@ class Transformer(object):
             predict_fn = getattr(user_module, "predict_fn", None)
             output_fn = getattr(user_module, "output_fn", None)
             pre_model_fn = getattr(user_module, "pre_model_fn", None)
+            post_model_fn = getattr(user_module, "post_model_fn", None)
+            optimize_model_fn = getattr(user_module, "optimize_model_fn", None)
             model_warmup_fn = getattr(user_module, "model_warmup_fn", None)
+            batch_transform_fn = getattr(user_module, "batch_transform_fn", None)
+            batch_predict_fn = getattr(user_module, "batch_predict_fn", None)
 
             if transform_fn and (input_fn or predict_fn or output_fn):
                 raise ValueError(
@@ -230,14 +565,45 @@ class Transformer(object):
                     "input_fn, predict_fn, and/or output_fn implementation"
                 )
 
+            if batch_transform_fn and (
+                transform_fn or input_fn or predict_fn or output_fn or batch_predict_fn
+            ):
+                raise ValueError(
+                    "Cannot use batch_transform_fn implementation in conjunction with "
+                    "transform_fn, input_fn, predict_fn, output_fn and/or batch_predict_fn "
+                    "implementation"
+                )
+
+            if transform_fn and batch_predict_fn:
+                raise ValueError(
+                    "Cannot use transform_fn implementation in conjunction with "
+                    "batch_predict_fn implementation"
+                )
+
             self._transform_fn = transform_fn or self._default_transform_fn
             self._input_fn = input_fn or self._default_inference_handler.default_input_fn
-            self._predict_fn = predict_fn or self._default_inference_handler.default_predict_fn
+            self._predict_fn = (
+                self._with_predict_context(predict_fn)
+                if predict_fn
+                else self._default_inference_handler.default_predict_fn
+            )
             self._output_fn = output_fn or self._default_inference_handler.default_output_fn
             if pre_model_fn is not None:
                 self._pre_model_fn = pre_model_fn
+            if post_model_fn is not None:
+                self._post_model_fn = post_model_fn
+            elif transform_fn or predict_fn or batch_transform_fn or batch_predict_fn:
+                # The default post_model_fn prepares the model for the default predict_fn: models
+                # served by prediction functions from the user module are left as model_fn made them.
+                self._post_model_fn = None
+            if optimize_model_fn is not None:
+                self._optimize_model_fn = optimize_model_fn
             if model_warmup_fn is not None:
                 self._model_warmup_fn = model_warmup_fn
+
+            self._set_batch_functions(
+                batch_transform_fn, batch_predict_fn, not (transform_fn or predict_fn)
+            )
         else:
             self._model_fn = self._default_inference_handler.default_model_fn
             self._input_fn = self._default_inference_handler.default_input_fn
@@ -246,6 +612,122 @@ class Transformer(object):
 
             self._transform_fn = self._default_transform_fn
 
+            self._set_batch_functions(None, None, True)
+
+        self._bind_handler_functions()
+
+    def _set_batch_functions(self, batch_transform_fn, batch_predict_fn, use_default):
+        """Select the functions used to handle a whole batch of requests at once.
+
+        Batched inference is used when the user module provides ``batch_transform_fn`` or
+        ``batch_predict_fn``, or when it is enabled through the environment and the default
+        inference handler provides ``default_batch_predict_fn``.
+
+        Args:
+            batch_transform_fn (function): ``batch_transform_fn`` from the user module, if any.
+            batch_predict_fn (function): ``batch_predict_fn`` from the user module, if any.
+            use_default (bool): whether the default batch prediction may be used, which is
+                only the case when the user module does not override the prediction.
+        """
+        default_batch_predict_fn = getattr(
+            self._default_inference_handler, "default_batch_predict_fn", None
+        )
+
+        if batch_transform_fn:
+            self._batch_transform_fn = batch_transform_fn
+        elif batch_predict_fn:
+            self._batch_predict_fn = self._with_predict_context(batch_predict_fn)
+            self._batch_transform_fn = self._default_batch_transform_fn
+        elif use_default and self._environment.batched_inference and default_batch_predict_fn:
+            self._batch_predict_fn = default_batch_predict_fn
+            self._batch_transform_fn = self._default_batch_transform_fn
+
+    def _with_predict_context(self, predict_fn):
+        """Wrap a prediction function from the user module so that it runs within the
+        default inference handler's ``default_user_predict_context``, if it provides one.
+        A prediction streamed by a generator produces each of its chunks within the context.
+
+        Args:
+            predict_fn (function): ``predict_fn`` or ``batch_predict_fn`` from the user module.
+
+        Returns:
+            function: the wrapped function, with the same signature.
+        """
+        predict_context = getattr(
+            self._default_inference_handler, "default_user_predict_context", None
+        )
+        if predict_context is None:
+            return predict_fn
+
+        @functools.wraps(predict_fn)
+        def wrapper(*argv):
+            with predict_context():
+                prediction = predict_fn(*argv)
+            if inspect.isgenerator(prediction):
+                return utils.generate_in_context(prediction, predict_context)
+            return prediction
+
+        return wrapper
+
+    def _bind_handler_functions(self):
+        """Resolve ahead of time how each inference handler is called, so that
+        requests don't pay for inspecting the handler signatures.
+
+        Handlers that cannot be resolved here are left to ``_run_handler_function``,
+        which reports the error when the handler is called.
+        """
+        handlers = (
+            (self._pre_model_fn, 1),
+            (self._model_fn, 1),
+            (self._post_model_fn, 1),
+            (self._optimize_model_fn, 1),
+            (self._model_warmup_fn, 2),
+            (self._transform_fn, 4),
+            (self._input_fn, 2),
+            (self._predict_fn, 2),
+            (self._output_fn, 2),
+            (self._batch_transform_fn, 4),
+            (self._batch_predict_fn, 2),
+        )
+        for func, num_args in handlers:
+            if func is None:
+                continue
+            try:
+                self._bind_handler_function(func, num_args)
+            except (TypeError, ValueError):
+                logger.debug("Unable to resolve the signature of %s ahead of time.", func)
+
+    def _bind_handler_function(self, func, num_args):
+        """Build the callable used to invoke a handler function with ``num_args`` arguments,
+        appending the context when the handler takes it, and store it in the dispatch table.
+
+        Args:
+            func (function): the handler function.
+            num_args (int): the number of arguments, excluding the context, it is called with.
+
+        Returns:
+            function: a callable taking ``num_args`` arguments.
+        """
+        num_func_input = len(signature(func).parameters)
+        if num_func_input == num_args:
+            # function does not take context
+            handler = func
+        elif num_func_input == num_args + 1:
+            # function takes context
+            handler = functools.partial(self._call_with_context, func)
+        else:
+            raise TypeError(
+                "{} takes {} arguments but {} were given.".format(
+                    getattr(func, "__name__", func), num_func_input, num_args
+                )
+            )
+
+        self._handler_dispatch[(func, num_args)] = handler
+        return handler
+
+    def _call_with_context(self, func, *argv):
+        return func(*(argv + (self._context,)))
+
     def _default_transform_fn(self, model, input_data, content_type, accept, context=None):
         # pylint: disable=unused-argument
         """Make predictions against the model and return a serialized response.
@@ -264,29 +746,109 @@ class Transformer(object):
                 (response_data, content_type)
 
         """
-        data = self._run_handler_function(self._input_fn, *(input_data, content_type))
-        prediction = self._run_handler_function(self._predict_fn, *(data, model))
-        result = self._run_handler_function(self._output_fn, *(prediction, accept))
+        data = self._run_stage(stage_metrics.INPUT_FN, self._input_fn, *(input_data, content_type))
+        prediction = self._run_stage(stage_metrics.PREDICT_FN, self._predict_fn, *(data, model))
+        result = self._run_output_fn(prediction, accept)
         return result
 
+    def _run_output_fn(self, prediction, accept):
+        """Serialize a prediction with ``output_fn``. A prediction made of chunks, yielded
+        by a generator, is serialized chunk by chunk as the chunks are consumed.
+
+        Args:
+            prediction (obj): the prediction result, or a generator of prediction chunks.
+            accept (str): accept header expected by the client.
+
+        Returns:
+            obj: the serialized prediction result, or a generator of serialized chunks.
+        """
+        if inspect.isgenerator(prediction):
+            return (
+                self._run_stage(stage_metrics.OUTPUT_FN, self._output_fn, *(chunk, accept))
+                for chunk in prediction
+            )
+        return self._run_stage(stage_metrics.OUTPUT_FN, self._output_fn, *(prediction, accept))
+
+    def _default_batch_transform_fn(
+        self, model, input_data_list, content_type_list, accept_list, context=None
+    ):
+        # pylint: disable=unused-argument
+        """Make a single prediction for a batch of requests and return one serialized
+        response per request. This serves as the default implementation of
+        batch_transform_fn, used when batched inference is enabled and the user has
+        not provided an implementation.
+
+        Args:
+            model (obj): model loaded by model_fn.
+            input_data_list (list): the data of each request.
+            content_type_list (list[str]): the content type of each request.
+            accept_list (list[str]): the accept header of each request.
+            context (obj): the request context (default: None).
+
+        Returns:
+            list: the serialized prediction result of each request, or tuples of the form
+                (response_data, content_type). The exception raised while handling a request
+                is returned in place of its result.
+
+        """
+        results = [None] * len(input_data_list)
+        indices = []
+        data = []
+
+        for i, (input_data, content_type) in enumerate(zip(input_data_list, content_type_list)):
+            try:
+                data.append(
+                    self._run_stage(stage_metrics.INPUT_FN, self._input_fn, *(input_data, content_type))
+                )
+                indices.append(i)
+            except Exception as e:  # pylint: disable=broad-except
+                results[i] = e
+
+        if not data:
+            return results
+
+        try:
+            predictions = self._run_stage(
+                stage_metrics.PREDICT_FN, self._batch_predict_fn, *(data, model)
+            )
+            if len(predictions) != len(data):
+                raise ValueError(
+                    "batch_predict_fn returned {} predictions for a batch of {} inputs.".format(
+                        len(predictions), len(data)
+                    )
+                )
+        except Exception as e:  # pylint: disable=broad-except
+            predictions = [e] * len(data)
+
+        for i, prediction in zip(indices, predictions):
+            if isinstance(prediction, Exception):
+                results[i] = prediction
+                continue
+            try:
+                results[i] = self._run_output_fn(prediction, accept_list[i])
+            except Exception as e:  # pylint: disable=broad-except
+                results[i] = e
+
+        return results
+
+    def _run_stage(self, stage, func, *argv):
+        """Run a handler function with ``_run_handler_function``, adding the time it
+        takes to a stage of the request being handled.
+        """
+        start = time.perf_counter()
+        try:
+            return self._run_handler_function(func, *argv)
+        finally:
+            self._stage_timer.add(stage, start)
+
     def _run_handler_function(self, func, *argv):
         """Helper to call the handler function which covers 2 cases:
         1. the handle function takes context
         2. the handle function does not take context
-        """
-        num_func_input = len(signature(func).parameters)
-        if num_func_input == len(argv):
-            # function does not take context
-            result = func(*argv)
-        elif num_func_input == len(argv) + 1:
-            # function takes context
-            argv_context = argv + (self._context,)
-            result = func(*argv_context)
-        else:
-            raise TypeError(
-                "{} takes {} arguments but {} were given.".format(
-                    func.__name__, num_func_input, len(argv)
-                )
-            )
 
-        return result
+        How a handler is called is resolved once and cached in the dispatch table.
+        """
+        handler = self._handler_dispatch.get((func, len(argv)))
+        if handler is None:
+            handler = self._bind_handler_function(func, len(argv))
+        return handler(*argv)
@@ -11,7 +11,7 @@
 # ANY KIND, either express or implied. See the License for the specific
 # language governing permissions and limitations under the License.
 """This module contains utility functions related to reading files,
-writing files, and retrieving information from requests.
+writing files, retrieving information from requests and streaming predictions.
 """
 from __future__ import absolute_import
 
@@ -100,3 +100,29 @@ def remove_crlf(illegal_string):
         sanitized_string = sanitized_string.replace(character, " ")
 
     return sanitized_string
+
+
+def generate_in_context(chunks, context_factory):
+    """Wrap a generator so that each of its chunks is produced within a context.
+
+    A generator only runs when its chunks are consumed, after the function that created
+    it has returned and left its context, such as ``torch.inference_mode()``. The context
+    is entered again around the production of every chunk.
+
+    Args:
+        chunks (generator): the generator producing the chunks.
+        context_factory (callable): returns a new context manager for each chunk.
+
+    Returns:
+        generator: the same chunks, each produced within a new context.
+    """
+    try:
+        while True:
+            with context_factory():
+                try:
+                    chunk = next(chunks)
+                except StopIteration:
+                    return
+            yield chunk
+    finally:
+        chunks.close()
@@ -0,0 +1,525 @@
+# Copyright 2019-2020 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the 'License'). You
+# may not use this file except in compliance with the License. A copy of
+# the License is located at
+#
+#     http://aws.amazon.com/apache2.0/
+#
+# or in the 'license' file accompanying this file. This file is
+# distributed on an 'AS IS' BASIS, WITHOUT WARRANTIES OR CONDITIONS OF
+# ANY KIND, either express or implied. See the License for the specific
+# language governing permissions and limitations under the License.
+"""This module contains functionality to adapt the TorchServe batch size and
+batch delay to the traffic, within a latency objective.
+"""
+from __future__ import absolute_import
+
+import collections
+import json
+import logging
+import math
+import os
+import shutil
+import tempfile
+import threading
+import time
+import urllib.parse
+import urllib.request
+
+logger = logging.getLogger()
+
+BATCH_STATS_FILE = os.path.join(tempfile.gettempdir(), "sagemaker-ts-batch-stats.log")
+MAX_BATCH_STATS_FILE_SIZE = 1024 * 1024
+MANAGEMENT_API_TIMEOUT = 5
+MODEL_VERSIONS_DIRNAME = "sagemaker-ts-model-versions"
+MANIFEST_DIRNAME = "MAR-INF"
+
+BatchSettings = collections.namedtuple("BatchSettings", ["batch_size", "max_batch_delay"])
+BatchSettings.__doc__ = """TorchServe batching settings.
+
+Attributes:
+    batch_size (int): the maximum number of requests in a batch.
+    max_batch_delay (int): the time in milliseconds to wait for a batch to fill up.
+"""
+
+
+class AdaptiveBatchController(object):
+    """Chooses the batch size and batch delay from the observed arrival rate and model latency.
+
+    The controller keeps an exponentially weighted average of the arrival rate, and of the
+    latency of the model for each batch size, extrapolated linearly to the batch sizes not
+    observed yet. It recommends the smallest batch size whose throughput keeps up with the
+    arrival rate, among the ones expected to meet the latency objective counting the time to
+    fill the batch, and a batch delay of about twice that time. Low traffic thus gets small
+    batches without waiting, and high traffic larger batches.
+
+    When no batch size is expected to keep up, the workers are saturated and the arrival rate
+    observed is only their throughput, so the controller doubles the largest batch size
+    observed, to measure whether larger batches are handled faster.
+
+    Changing the settings is expensive, as TorchServe only applies them when registering the
+    model, so new settings are only recommended if they differ significantly from the current
+    ones, and not more often than ``min_interval``.
+    """
+
+    def __init__(self, latency_slo, max_batch_size, settings, workers=1, min_interval=900.0,
+                 min_batches=100, max_batch_delay=None, headroom=1.25, smoothing=0.2):
+        """Initialize an ``AdaptiveBatchController``.
+
+        Args:
+            latency_slo (float): the latency objective of requests, in milliseconds.
+            max_batch_size (int): the largest batch size to recommend.
+            settings (BatchSettings): the current batching settings.
+            workers (int): the number of workers sharing the traffic. ``run_controller`` keeps
+                it up to date with the workers TorchServe runs.
+            min_interval (float): the minimum time between two changes, in seconds.
+            min_batches (int): the number of batches to observe before recommending settings.
+            max_batch_delay (int): the largest batch delay to recommend, in milliseconds.
+                Defaults to the latency objective.
+            headroom (float): the throughput to keep, relative to the arrival rate.
+            smoothing (float): the weight of new observations in the averages.
+        """
+        self._latency_slo = latency_slo
+        self._max_batch_size = max_batch_size
+        self._max_batch_delay = latency_slo if max_batch_delay is None else max_batch_delay
+        self.workers = workers
+        self._min_interval = min_interval
+        self._min_batches = min_batches
+        self._headroom = headroom
+        self._smoothing = smoothing
+
+        self.settings = settings
+        self._last_change = None
+        self._latencies = {}
+        self._arrival_rate = None
+        self._window_start = None
+        self._window_requests = 0
+        self._batches = 0
+
+    @property
+    def arrival_rate(self):
+        """float: the average arrival rate, in requests per second."""
+        return self._arrival_rate
+
+    def observe_batch(self, now, batch_size, latency):
+        """Records a batch handled by the model.
+
+        Args:
+            now (float): the time the batch was handled, in seconds.
+            batch_size (int): the number of requests in the batch.
+            latency (float): the time the model took to handle the batch, in milliseconds.
+        """
+        if self._window_start is None:
+            self._window_start = now
+        self._window_requests += batch_size
+        self._batches += 1
+        self._latencies[batch_size] = self._average(self._latencies.get(batch_size), latency)
+
+    def recommend(self, now):
+        """Recommends new batching settings, if they are worth changing to.
+
+        Args:
+            now (float): the current time, in seconds.
+
+        Returns:
+            BatchSettings: the recommended settings, or None to keep the current ones.
+        """
+        if self._window_start is not None and now > self._window_start:
+            rate = self._window_requests / (now - self._window_start)
+            self._arrival_rate = self._average(self._arrival_rate, rate)
+            self._window_start, self._window_requests = now, 0
+
+        if self._arrival_rate is None or self._batches < self._min_batches:
+            return None
+        if self._last_change is not None and now - self._last_change < self._min_interval:
+            return None
+
+        settings = self._best_settings()
+        if settings is None or not self._differs(settings):
+            return None
+        return settings
+
+    def set_settings(self, settings, now):
+        """Records the settings that were applied.
+
+        Args:
+            settings (BatchSettings): the applied settings.
+            now (float): the time they were applied, in seconds.
+        """
+        self.settings = settings
+        self._last_change = now
+
+    def estimate_latency(self, batch_size):
+        """Estimates the time the model takes to handle a batch, in milliseconds.
+
+        Args:
+            batch_size (int): the number of requests in the batch.
+
+        Returns:
+            float: the estimated latency, or None if no batch was observed.
+        """
+        if batch_size in self._latencies:
+            return self._latencies[batch_size]
+        if not self._latencies:
+            return None
+
+        sizes = sorted(self._latencies)
+        if len(sizes) == 1:
+            # Without another batch size to compare with, assume no gain from batching.
+            size = sizes[0]
+            return self._latencies[size] * max(batch_size, size) / size
+
+        # Least squares fit of latency = intercept + slope * batch size.
+        mean_size = sum(sizes) / len(sizes)
+        mean_latency = sum(self._latencies[size] for size in sizes) / len(sizes)
+        slope = sum((size - mean_size) * (self._latencies[size] - mean_latency) for size in sizes) / sum(
+            (size - mean_size) ** 2 for size in sizes
+        )
+        slope = max(slope, 0.0)
+        return max(mean_latency + slope * (batch_size - mean_size), self._latencies[sizes[0]])
+
+    def _best_settings(self):
+        rate = self._arrival_rate / self.workers
+        fastest = None
+        for batch_size in range(1, self._max_batch_size + 1):
+            latency = self.estimate_latency(batch_size)
+            fill_time = self._fill_time(batch_size, rate)
+            if fill_time + latency > self._latency_slo:
+                continue
+            throughput = batch_size / latency * 1000
+            delay = min(2 * fill_time, self._latency_slo - latency, self._max_batch_delay)
+            settings = BatchSettings(batch_size, max(int(round(delay)), 1))
+            if throughput >= rate * self._headroom:
+                return settings
+            if fastest is None or throughput > fastest[0]:
+                fastest = (throughput, settings)
+
+        largest = max(self._latencies)
+        if largest < self._max_batch_size:
+            batch_size = min(2 * largest, self._max_batch_size)
+            delay = min(2 * self._fill_time(batch_size, rate), self._max_batch_delay)
+            return BatchSettings(batch_size, max(int(round(delay)), 1))
+        return fastest[1] if fastest else None
+
+    @staticmethod
+    def _fill_time(batch_size, rate):
+        """Returns the time to fill a batch at the arrival rate of a worker, in milliseconds."""
+        if batch_size == 1:
+            return 0.0
+        return (batch_size - 1) / rate * 1000 if rate > 0 else math.inf
+
+    def _differs(self, settings):
+        if settings.batch_size != self.settings.batch_size:
+            return True
+        if settings.batch_size == 1:
+            return False
+        current_delay = max(self.settings.max_batch_delay, 1)
+        return abs(settings.max_batch_delay - current_delay) / current_delay > 0.25
+
+    def _average(self, average, value):
+        if average is None:
+            return value
+        return (1 - self._smoothing) * average + self._smoothing * value
+
+
+SimulationResult = collections.namedtuple("SimulationResult", ["latencies", "batch_sizes", "settings"])
+SimulationResult.__doc__ = """The outcome of a simulation.
+
+Attributes:
+    latencies (list[float]): the latency of each request, in milliseconds, in arrival order.
+    batch_sizes (list[int]): the size of each batch.
+    settings (list[tuple]): the time in seconds and the batching settings of each change.
+"""
+
+
+def simulate(arrivals, model_latency, settings, controller=None, control_interval=1.0):
+    """Simulates a TorchServe worker batching requests, so that batching settings and the
+    controller can be evaluated offline.
+
+    Like TorchServe, the worker takes a batch once it is free and a request is queued, waiting
+    up to the batch delay for the batch to fill up.
+
+    Args:
+        arrivals (list[float]): the arrival time of each request, in seconds, in order.
+        model_latency (callable): returns the time the model takes to handle a batch, in
+            milliseconds, given the batch size.
+        settings (BatchSettings): the initial batching settings.
+        controller (AdaptiveBatchController): adjusts the settings, if any. Its
+            recommendations are applied immediately.
+        control_interval (float): the time between two recommendations, in seconds.
+
+    Returns:
+        SimulationResult: the request latencies, batch sizes and settings changes.
+    """
+    latencies = []
+    batch_sizes = []
+    history = [(arrivals[0] if arrivals else 0.0, settings)]
+    next_control = (arrivals[0] if arrivals else 0.0) + control_interval
+    worker_free = 0.0
+    index = 0
+
+    while index < len(arrivals):
+        start = max(worker_free, arrivals[index])
+        deadline = start + settings.max_batch_delay / 1000.0
+        last = min(index + settings.batch_size, len(arrivals)) - 1
+        if arrivals[last] <= deadline:
+            dispatch = max(start, arrivals[last])
+        else:
+            dispatch = deadline
+            while arrivals[last] > deadline:
+                last -= 1
+
+        batch_size = last - index + 1
+        latency = model_latency(batch_size)
+        finish = dispatch + latency / 1000.0
+        latencies.extend((finish - arrival) * 1000 for arrival in arrivals[index:last + 1])
+        batch_sizes.append(batch_size)
+        worker_free = finish
+        index = last + 1
+
+        if controller is not None:
+            controller.observe_batch(finish, batch_size, latency)
+            while finish >= next_control:
+                recommended = controller.recommend(next_control)
+                if recommended is not None:
+                    controller.set_settings(recommended, next_control)
+                    settings = recommended
+                    history.append((next_control, settings))
+                next_control += control_interval
+
+    return SimulationResult(latencies, batch_sizes, history)
+
+
+def record_batch(batch_size, latency, path=BATCH_STATS_FILE):
+    """Appends a batch handled by a worker to the statistics read by the controller.
+
+    Args:
+        batch_size (int): the number of requests in the batch.
+        latency (float): the time the worker took to handle the batch, in milliseconds.
+        path (str): the statistics file.
+    """
+    line = "{:.3f} {} {:.3f}\n".format(time.time(), batch_size, latency).encode("utf-8")
+    # A single write of a short line to a file opened for appending is not interleaved
+    # with the writes of other workers.
+    fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        os.write(fd, line)
+    finally:
+        os.close(fd)
+
+
+class BatchStatsReader(object):
+    """Reads the batches recorded by the workers since the last read."""
+
+    def __init__(self, path=BATCH_STATS_FILE):
+        self._path = path
+        self._offset = 0
+
+    def read(self):
+        """Returns the batches recorded since the last read.
+
+        Returns:
+            list[tuple]: the time in seconds, size and latency in milliseconds of each batch.
+        """
+        try:
+            with open(self._path, "rb") as f:
+                f.seek(self._offset)
+                data = f.read()
+        except FileNotFoundError:
+            return []
+
+        complete = data.rfind(b"\n") + 1
+        self._offset += complete
+        batches = []
+        for line in data[:complete].splitlines():
+            try:
+                timestamp, batch_size, latency = line.split()
+                batches.append((float(timestamp), int(batch_size), float(latency)))
+            except ValueError:
+                continue
+
+        if self._offset > MAX_BATCH_STATS_FILE_SIZE:
+            # Workers append at the end of the file wherever it is, so it can be emptied in place.
+            os.truncate(self._path, 0)
+            self._offset = 0
+        return batches
+
+
+class ManagementApiActuator(object):
+    """Applies batching settings through the TorchServe management API, without interrupting
+    the model, as TorchServe only reads them when registering the model.
+
+    The model is registered again as a new version with the new settings, from a staging
+    directory linking to the files of the model, and made the default version once its
+    workers are up. The previous version is unregistered after its requests in flight had
+    time to complete. If the new version cannot be registered or made the default, the
+    previous one keeps serving. Both versions are loaded during the switch.
+    """
+
+    def __init__(self, model_name, model_url, management_address, handler, staging_dir=None,
+                 sleep=time.sleep):
+        """Initialize a ``ManagementApiActuator``.
+
+        Args:
+            model_name (str): the name of the model.
+            model_url (str): the directory the model is registered from.
+            management_address (str): the address of the TorchServe management API.
+            handler (str): the handler of the model, as ``module:function``.
+            staging_dir (str): where the directories of the new versions are created.
+                Defaults to a directory of the model in the temporary directory.
+            sleep (callable): waits for the given number of seconds.
+        """
+        self._model_name = model_name
+        self._model_url = model_url
+        self._management_address = management_address
+        self._handler = handler
+        self._registered_url = "{}/models/{}".format(management_address, urllib.parse.quote(model_name, safe=""))
+        self._staging_dir = staging_dir or os.path.join(
+            tempfile.gettempdir(), MODEL_VERSIONS_DIRNAME, urllib.parse.quote(model_name, safe="")
+        )
+        self._sleep = sleep
+        self._versions = 0
+        # Do not send local requests through a proxy configured in the environment.
+        self._opener = urllib.request.build_opener(urllib.request.ProxyHandler({}))
+
+    def apply(self, settings, response_timeout=None, workers=None):
+        """Registers a new version of the model with the batching settings, and makes it the
+        default version.
+
+        Args:
+            settings (BatchSettings): the batching settings.
+            response_timeout (int): the response timeout of the new version, in seconds.
+                Defaults to the one of the current version.
+            workers (tuple): the minimum and maximum number of workers of the new version.
+                Defaults to the ones of the current version.
+        """
+        registered = self._describe()
+        model_url = self._registered_url
+        old_version = registered["modelVersion"]
+        if response_timeout is None:
+            response_timeout = registered["responseTimeout"]
+        min_workers, max_workers = workers or (registered["minWorkers"], registered["maxWorkers"])
+
+        major, _, minor = old_version.partition(".")
+        self._versions = max(self._versions, int(minor) if minor.isdigit() else 0) + 1
+        version = "{}.{}".format(major, self._versions)
+        version_dir = self._stage_version(version)
+        version_url = "{}/{}".format(model_url, urllib.parse.quote(version, safe=""))
+
+        query = urllib.parse.urlencode({
+            "url": version_dir,
+            "model_name": self._model_name,
+            "handler": self._handler,
+            "batch_size": settings.batch_size,
+            "max_batch_delay": settings.max_batch_delay,
+            "response_timeout": response_timeout,
+            "initial_workers": min_workers,
+            "synchronous": "true",
+        })
+        try:
+            self._request(urllib.request.Request(
+                "{}/models?{}".format(self._management_address, query), method="POST"
+            ))
+        except Exception:
+            shutil.rmtree(version_dir, ignore_errors=True)
+            raise
+
+        try:
+            if max_workers != min_workers:
+                query = urllib.parse.urlencode({"min_worker": min_workers, "max_worker": max_workers})
+                self._request(urllib.request.Request("{}?{}".format(version_url, query), method="PUT"))
+            self._request(urllib.request.Request(version_url + "/set-default", method="PUT"))
+        except Exception:
+            self._unregister(model_url, version, version_dir)
+            raise
+
+        # Requests already sent to the previous version complete within the response timeout.
+        self._sleep(registered["responseTimeout"])
+        old_dir = registered.get("modelUrl")
+        if not (old_dir and os.path.dirname(os.path.abspath(old_dir)) == os.path.abspath(self._staging_dir)):
+            old_dir = None
+        self._unregister(model_url, old_version, old_dir)
+
+    def workers(self):
+        """int: the number of workers of the default version of the model, or None if it has
+        none yet.
+        """
+        return len(self._describe().get("workers") or ()) or None
+
+    def _describe(self):
+        with self._opener.open(self._registered_url, timeout=MANAGEMENT_API_TIMEOUT) as response:
+            return json.loads(response.read())[0]
+
+    def _stage_version(self, version):
+        """Creates a directory linking to the files of the model, with a manifest giving
+        the version, as TorchServe reads the version of a model from its manifest.
+        """
+        version_dir = os.path.join(self._staging_dir, version)
+        shutil.rmtree(version_dir, ignore_errors=True)
+        os.makedirs(os.path.join(version_dir, MANIFEST_DIRNAME))
+        for name in os.listdir(self._model_url):
+            if name != MANIFEST_DIRNAME:
+                os.symlink(os.path.join(os.path.abspath(self._model_url), name), os.path.join(version_dir, name))
+
+        manifest = {
+            "runtime": "python",
+            "model": {"modelName": self._model_name, "modelVersion": version, "handler": self._handler},
+        }
+        with open(os.path.join(version_dir, MANIFEST_DIRNAME, "MANIFEST.json"), "w") as f:
+            json.dump(manifest, f)
+        return version_dir
+
+    def _unregister(self, model_url, version, version_dir):
+        try:
+            self._request(urllib.request.Request(
+                "{}/{}".format(model_url, urllib.parse.quote(version, safe="")), method="DELETE"
+            ))
+        except Exception as e:  # pylint: disable=broad-except
+            logger.warning("Unable to unregister version %s of model %s: %s", version, self._model_name, e)
+            return
+        if version_dir:
+            shutil.rmtree(version_dir, ignore_errors=True)
+
+    def _request(self, request):
+        # Registering waits for the workers to load the model.
+        timeout = None if request.get_method() == "POST" else MANAGEMENT_API_TIMEOUT
+        with self._opener.open(request, timeout=timeout):
+            pass
+
+
+def run_controller(controller, reader, actuator, interval=10.0, stop_event=None):
+    """Feeds the batches recorded by the workers to the controller, and applies its
+    recommendations, until the stop event is set.
+
+    Args:
+        controller (AdaptiveBatchController): chooses the batching settings.
+        reader (BatchStatsReader): reads the batches recorded by the workers.
+        actuator (ManagementApiActuator): applies batching settings.
+        interval (float): the time between two recommendations, in seconds.
+        stop_event (threading.Event): stops the controller once set.
+    """
+    stop_event = stop_event or threading.Event()
+    while not stop_event.wait(interval):
+        for timestamp, batch_size, latency in reader.read():
+            controller.observe_batch(timestamp, batch_size, latency)
+
+        # TorchServe picks the number of workers when none is configured, and can scale them.
+        try:
+            controller.workers = actuator.workers() or controller.workers
+        except Exception as e:  # pylint: disable=broad-except
+            logger.debug("Unable to read the number of workers: %s", e)
+
+        now = time.time()
+        settings = controller.recommend(now)
+        if settings is None:
+            continue
+
+        logger.info("Changing the batching settings from %s to %s at %.1f requests per second",
+                    controller.settings, settings, controller.arrival_rate)
+        try:
+            actuator.apply(settings)
+        except Exception as e:  # pylint: disable=broad-except
+            logger.warning("Unable to change the batching settings to %s: %s", settings, e)
+            settings = controller.settings
+        controller.set_settings(settings, now)
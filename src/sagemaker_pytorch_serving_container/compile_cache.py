@@ -0,0 +1,145 @@
+# Copyright 2019-2020 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the 'License'). You
+# may not use this file except in compliance with the License. A copy of
+# the License is located at
+#
+#     http://aws.amazon.com/apache2.0/
+#
+# or in the 'license' file accompanying this file. This file is
+# distributed on an 'AS IS' BASIS, WITHOUT WARRANTIES OR CONDITIONS OF
+# ANY KIND, either express or implied. See the License for the specific
+# language governing permissions and limitations under the License.
+"""This module contains functionality to keep the artifacts compiled by
+torch.compile across worker and container restarts.
+"""
+from __future__ import absolute_import
+
+import hashlib
+import logging
+import os
+import tempfile
+
+try:
+    from importlib.metadata import PackageNotFoundError, version
+except ImportError:
+    PackageNotFoundError, version = None, None
+
+logger = logging.getLogger()
+
+COMPILE_CACHE_DIR_ENV = "SAGEMAKER_PYTORCH_COMPILE_CACHE_DIR"
+MODEL_COMPILE_CACHE_DIRNAME = "compile_cache"
+MANIFEST_DIRNAME = "MAR-INF"
+DEFAULT_COMPILE_CACHE_DIR = os.path.join(tempfile.gettempdir(), "sagemaker-pytorch-compile-cache")
+
+INDUCTOR_CACHE_DIR_ENV = "TORCHINDUCTOR_CACHE_DIR"
+TRITON_CACHE_DIR_ENV = "TRITON_CACHE_DIR"
+FX_GRAPH_CACHE_ENV = "TORCHINDUCTOR_FX_GRAPH_CACHE"
+
+# Files up to this size, such as code and configuration, are fingerprinted by their content.
+MAX_HASHED_FILE_SIZE = 1024 * 1024
+
+
+def configure_compile_cache(model_dir=None):
+    """Points the TorchInductor, FX graph and Triton caches of the workers to be
+    started at a cache directory that survives worker and container restarts.
+
+    The cache lives in SAGEMAKER_PYTORCH_COMPILE_CACHE_DIR if set, otherwise in a
+    ``compile_cache`` directory of the model directory when it is writable, so that
+    artifacts compiled ahead of time can be shipped with the model, and in the
+    temporary directory as a last resort. Within it, artifacts are kept per torch
+    version and model, so that they are only reused when both match.
+
+    Caches configured explicitly through their own environment variables are left
+    untouched.
+
+    Args:
+        model_dir (str): the model directory, or None if it is not known in advance,
+            as with multi-model endpoints.
+
+    Returns:
+        str: the cache directory, or None if it could not be created.
+    """
+    cache_dir = os.path.join(_cache_base_dir(model_dir), _cache_key(model_dir))
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+    except OSError as e:
+        logger.warning("Unable to create the compile cache directory %s: %s", cache_dir, e)
+        return None
+
+    os.environ.setdefault(INDUCTOR_CACHE_DIR_ENV, os.path.join(cache_dir, "inductor"))
+    os.environ.setdefault(TRITON_CACHE_DIR_ENV, os.path.join(cache_dir, "triton"))
+    os.environ.setdefault(FX_GRAPH_CACHE_ENV, "1")
+    logger.info("Using compile cache directory %s", cache_dir)
+    return cache_dir
+
+
+def _cache_base_dir(model_dir):
+    cache_dir = os.getenv(COMPILE_CACHE_DIR_ENV)
+    if cache_dir:
+        return cache_dir
+    if model_dir and os.access(model_dir, os.W_OK):
+        return os.path.join(model_dir, MODEL_COMPILE_CACHE_DIRNAME)
+    return DEFAULT_COMPILE_CACHE_DIR
+
+
+def _cache_key(model_dir):
+    """Returns the name of the cache directory for the installed torch version and
+    the model, identified by its fingerprint.
+    """
+    key = "torch-{}".format(_torch_version())
+    if model_dir:
+        key += "-{}".format(model_fingerprint(model_dir))
+    return key
+
+
+def model_fingerprint(model_dir, mtimes=False):
+    """Returns a short fingerprint of the files in the model directory, excluding
+    the compile cache and the archive manifest: their paths and sizes, and the content of the files of up to
+    1 MiB, such as code and configuration. Large files, such as weights, are not read.
+
+    Modification times are left out by default, as they do not survive packaging
+    the model in an archive, so that caches compiled ahead of time and shipped with
+    the model match the extracted model.
+
+    Args:
+        model_dir (str): the model directory.
+        mtimes (bool): whether to include the modification times of the files, to
+            tell apart versions of large files of the same size within an instance.
+
+    Returns:
+        str: a hexadecimal fingerprint.
+    """
+    digest = hashlib.sha256()
+    for root, dirs, files in os.walk(model_dir, followlinks=True):
+        if root == model_dir:
+            dirs[:] = [name for name in dirs if name not in (MODEL_COMPILE_CACHE_DIRNAME, MANIFEST_DIRNAME)]
+        dirs.sort()
+        for name in sorted(files):
+            path = os.path.join(root, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            digest.update(
+                "{}:{}:{}\n".format(
+                    os.path.relpath(path, model_dir), stat.st_size, stat.st_mtime_ns if mtimes else ""
+                ).encode("utf-8")
+            )
+            if stat.st_size <= MAX_HASHED_FILE_SIZE:
+                try:
+                    with open(path, "rb") as f:
+                        digest.update(f.read())
+                except OSError:
+                    continue
+    return digest.hexdigest()[:16]
+
+
+def _torch_version():
+    # Read from the package metadata, so that the launcher does not have to import torch.
+    if version is not None:
+        try:
+            return version("torch")
+        except PackageNotFoundError:
+            pass
+    return "unknown"
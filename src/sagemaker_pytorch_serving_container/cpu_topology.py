@@ -0,0 +1,294 @@
+# Copyright 2019-2020 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the 'License'). You
+# may not use this file except in compliance with the License. A copy of
+# the License is located at
+#
+#     http://aws.amazon.com/apache2.0/
+#
+# or in the 'license' file accompanying this file. This file is
+# distributed on an 'AS IS' BASIS, WITHOUT WARRANTIES OR CONDITIONS OF
+# ANY KIND, either express or implied. See the License for the specific
+# language governing permissions and limitations under the License.
+"""This module contains functionality to read the CPU topology of the container,
+plan the number of TorchServe workers and their threads from it, and pin each
+worker to its own cores.
+"""
+from __future__ import absolute_import
+
+import collections
+import ctypes
+import ctypes.util
+import fcntl
+import glob
+import logging
+import math
+import os
+import tempfile
+
+logger = logging.getLogger()
+
+SYS_DIR = "/sys"
+PROC_DIR = "/proc"
+WORKER_SLOT_LOCK_FILE = "sagemaker-ts-worker-slot-{}.lock"
+
+# The lock of the worker slot claimed by this process, held until it exits.
+_worker_slot_lock = None
+
+CpuTopology = collections.namedtuple(
+    "CpuTopology", ["cpus", "cpu_quota", "physical_cores", "numa_nodes", "gpus"]
+)
+CpuTopology.__doc__ = """The CPU resources available to the container.
+
+Attributes:
+    cpus (frozenset): the logical CPUs the process may run on.
+    cpu_quota (float): the number of CPUs allowed by the cgroup quota, or None if unlimited.
+    physical_cores (int): the number of physical cores among ``cpus``.
+    numa_nodes (list[frozenset]): the logical CPUs of ``cpus`` on each NUMA node.
+    gpus (int): the number of NVIDIA GPUs.
+"""
+
+PhysicalCore = collections.namedtuple("PhysicalCore", ["numa_node", "cpus"])
+PhysicalCore.__doc__ = """A physical core.
+
+Attributes:
+    numa_node (int): the NUMA node of the core.
+    cpus (tuple): the logical CPUs of the core, that is its hyperthreads.
+"""
+
+WorkerPlan = collections.namedtuple("WorkerPlan", ["workers", "intra_op_threads", "inter_op_threads"])
+WorkerPlan.__doc__ = """The number of workers and of threads per worker.
+
+Attributes:
+    workers (int): the number of TorchServe workers per model.
+    intra_op_threads (int): the threads each worker uses within an operator.
+    inter_op_threads (int): the threads each worker uses to run operators in parallel.
+"""
+
+
+def read_cpu_topology(sys_dir=SYS_DIR, proc_dir=PROC_DIR):
+    """Reads the CPU topology of the container from sysfs and procfs.
+
+    Args:
+        sys_dir (str): where sysfs is mounted.
+        proc_dir (str): where procfs is mounted.
+
+    Returns:
+        CpuTopology: the CPU resources available to the container.
+    """
+    cpus = _available_cpus()
+    numa_nodes = [node_cpus & cpus for node_cpus in _read_numa_nodes(sys_dir).values()]
+    numa_nodes = [node_cpus for node_cpus in numa_nodes if node_cpus]
+
+    return CpuTopology(
+        cpus=cpus,
+        cpu_quota=_read_cpu_quota(sys_dir),
+        physical_cores=len(read_physical_cores(sys_dir, cpus)),
+        numa_nodes=numa_nodes or [cpus],
+        gpus=len(glob.glob(os.path.join(proc_dir, "driver", "nvidia", "gpus", "*"))),
+    )
+
+
+def read_physical_cores(sys_dir=SYS_DIR, cpus=None):
+    """Reads the physical cores among the given logical CPUs from sysfs.
+
+    Args:
+        sys_dir (str): where sysfs is mounted.
+        cpus (frozenset): the logical CPUs, by default the ones the process may run on.
+
+    Returns:
+        list[PhysicalCore]: the physical cores, ordered by NUMA node and logical CPU. Each logical
+            CPU counts as a physical core if the core topology cannot be read.
+    """
+    if cpus is None:
+        cpus = _available_cpus()
+    node_of_cpu = {cpu: node for node, node_cpus in _read_numa_nodes(sys_dir).items() for cpu in node_cpus}
+
+    core_cpus = collections.defaultdict(list)
+    for cpu in sorted(cpus):
+        topology_dir = os.path.join(sys_dir, "devices", "system", "cpu", "cpu{}".format(cpu), "topology")
+        package_id = _read(os.path.join(topology_dir, "physical_package_id"))
+        core_id = _read(os.path.join(topology_dir, "core_id"))
+        if package_id is None or core_id is None:
+            return [PhysicalCore(node_of_cpu.get(cpu, 0), (cpu,)) for cpu in sorted(cpus)]
+        core_cpus[(package_id, core_id)].append(cpu)
+
+    cores = [PhysicalCore(node_of_cpu.get(siblings[0], 0), tuple(siblings)) for siblings in core_cpus.values()]
+    return sorted(cores, key=lambda core: (core.numa_node, core.cpus))
+
+
+def plan_workers(topology, workers=None, threads_per_worker=None):
+    """Plans the number of workers and their threads so that together they use each
+    available physical core once.
+
+    Unless given, the number of workers is one per GPU, or one per ``threads_per_worker``
+    cores if given, otherwise one per NUMA node. Each worker then gets an equal share of
+    the cores for its intra-op threads, and a single inter-op thread.
+
+    Args:
+        topology (CpuTopology): the CPU resources available to the container.
+        workers (int): the number of workers, if configured explicitly.
+        threads_per_worker (int): the number of intra-op threads wanted per worker.
+
+    Returns:
+        WorkerPlan: the number of workers and of threads per worker.
+    """
+    cores = _usable_cores(topology.physical_cores, topology.cpu_quota)
+
+    if not workers:
+        if topology.gpus:
+            workers = topology.gpus
+        elif threads_per_worker:
+            workers = max(1, cores // threads_per_worker)
+        else:
+            workers = min(len(topology.numa_nodes), cores)
+
+    return WorkerPlan(workers=workers, intra_op_threads=max(1, cores // workers), inter_op_threads=1)
+
+
+def pin_worker(workers, lock_dir=None, sys_dir=SYS_DIR):
+    """Pins the calling worker to its own physical cores and prefers allocating its memory
+    on their NUMA node.
+
+    Workers do not know their index, so each claims the first free worker slot, by locking a
+    file that stays locked until the worker exits and a replacement worker can claim it. The
+    physical cores, ordered by NUMA node and limited to the cgroup CPU quota, are split into
+    one contiguous range per slot, so that the workers run on disjoint cores, each on as few
+    NUMA nodes as possible. The worker runs on one hyperthread of each of its cores.
+
+    Args:
+        workers (int): the number of workers to split the cores between.
+        lock_dir (str): where the worker slots are locked. Defaults to the temporary directory.
+        sys_dir (str): where sysfs is mounted.
+
+    Returns:
+        frozenset: the logical CPUs the worker is pinned to, or None if it was not pinned.
+    """
+    global _worker_slot_lock  # pylint: disable=global-statement
+
+    cores = read_physical_cores(sys_dir)
+    if not cores or not hasattr(os, "sched_setaffinity"):
+        return None
+    cores = cores[:_usable_cores(len(cores), _read_cpu_quota(sys_dir))]
+
+    slot, slot_lock = _claim_worker_slot(workers, lock_dir or tempfile.gettempdir())
+    if slot is None:
+        logger.warning("All %s worker slots are taken, the worker is not pinned to cores.", workers)
+        return None
+
+    worker_cores = assign_cores(cores, workers, slot)
+    cpus = frozenset(core.cpus[0] for core in worker_cores)
+    os.sched_setaffinity(0, cpus)
+    numa_node = collections.Counter(core.numa_node for core in worker_cores).most_common(1)[0][0]
+    _prefer_numa_node(numa_node)
+    _worker_slot_lock = slot_lock
+
+    logger.info("Worker slot %s pinned to CPUs %s on NUMA node %s.", slot, sorted(cpus), numa_node)
+    return cpus
+
+
+def assign_cores(cores, workers, slot):
+    """Returns the physical cores of a worker slot: a contiguous range of the cores, or a
+    single core shared with other slots if there are more workers than cores.
+
+    Args:
+        cores (list[PhysicalCore]): the physical cores, ordered by NUMA node.
+        workers (int): the number of worker slots.
+        slot (int): the worker slot.
+
+    Returns:
+        list[PhysicalCore]: the physical cores of the worker slot.
+    """
+    if workers >= len(cores):
+        return [cores[slot % len(cores)]]
+    return cores[slot * len(cores) // workers:(slot + 1) * len(cores) // workers]
+
+
+def _claim_worker_slot(workers, lock_dir):
+    for slot in range(workers):
+        lock_file = open(os.path.join(lock_dir, WORKER_SLOT_LOCK_FILE.format(slot)), "a")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            continue
+        return slot, lock_file
+    return None, None
+
+
+def _prefer_numa_node(numa_node):
+    """Makes the process allocate its memory on the NUMA node when possible, through libnuma
+    if it is installed. Allocations still fall back to other nodes rather than fail.
+    """
+    library = ctypes.util.find_library("numa")
+    if library is None:
+        logger.info("libnuma is not installed, memory is allocated on the node of the allocating CPU.")
+        return False
+    try:
+        libnuma = ctypes.CDLL(library)
+        if libnuma.numa_available() < 0:
+            return False
+        libnuma.numa_set_preferred(numa_node)
+    except (OSError, AttributeError) as e:
+        logger.warning("Unable to prefer NUMA node %s: %s", numa_node, e)
+        return False
+    return True
+
+
+def _usable_cores(physical_cores, cpu_quota):
+    if cpu_quota is None:
+        return physical_cores
+    return min(physical_cores, max(1, int(math.ceil(cpu_quota))))
+
+
+def _read_cpu_quota(sys_dir):
+    """Returns the number of CPUs allowed by the cgroup v2 or v1 CPU quota, or None if unlimited."""
+    cpu_max = _read(os.path.join(sys_dir, "fs", "cgroup", "cpu.max"))
+    if cpu_max is not None:
+        quota, _, period = cpu_max.partition(" ")
+    else:
+        quota = _read(os.path.join(sys_dir, "fs", "cgroup", "cpu", "cpu.cfs_quota_us"))
+        period = _read(os.path.join(sys_dir, "fs", "cgroup", "cpu", "cpu.cfs_period_us"))
+    try:
+        quota, period = int(quota), int(period)
+    except (TypeError, ValueError):
+        return None
+    if quota <= 0 or period <= 0:
+        return None
+    return quota / period
+
+
+def _available_cpus():
+    if hasattr(os, "sched_getaffinity"):
+        return frozenset(os.sched_getaffinity(0))
+    return frozenset(range(os.cpu_count() or 1))
+
+
+def _read_numa_nodes(sys_dir):
+    """Returns the logical CPUs of each NUMA node, by node number."""
+    numa_nodes = {}
+    for node_dir in glob.glob(os.path.join(sys_dir, "devices", "system", "node", "node*")):
+        node = os.path.basename(node_dir)[len("node"):]
+        cpulist = _read(os.path.join(node_dir, "cpulist"))
+        if node.isdigit() and cpulist is not None:
+            numa_nodes[int(node)] = _parse_cpulist(cpulist)
+    return dict(sorted(numa_nodes.items()))
+
+
+def _parse_cpulist(cpulist):
+    """Parses a cpulist such as 0-3,8-11 into a set of CPUs."""
+    cpus = set()
+    for cpu_range in cpulist.split(","):
+        if not cpu_range.strip():
+            continue
+        first, _, last = cpu_range.partition("-")
+        cpus.update(range(int(first), int(last or first) + 1))
+    return frozenset(cpus)
+
+
+def _read(path):
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        return None
@@ -12,8 +12,16 @@
 # language governing permissions and limitations under the License.
 from __future__ import absolute_import
 
+import contextlib
+import inspect
+import json
+import logging
 import os
+import struct
+import zipfile
+from collections.abc import Mapping
 
+import numpy as np
 import torch
 from sagemaker_inference import (
     content_types,
@@ -24,8 +32,123 @@ from sagemaker_inference import (
     utils,
 )
 
+from sagemaker_pytorch_serving_container import compile_cache
+from sagemaker_pytorch_serving_container.compile_cache import FX_GRAPH_CACHE_ENV
+
 INFERENCE_ACCELERATOR_PRESENT_ENV = "SAGEMAKER_INFERENCE_ACCELERATOR_PRESENT"
+EXECUTION_MODE_ENV = "SAGEMAKER_PYTORCH_EXECUTION_MODE"
+OPTIMIZATION_ENV = "SAGEMAKER_PYTORCH_OPTIMIZATION"
+COMPILE_MODE_ENV = "SAGEMAKER_PYTORCH_COMPILE_MODE"
+COMPILE_BACKEND_ENV = "SAGEMAKER_PYTORCH_COMPILE_BACKEND"
 DEFAULT_MODEL_FILENAME = "model.pt"
+SAFETENSORS_EXTENSION = ".safetensors"
+MODEL_FILE_EXTENSIONS = (".pt", ".pth")
+
+SAFETENSORS_DTYPES = {
+    name: getattr(torch, dtype)
+    for name, dtype in (
+        ("F64", "float64"), ("F32", "float32"), ("F16", "float16"), ("BF16", "bfloat16"),
+        ("F8_E4M3", "float8_e4m3fn"), ("F8_E5M2", "float8_e5m2"),
+        ("I64", "int64"), ("I32", "int32"), ("I16", "int16"), ("I8", "int8"),
+        ("U64", "uint64"), ("U32", "uint32"), ("U16", "uint16"), ("U8", "uint8"), ("BOOL", "bool"),
+    )
+    if hasattr(torch, dtype)
+}
+
+INFERENCE_MODE = "inference_mode"
+NO_GRAD = "no_grad"
+BF16_AUTOCAST = "bf16_autocast"
+CHANNELS_LAST = "channels_last"
+EXECUTION_MODES = (INFERENCE_MODE, NO_GRAD, BF16_AUTOCAST, CHANNELS_LAST)
+DEFAULT_EXECUTION_MODE = INFERENCE_MODE
+NUMPY_FLOAT_DTYPES = (torch.float16, torch.float32, torch.float64)
+
+NO_OPTIMIZATION = "none"
+FREEZE = "freeze"
+COMPILE = "compile"
+OPTIMIZATIONS = (NO_OPTIMIZATION, FREEZE, COMPILE)
+DEFAULT_COMPILE_BACKEND = "inductor"
+
+logger = logging.getLogger()
+
+
+def _configure_compile_cache(model_dir):
+    """Configures the compile caches with compile_cache.configure_compile_cache, unless they
+    were configured by start_torchserve or explicitly through their environment variables.
+    """
+    compile_cache.configure_compile_cache(model_dir)
+    try:
+        from torch._inductor import config as inductor_config
+    except ImportError:
+        return
+    # The inductor config reads TORCHINDUCTOR_FX_GRAPH_CACHE when it is first imported.
+    inductor_config.fx_graph_cache = os.environ.get(FX_GRAPH_CACHE_ENV) == "1"
+
+
+def _is_torchscript_archive(model_path):
+    """Returns whether a zip archive was saved with torch.jit.save rather than torch.save."""
+    with zipfile.ZipFile(model_path) as archive:
+        return any(name.endswith("/constants.pkl") for name in archive.namelist())
+
+
+def _load_model(model_path, device):
+    """Loads a model file: TorchScript archives with torch.jit.load, files in the torch.save zip
+    format with torch.load(mmap=True), and other files with torch.jit.load, then torch.load.
+    """
+    if zipfile.is_zipfile(model_path):
+        if _is_torchscript_archive(model_path):
+            return torch.jit.load(model_path, map_location=device)
+        return torch.load(model_path, map_location=device, mmap=True, weights_only=False)
+    try:
+        return torch.jit.load(model_path, map_location=device)
+    except RuntimeError:
+        # Checkpoints saved with the legacy torch.save format cannot be memory-mapped.
+        return torch.load(model_path, map_location=device, weights_only=False)
+
+
+def load_state_dict(model_path, map_location=None):
+    """Loads a state dict from a safetensors file, or a checkpoint saved with torch.save.
+    The file is memory-mapped, so that weights are paged in lazily instead of read upfront,
+    and the pages of the file are shared by the processes loading it.
+
+    Args:
+        model_path: path of a .safetensors, .pt or .pth file
+        map_location: device to load the tensors on. By default, tensors stay on CPU, mapped
+            to the file.
+
+    Returns: a dict of tensors by parameter name
+    """
+    if model_path.endswith(SAFETENSORS_EXTENSION):
+        state_dict = _load_safetensors(model_path)
+        if map_location is not None:
+            state_dict = {name: tensor.to(map_location) for name, tensor in state_dict.items()}
+        return state_dict
+    return torch.load(model_path, map_location=map_location, mmap=zipfile.is_zipfile(model_path),
+                      weights_only=False)
+
+
+def _load_safetensors(model_path):
+    """Loads the tensors of a safetensors file as views over a private memory mapping of the file."""
+    size = os.path.getsize(model_path)
+    data = torch.empty(0, dtype=torch.uint8).set_(torch.UntypedStorage.from_file(model_path, False, size))
+    (header_length,) = struct.unpack("<Q", data[:8].numpy().tobytes())
+    header = json.loads(data[8:8 + header_length].numpy().tobytes())
+    data_start = 8 + header_length
+
+    state_dict = {}
+    for name, tensor_info in header.items():
+        if name == "__metadata__":
+            continue
+        if tensor_info["dtype"] not in SAFETENSORS_DTYPES:
+            raise ValueError("Unsupported safetensors dtype {} for tensor {}".format(tensor_info["dtype"], name))
+        dtype = SAFETENSORS_DTYPES[tensor_info["dtype"]]
+        begin, end = tensor_info["data_offsets"]
+        tensor_data = data[data_start + begin:data_start + end]
+        if (data_start + begin) % dtype.itemsize:
+            # Viewing bytes as a wider dtype requires an aligned offset.
+            tensor_data = tensor_data.clone()
+        state_dict[name] = tensor_data.view(dtype).reshape(tensor_info["shape"])
+    return state_dict
 
 
 class ModelLoadError(Exception):
@@ -33,19 +156,79 @@ class ModelLoadError(Exception):
 
 
 class DefaultPytorchInferenceHandler(default_inference_handler.DefaultInferenceHandler):
-    VALID_CONTENT_TYPES = (content_types.JSON, content_types.NPY)
+    VALID_CONTENT_TYPES = (
+        content_types.JSON, content_types.NPY, content_types.NPZ, content_types.SAFETENSORS)
+
+    def __init__(self):
+        self._device = None
+        self._accelerator_present = False
+        self._execution_mode = None
+        self._batch_predictions = True
+
+    def _get_device(self):
+        """Returns the device used for inference, resolving it on first use."""
+        if self._device is None:
+            self._accelerator_present = os.getenv(INFERENCE_ACCELERATOR_PRESENT_ENV) == "true"
+            if self._accelerator_present:
+                # Client-framework is CPU only. But model will run in Elastic Inference server with CUDA.
+                self._device = torch.device("cpu")
+            else:
+                self._device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+        return self._device
+
+    def _get_execution_mode(self):
+        """Returns the set of execution options selected through SAGEMAKER_PYTORCH_EXECUTION_MODE,
+        a comma-separated list of inference_mode, no_grad, bf16_autocast and channels_last.
+        """
+        if self._execution_mode is None:
+            value = os.getenv(EXECUTION_MODE_ENV) or DEFAULT_EXECUTION_MODE
+            execution_mode = frozenset(option.strip() for option in value.split(",") if option.strip())
+            unknown_options = execution_mode.difference(EXECUTION_MODES)
+            if unknown_options:
+                raise ValueError("Unsupported {} option(s) {}. Supported options are: {}".format(
+                    EXECUTION_MODE_ENV, sorted(unknown_options), ", ".join(EXECUTION_MODES)))
+            if INFERENCE_MODE in execution_mode and NO_GRAD in execution_mode:
+                raise ValueError("{} and {} cannot be used together in {}".format(
+                    INFERENCE_MODE, NO_GRAD, EXECUTION_MODE_ENV))
+            self._execution_mode = execution_mode
+        return self._execution_mode
+
+    @contextlib.contextmanager
+    def default_predict_context(self):
+        """The context in which predictions are made: torch.inference_mode(), or torch.no_grad()
+        if selected, optionally combined with bfloat16 autocast.
+        """
+        execution_mode = self._get_execution_mode()
+        grad_mode = torch.no_grad() if NO_GRAD in execution_mode else torch.inference_mode()
+        with grad_mode:
+            if BF16_AUTOCAST in execution_mode:
+                with torch.autocast(device_type=self._get_device().type, dtype=torch.bfloat16):
+                    yield
+            else:
+                yield
+
+    def default_user_predict_context(self):
+        """The context in which predict_fn and batch_predict_fn from the user module are called:
+        default_predict_context if SAGEMAKER_PYTORCH_EXECUTION_MODE is set, otherwise none, so
+        that user handlers can still use autograd and modify their predictions in place.
+        """
+        if os.getenv(EXECUTION_MODE_ENV):
+            return self.default_predict_context()
+        return contextlib.nullcontext()
 
     @staticmethod
     def _is_model_file(filename):
         is_model_file = False
         if os.path.isfile(filename):
             _, ext = os.path.splitext(filename)
-            is_model_file = ext in [".pt", ".pth"]
+            is_model_file = ext in MODEL_FILE_EXTENSIONS
         return is_model_file
 
     def default_model_fn(self, model_dir):
-        """Loads a model. For PyTorch, a default function to load a model only if Elastic Inference is used.
-        In other cases, users should provide customized model_fn() in script.
+        """Loads a model. For PyTorch, a default function to load a TorchScript model, or an eager
+        model saved with torch.save, which is memory-mapped so that its weights are paged in lazily.
+        Checkpoints holding only a state dict, such as .safetensors files, which are not looked for,
+        need a customized model_fn in script, which can load the weights with load_state_dict().
 
         Args:
             model_dir: a directory where model is saved.
@@ -68,66 +251,265 @@ class DefaultPytorchInferenceHandler(default_inference_handler.DefaultInferenceH
             device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
             model_path = os.path.join(model_dir, DEFAULT_MODEL_FILENAME)
             if not os.path.exists(model_path):
-                model_files = [file for file in os.listdir(model_dir) if self._is_model_file(file)]
+                model_files = [file for file in os.listdir(model_dir)
+                               if self._is_model_file(os.path.join(model_dir, file))]
+                if not model_files and any(file.endswith(SAFETENSORS_EXTENSION) for file in os.listdir(model_dir)):
+                    raise ModelLoadError(
+                        "{} only holds .safetensors state dicts. Please provide a model_fn that creates the "
+                        "model and loads its weights, for example with load_state_dict().".format(model_dir)
+                    )
                 if len(model_files) != 1:
                     raise ValueError(
                         "Exactly one .pth or .pt file is required for PyTorch models: {}".format(model_files)
                     )
                 model_path = os.path.join(model_dir, model_files[0])
             try:
-                model = torch.jit.load(model_path, map_location=device)
-            except RuntimeError as e:
+                model = _load_model(model_path, device)
+            except Exception as e:  # pylint: disable=broad-except
                 raise ModelLoadError(
-                    "Failed to load {}. Please ensure model is saved using torchscript.".format(model_path)
+                    "Failed to load {}. Please ensure model is saved using torchscript or torch.save."
+                    .format(model_path)
                 ) from e
+            if isinstance(model, Mapping):
+                raise ModelLoadError(
+                    "{} only holds a state dict. Please provide a model_fn that creates the model and "
+                    "loads its weights, for example with load_state_dict().".format(model_path)
+                )
             model = model.to(device)
             return model
 
+    def default_post_model_fn(self, model):
+        """A default post_model_fn for PyTorch. Prepares the model loaded by model_fn once:
+        places it on the device used for inference, converts it to the channels_last memory
+        format if selected, and sets it to evaluation mode.
+
+        Args:
+            model: PyTorch model loaded in memory by model_fn
+
+        Returns: the model ready for predictions
+        """
+        device = self._get_device()
+        if isinstance(model, torch.nn.Module):
+            model = model.to(device)
+            if CHANNELS_LAST in self._get_execution_mode():
+                model = model.to(memory_format=torch.channels_last)
+            model.eval()
+        return model
+
+    def default_optimize_model_fn(self, model, context=None):
+        """A default optimize_model_fn for PyTorch. Optimizes the model prepared by post_model_fn
+        as selected through SAGEMAKER_PYTORCH_OPTIMIZATION:
+
+            - none (default): the model is used as is.
+            - freeze: a TorchScript model is frozen and optimized with
+              torch.jit.optimize_for_inference.
+            - compile: an eager model is compiled with torch.compile, using the mode from
+              SAGEMAKER_PYTORCH_COMPILE_MODE and the backend from SAGEMAKER_PYTORCH_COMPILE_BACKEND.
+              Compiled artifacts are cached per torch version and model, as configured by
+              compile_cache.configure_compile_cache, so that restarted workers reuse them
+              instead of compiling again.
+
+        Models the selected optimization does not apply to are used as is.
+
+        Args:
+            model: PyTorch model prepared by post_model_fn
+            context: the model server context, giving the model directory
+
+        Returns: the optimized model
+        """
+        optimization = (os.getenv(OPTIMIZATION_ENV) or NO_OPTIMIZATION).strip().lower()
+        if optimization not in OPTIMIZATIONS:
+            raise ValueError("Unsupported {} {}. Supported optimizations are: {}".format(
+                OPTIMIZATION_ENV, optimization, ", ".join(OPTIMIZATIONS)))
+
+        is_script_module = isinstance(model, torch.jit.ScriptModule)
+        if optimization == FREEZE:
+            if is_script_module:
+                return torch.jit.optimize_for_inference(torch.jit.freeze(model.eval()))
+            logger.warning("Only TorchScript models can be frozen, using %s as is.", type(model).__name__)
+        elif optimization == COMPILE:
+            if isinstance(model, torch.nn.Module) and not is_script_module:
+                _configure_compile_cache(context.system_properties.get("model_dir") if context else None)
+                return torch.compile(
+                    model,
+                    mode=os.getenv(COMPILE_MODE_ENV) or None,
+                    backend=os.getenv(COMPILE_BACKEND_ENV) or DEFAULT_COMPILE_BACKEND,
+                )
+            logger.warning("Only eager models can be compiled, using %s as is.", type(model).__name__)
+        return model
+
     def default_input_fn(self, input_data, content_type):
-        """A default input_fn that can handle JSON, CSV and NPZ formats.
+        """A default input_fn that can handle JSON, CSV, NPY, NPZ and safetensors formats.
 
         Args:
             input_data: the request payload serialized in the content_type format
             content_type: the request content_type
 
         Returns: input_data deserialized into torch.FloatTensor or torch.cuda.FloatTensor,
-            depending if cuda is available.
+            depending if cuda is available. On CPU, a NPY payload received as a mutable buffer
+            is not copied: the tensor shares its memory. A NPZ sparse matrix is deserialized
+            into a sparse CSR tensor, or a sparse COO tensor if it is in the COO format.
+            A safetensors payload is deserialized into a dict of tensors by name, which share
+            its memory in the same way as NPY payloads.
         """
-        device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-        np_array = decoder.decode(input_data, content_type)
-        tensor = torch.FloatTensor(
-            np_array) if content_type in content_types.UTF8_TYPES else torch.from_numpy(np_array)
-        return tensor.to(device)
+        if content_type in content_types.UTF8_TYPES:
+            np_array = decoder.decode(input_data, content_type, dtype=np.float32)
+            return torch.from_numpy(np_array).to(self._get_device())
+        if content_type == content_types.NPZ:
+            return self._sparse_to_tensor(decoder.decode(input_data, content_type)).to(self._get_device())
+        if content_type == content_types.SAFETENSORS:
+            np_arrays = decoder.decode(input_data, content_type)
+            return {name: self._array_to_tensor(np_array) for name, np_array in np_arrays.items()}
+        return self._array_to_tensor(decoder.decode(input_data, content_type))
+
+    def _array_to_tensor(self, np_array):
+        if not np_array.flags.writeable:
+            # Tensors are always writable, so arrays viewing an immutable payload are copied.
+            np_array = np_array.copy()
+        return torch.from_numpy(np_array).to(self._get_device())
+
+    @staticmethod
+    def _sparse_to_tensor(matrix):
+        """Converts a scipy.sparse matrix to a sparse tensor sharing its indices and values.
+        COO matrices become sparse COO tensors, other formats sparse CSR tensors.
+        """
+        if matrix.format == "coo":
+            indices = torch.from_numpy(np.vstack((matrix.row, matrix.col)).astype(np.int64))
+            return torch.sparse_coo_tensor(indices, torch.from_numpy(matrix.data), matrix.shape)
+
+        matrix = matrix.tocsr()
+        return torch.sparse_csr_tensor(
+            torch.from_numpy(matrix.indptr),
+            torch.from_numpy(matrix.indices),
+            torch.from_numpy(matrix.data),
+            matrix.shape,
+        )
 
     def default_predict_fn(self, data, model):
         """A default predict_fn for PyTorch. Calls a model on data deserialized in input_fn.
-        Runs prediction on GPU if cuda is available.
+        Runs prediction on GPU if cuda is available, within default_predict_context. The model
+        is expected to have been prepared by post_model_fn. Sparse tensors are passed to the model
+        as they are, and a dict of tensors is passed as keyword arguments.
 
         Args:
-            data: input data (torch.Tensor) for prediction deserialized by input_fn
+            data: input data (torch.Tensor or dict of torch.Tensor) for prediction deserialized
+                by input_fn
             model: PyTorch model loaded in memory by model_fn
 
         Returns: a prediction
         """
-        with torch.no_grad():
-            if os.getenv(INFERENCE_ACCELERATOR_PRESENT_ENV) == "true":
-                device = torch.device("cpu")
-                model = model.to(device)
-                input_data = data.to(device)
-                model.eval()
+        device = self._get_device()
+        if isinstance(data, dict):
+            return self._predict(model, **{name: tensor.to(device) for name, tensor in data.items()})
+
+        input_data = data.to(device)
+        if (input_data.dim() == 4 and input_data.layout == torch.strided
+                and CHANNELS_LAST in self._get_execution_mode()):
+            input_data = input_data.contiguous(memory_format=torch.channels_last)
+        return self._predict(model, input_data)
+
+    def _predict(self, model, *args, **kwargs):
+        with self._model_context():
+            prediction = model(*args, **kwargs)
+        if inspect.isgenerator(prediction):
+            # The chunks of a streamed prediction are produced as the response is sent.
+            return utils.generate_in_context(prediction, self._model_context)
+        return prediction
+
+    @contextlib.contextmanager
+    def _model_context(self):
+        with self.default_predict_context():
+            if self._accelerator_present:
                 with torch.jit.optimized_execution(True, {"target_device": "eia:0"}):
-                    output = model(input_data)
+                    yield
             else:
-                device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-                model = model.to(device)
-                input_data = data.to(device)
-                model.eval()
-                output = model(input_data)
+                yield
+
+    def default_batch_predict_fn(self, data, model):
+        """A default batch_predict_fn for PyTorch. Concatenates the inputs of a batch of requests
+        along their first dimension, calls the model once, and splits the output back per request.
+        Outputs that are a tensor, or a tuple or dict of tensors, are split along their first
+        dimension. Only inputs with at least two dimensions are concatenated, as the first
+        dimension of a 1-D input is not a batch dimension.
+
+        Falls back to one prediction per request when the inputs cannot be concatenated, such as
+        sparse tensors, when the batched prediction fails, or when its output cannot be split.
+        The exception raised by the prediction of a request is returned in place of its
+        prediction. Once the output of a batched prediction could not be split, or a batched
+        prediction failed while each request could be predicted on its own, the model is deemed
+        not to support batches and one prediction per request is made from then on.
 
-        return output
+        Args:
+            data: list of input data (torch.Tensor) for prediction deserialized by input_fn
+            model: PyTorch model loaded in memory by model_fn
+
+        Returns: a list with the prediction of each request
+        """
+        batch_failed = False
+        if self._batch_predictions and self._can_concatenate(data):
+            sizes = [tensor.shape[0] for tensor in data]
+            try:
+                output = self.default_predict_fn(torch.cat(data), model)
+            except Exception as e:  # pylint: disable=broad-except
+                logger.warning("Batched prediction failed, falling back to one prediction per request: %s", e)
+                batch_failed = True
+            else:
+                predictions = self._split_output(output, sizes)
+                if predictions is not None:
+                    return predictions
+                logger.warning("Unable to split the output of a batched prediction, "
+                               "making one prediction per request from now on.")
+                self._batch_predictions = False
+
+        predictions = [self._predict_request(tensor, model) for tensor in data]
+        if batch_failed and not any(isinstance(prediction, Exception) for prediction in predictions):
+            logger.warning("Each request of the failed batch could be predicted on its own, "
+                           "making one prediction per request from now on.")
+            self._batch_predictions = False
+        return predictions
+
+    def _predict_request(self, data, model):
+        try:
+            return self.default_predict_fn(data, model)
+        except Exception as e:  # pylint: disable=broad-except
+            return e
+
+    @classmethod
+    def _split_output(cls, output, sizes):
+        """Splits the output of a batched prediction per request, or returns None if it cannot
+        be split: it must be a tensor, or a tuple or dict of tensors, with one row per input row.
+        """
+        if isinstance(output, torch.Tensor):
+            if output.dim() > 0 and output.layout == torch.strided and output.shape[0] == sum(sizes):
+                return list(torch.split(output, sizes))
+            return None
+        if type(output) is tuple or isinstance(output, dict):
+            values = list(output.values()) if isinstance(output, dict) else output
+            splits = [cls._split_output(value, sizes) for value in values]
+            if not values or any(split is None for split in splits):
+                return None
+            if isinstance(output, dict):
+                return [dict(zip(output.keys(), request_values)) for request_values in zip(*splits)]
+            return [tuple(request_values) for request_values in zip(*splits)]
+        return None
+
+    @staticmethod
+    def _can_concatenate(data):
+        if len(data) < 2 or not all(isinstance(tensor, torch.Tensor) for tensor in data):
+            return False
+        first = data[0]
+        return first.dim() >= 2 and first.layout == torch.strided and all(
+            tensor.dim() == first.dim() and tensor.layout == first.layout
+            and tensor.shape[1:] == first.shape[1:]
+            and tensor.dtype == first.dtype and tensor.device == first.device
+            for tensor in data
+        )
 
     def default_output_fn(self, prediction, accept):
-        """A default output_fn for PyTorch. Serializes predictions from predict_fn to JSON, CSV or NPY format.
+        """A default output_fn for PyTorch. Serializes predictions from predict_fn to JSON, CSV, NPY
+        or safetensors format. A dict or tuple of tensors is serialized as named tensors in the
+        safetensors format. Floating point tensors numpy has no dtype for, such as bfloat16
+        predictions made under bf16_autocast, are upcast to float32.
 
         Args:
             prediction: a prediction result from predict_fn
@@ -136,7 +518,13 @@ class DefaultPytorchInferenceHandler(default_inference_handler.DefaultInferenceH
         Returns: output data serialized
         """
         if type(prediction) is torch.Tensor:
-            prediction = prediction.detach().cpu().numpy().tolist()
+            if prediction.layout != torch.strided:
+                prediction = prediction.to_dense()
+            prediction = self._to_numpy_dtype(prediction).detach().cpu().numpy()
+        elif isinstance(prediction, dict):
+            prediction = {name: self._to_numpy_dtype(tensor) for name, tensor in prediction.items()}
+        elif isinstance(prediction, tuple):
+            prediction = tuple(self._to_numpy_dtype(tensor) for tensor in prediction)
 
         for content_type in utils.parse_accept(accept):
             if content_type in encoder.SUPPORTED_CONTENT_TYPES:
@@ -146,3 +534,11 @@ class DefaultPytorchInferenceHandler(default_inference_handler.DefaultInferenceH
                 return encoded_prediction
 
         raise errors.UnsupportedFormatError(accept)
+
+    @staticmethod
+    def _to_numpy_dtype(tensor):
+        """Upcasts a tensor of a floating point dtype numpy does not support to float32."""
+        if (isinstance(tensor, torch.Tensor) and tensor.dtype.is_floating_point
+                and tensor.dtype not in NUMPY_FLOAT_DTYPES):
+            return tensor.float()
+        return tensor
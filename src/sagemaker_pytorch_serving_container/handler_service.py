@@ -13,14 +13,25 @@
 from __future__ import absolute_import
 
 from sagemaker_inference.default_handler_service import DefaultHandlerService
+from sagemaker_inference.environment import Environment
 from sagemaker_inference.transformer import Transformer
+from sagemaker_pytorch_serving_container import batch_controller, cpu_topology, model_config
 from sagemaker_pytorch_serving_container.default_pytorch_inference_handler import DefaultPytorchInferenceHandler
+from sagemaker_pytorch_serving_container.shared_model import SharedModelLoader
+from sagemaker_pytorch_serving_container.ts_environment import TorchServeEnvironment
 
+import logging
 import os
 import sys
+import threading
+import time
+
+import torch
 
 ENABLE_MULTI_MODEL = os.getenv("SAGEMAKER_MULTI_MODEL", "false") == "true"
 
+logger = logging.getLogger()
+
 
 class HandlerService(DefaultHandlerService):
 
@@ -37,15 +48,104 @@ class HandlerService(DefaultHandlerService):
     """
     def __init__(self):
         self._initialized = False
+        self._threads_set = False
+        self._model_config_thread = None
+
+        ts_env = TorchServeEnvironment()
+        # With SAGEMAKER_TS_ADAPTIVE_BATCHING, batches are recorded for the batch controller.
+        self._record_batches = ts_env.adaptive_batching and not ENABLE_MULTI_MODEL
 
-        transformer = Transformer(default_inference_handler=DefaultPytorchInferenceHandler())
+        # With SAGEMAKER_TS_PRELOAD_MODEL, the model is loaded once and shared between workers.
+        # Multi-model endpoints load and unload models at will, which would leave their shared
+        # copies behind in memory.
+        model_loader = None
+        if ts_env.preload_model:
+            if ENABLE_MULTI_MODEL:
+                logger.warning("SAGEMAKER_TS_PRELOAD_MODEL is not supported on multi-model endpoints.")
+            else:
+                model_loader = SharedModelLoader()
+        transformer = Transformer(default_inference_handler=DefaultPytorchInferenceHandler(),
+                                  model_loader=model_loader)
         super(HandlerService, self).__init__(transformer=transformer)
 
     def initialize(self, context):
+        if not self._threads_set:
+            self._set_torch_threads()
+            self._threads_set = True
+
         # Adding the 'code' directory path to sys.path to allow importing user modules when multi-model mode is enabled.
         if (not self._initialized) and ENABLE_MULTI_MODEL:
             code_dir = os.path.join(context.system_properties.get("model_dir"), 'code')
             sys.path.append(code_dir)
             self._initialized = True
 
+        if ENABLE_MULTI_MODEL:
+            self._model_config_thread = threading.Thread(
+                target=self._apply_model_config,
+                args=(context.model_name, context.system_properties.get("model_dir")),
+                name="model-config",
+                daemon=True,
+            )
+            self._model_config_thread.start()
+
         super().initialize(context)
+
+    def handle(self, data, context):
+        if not self._record_batches:
+            return super().handle(data, context)
+
+        start = time.perf_counter()
+        response = super().handle(data, context)
+        try:
+            batch_controller.record_batch(len(data), (time.perf_counter() - start) * 1000)
+        except OSError as e:
+            logger.warning("Unable to record the batch: %s", e)
+        return response
+
+    @staticmethod
+    def _apply_model_config(model_name, model_dir):
+        # Models of a multi-model endpoint are registered by SageMaker with the default settings,
+        # so the settings shipped with the model are applied once it is registered. Applying the
+        # batching settings registers the model again, which waits for the workers of the new
+        # version to load the model, so it is done in the background.
+        try:
+            config = model_config.load_model_config(model_dir)
+            if config:
+                management_address = "http://127.0.0.1:{}".format(Environment().management_http_port)
+                handler = os.environ.get("SAGEMAKER_HANDLER", __name__)
+                model_config.apply_model_config(model_name, config, management_address, model_dir, handler)
+        except Exception as e:  # pylint: disable=broad-except
+            logger.warning("Unable to apply the configuration of model %s: %s", model_name, e)
+
+    @staticmethod
+    def _pin_worker(ts_env):
+        # Each worker claims one of as many slots as the model may have workers, so the number of
+        # workers must be known, and the models of a multi-model endpoint would share the slots.
+        if ENABLE_MULTI_MODEL:
+            logger.warning("SAGEMAKER_TS_PIN_CORES is not supported on multi-model endpoints.")
+            return None
+        model_workers = ts_env.model_workers
+        if model_workers is None:
+            logger.warning("SAGEMAKER_TS_PIN_CORES requires the number of workers, set through "
+                           "SAGEMAKER_MODEL_SERVER_WORKERS or planned with SAGEMAKER_TS_AUTO_TUNE_THREADS, "
+                           "the worker is not pinned to cores.")
+            return None
+        return cpu_topology.pin_worker(model_workers[1])
+
+    def _set_torch_threads(self):
+        # Pins the worker to its cores if enabled, and applies the threads planned for each worker,
+        # before the model runs any operator.
+        ts_env = TorchServeEnvironment()
+        intra_op_threads = ts_env.intra_op_threads
+        if ts_env.pin_cores:
+            cpus = self._pin_worker(ts_env)
+            if cpus and not intra_op_threads:
+                intra_op_threads = len(cpus)
+        if intra_op_threads:
+            torch.set_num_threads(intra_op_threads)
+        if ts_env.inter_op_threads:
+            try:
+                torch.set_num_interop_threads(ts_env.inter_op_threads)
+            except RuntimeError as e:
+                # Only possible before inter-op parallel work has started.
+                logger.warning("Unable to set the number of inter-op threads: %s", e)
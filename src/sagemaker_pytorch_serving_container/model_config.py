@@ -0,0 +1,152 @@
+# Copyright 2019-2020 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the 'License'). You
+# may not use this file except in compliance with the License. A copy of
+# the License is located at
+#
+#     http://aws.amazon.com/apache2.0/
+#
+# or in the 'license' file accompanying this file. This file is
+# distributed on an 'AS IS' BASIS, WITHOUT WARRANTIES OR CONDITIONS OF
+# ANY KIND, either express or implied. See the License for the specific
+# language governing permissions and limitations under the License.
+"""This module contains functionality to apply the TorchServe settings shipped
+with a model of a multi-model endpoint.
+"""
+from __future__ import absolute_import
+
+import fcntl
+import json
+import logging
+import os
+import tempfile
+import urllib.parse
+import urllib.request
+
+from sagemaker_pytorch_serving_container import batch_controller
+
+logger = logging.getLogger()
+
+MODEL_CONFIG_FILENAMES = ("model-config.yaml", "model-config.yml", "model-config.json")
+
+MIN_WORKERS = "minWorkers"
+MAX_WORKERS = "maxWorkers"
+BATCH_SIZE = "batchSize"
+MAX_BATCH_DELAY = "maxBatchDelay"
+RESPONSE_TIMEOUT = "responseTimeout"
+MODEL_CONFIG_KEYS = (MIN_WORKERS, MAX_WORKERS, BATCH_SIZE, MAX_BATCH_DELAY, RESPONSE_TIMEOUT)
+# TorchServe only reads these when registering the model.
+REGISTRATION_KEYS = (BATCH_SIZE, MAX_BATCH_DELAY, RESPONSE_TIMEOUT)
+MODEL_CONFIG_LOCK_FILE = "sagemaker-ts-model-config-{}.lock"
+
+MANAGEMENT_API_TIMEOUT = 5
+
+
+def load_model_config(model_dir):
+    """Loads the TorchServe settings of a model from a model-config.yaml or model-config.json
+    file in its code directory, or else at the root of the model directory.
+
+    The file uses the keys of TorchServe's model-config.yaml: minWorkers, maxWorkers,
+    batchSize, maxBatchDelay and responseTimeout. Other keys are ignored.
+
+    Args:
+        model_dir (str): the model directory.
+
+    Returns:
+        dict: the settings of the model, or None if it has no configuration file.
+    """
+    for directory in (os.path.join(model_dir, "code"), model_dir):
+        for filename in MODEL_CONFIG_FILENAMES:
+            path = os.path.join(directory, filename)
+            if os.path.isfile(path):
+                return _read_model_config(path)
+    return None
+
+
+def _read_model_config(path):
+    with open(path) as f:
+        if path.endswith(".json"):
+            config = json.load(f)
+        else:
+            try:
+                import yaml
+            except ImportError as e:
+                raise ImportError(
+                    "PyYAML is required to read {}, or use model-config.json instead.".format(path)
+                ) from e
+            config = yaml.safe_load(f)
+
+    config = config or {}
+    if not isinstance(config, dict):
+        raise ValueError("{} should hold a mapping of TorchServe settings".format(path))
+    return {key: int(config[key]) for key in MODEL_CONFIG_KEYS if key in config}
+
+
+def apply_model_config(model_name, config, management_address, model_dir=None, handler=None):
+    """Applies the settings of a registered model through the TorchServe management API.
+
+    Workers are scaled with ``PUT /models/{model_name}``. TorchServe only reads batchSize,
+    maxBatchDelay and responseTimeout when registering the model, so when they differ from
+    the registered ones, the model is registered again from ``model_dir`` as a new version
+    with all the settings, by ``batch_controller.ManagementApiActuator``, which makes it the
+    default version and then unregisters the previous one. The workers of a model apply the
+    settings one at a time, and compare them with the registered ones first, so that only
+    the first worker of a model applies them.
+
+    Args:
+        model_name (str): the name the model is registered with.
+        config (dict): the settings of the model, as loaded by ``load_model_config``.
+        management_address (str): the address of the TorchServe management API.
+        model_dir (str): the directory the model is registered from, required to apply
+            batchSize, maxBatchDelay and responseTimeout.
+        handler (str): the handler of the model, required to apply batchSize, maxBatchDelay
+            and responseTimeout.
+
+    Returns:
+        bool: whether settings were applied.
+    """
+    lock_path = os.path.join(
+        tempfile.gettempdir(), MODEL_CONFIG_LOCK_FILE.format(urllib.parse.quote(model_name, safe=""))
+    )
+    with open(lock_path, "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        return _apply_model_config(model_name, config, management_address, model_dir, handler)
+
+
+def _apply_model_config(model_name, config, management_address, model_dir, handler):
+    model_url = "{}/models/{}".format(management_address, urllib.parse.quote(model_name, safe=""))
+    # Do not send local requests through a proxy configured in the environment.
+    opener = urllib.request.build_opener(urllib.request.ProxyHandler({}))
+
+    with opener.open(model_url, timeout=MANAGEMENT_API_TIMEOUT) as response:
+        registered = json.loads(response.read())[0]
+
+    min_workers = config.get(MIN_WORKERS, registered.get(MIN_WORKERS))
+    max_workers = max(config.get(MAX_WORKERS, registered.get(MAX_WORKERS)), min_workers)
+
+    if any(key in config and config[key] != registered.get(key) for key in REGISTRATION_KEYS):
+        if model_dir is None or handler is None:
+            raise ValueError("The model directory and handler are required to register model {} again "
+                             "with {}".format(model_name, config))
+        settings = batch_controller.BatchSettings(
+            config.get(BATCH_SIZE, registered.get(BATCH_SIZE)),
+            config.get(MAX_BATCH_DELAY, registered.get(MAX_BATCH_DELAY)),
+        )
+        response_timeout = config.get(RESPONSE_TIMEOUT, registered.get(RESPONSE_TIMEOUT))
+        logger.info("Registering model %s again with %s, a response timeout of %s and %s-%s workers.",
+                    model_name, settings, response_timeout, min_workers, max_workers)
+        actuator = batch_controller.ManagementApiActuator(model_name, model_dir, management_address, handler)
+        actuator.apply(settings, response_timeout=response_timeout, workers=(min_workers, max_workers))
+        return True
+
+    if (min_workers, max_workers) == (registered.get(MIN_WORKERS), registered.get(MAX_WORKERS)):
+        return False
+
+    query = urllib.parse.urlencode(
+        {"min_worker": min_workers, "max_worker": max_workers, "synchronous": "false"}
+    )
+    request = urllib.request.Request("{}?{}".format(model_url, query), method="PUT")
+    with opener.open(request, timeout=MANAGEMENT_API_TIMEOUT):
+        pass
+    logger.info("Scaling model %s to %s-%s workers.", model_name, min_workers, max_workers)
+    return True
@@ -0,0 +1,132 @@
+# Copyright 2019-2020 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"). You
+# may not use this file except in compliance with the License. A copy of
+# the License is located at
+#
+#     http://aws.amazon.com/apache2.0/
+#
+# or in the "license" file accompanying this file. This file is
+# distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF
+# ANY KIND, either express or implied. See the License for the specific
+# language governing permissions and limitations under the License.
+"""This module contains functionality to load a model once per instance and
+share it in memory between the TorchServe workers.
+"""
+from __future__ import absolute_import
+
+import fcntl
+import glob
+import logging
+import os
+import tempfile
+
+import torch
+
+from sagemaker_pytorch_serving_container.compile_cache import model_fingerprint
+
+logger = logging.getLogger()
+
+SHARED_MEMORY_DIR = "/dev/shm"
+SHARED_MODEL_PREFIX = "sagemaker-model-"
+
+
+class SharedModelLoader(object):
+    """Loads a model once per instance and shares it read-only between workers.
+
+    TorchServe starts each worker as a separate Python process, so the model
+    cannot be inherited through fork. Instead, the first worker runs ``model_fn``
+    and saves the model with ``torch.save`` to a file in shared memory. Every
+    worker, including the first one, then loads it with ``torch.load(mmap=True)``:
+    the tensor storages map the pages of that file copy-on-write, so the weights
+    are held in memory once for all workers.
+
+    Only ``torch.nn.Module`` models on CPU are shared. TorchScript modules, which
+    cannot be memory-mapped, models that cannot be pickled, and models on
+    instances with a GPU are loaded with ``model_fn`` in each worker. Note that
+    ``model_fn`` only runs in the first worker.
+
+    The shared file is named after a fingerprint of the files of the model, so
+    that a model updated in place is saved again, and the files saved for previous
+    versions of the model are removed. Versions of the model registered from
+    directories linking to the same files, as the adaptive batch controller does,
+    share the same file.
+    """
+
+    def __init__(self, shared_dir=None):
+        """Initialize a ``SharedModelLoader``.
+
+        Args:
+            shared_dir (str): directory where the model is shared. Defaults to
+                /dev/shm, or the temporary directory if /dev/shm does not exist.
+        """
+        if shared_dir is None:
+            shared_dir = SHARED_MEMORY_DIR if os.path.isdir(SHARED_MEMORY_DIR) else tempfile.gettempdir()
+        self._shared_dir = shared_dir
+
+    def __call__(self, model_fn, model_dir):
+        """Loads the model shared between workers, saving it first if no worker did.
+
+        Args:
+            model_fn (callable): loads the model from the model directory.
+            model_dir (str): the model directory.
+
+        Returns: the model.
+        """
+        if torch.cuda.is_available():
+            return model_fn(model_dir)
+
+        path = self._shared_model_path(model_dir)
+        unsupported_path = path + ".unsupported"
+        with open(path + ".lock", "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            if not os.path.exists(path) and not os.path.exists(unsupported_path):
+                model = model_fn(model_dir)
+                if not self._save(model, path):
+                    open(unsupported_path, "a").close()
+                    return model
+                self._remove_stale_models(path)
+
+        if os.path.exists(path):
+            try:
+                return torch.load(path, mmap=True, weights_only=False)
+            except Exception as e:  # pylint: disable=broad-except
+                logger.warning("Failed to load the shared model %s, loading it with model_fn: %s", path, e)
+        return model_fn(model_dir)
+
+    def _shared_model_path(self, model_dir):
+        return os.path.join(
+            self._shared_dir, "{}{}.pt".format(SHARED_MODEL_PREFIX, model_fingerprint(model_dir, mtimes=True))
+        )
+
+    @staticmethod
+    def _remove_stale_models(path):
+        """Removes the files shared for previous versions of the model. Workers still using
+        them keep their pages mapped until they exit.
+        """
+        prefix = os.path.join(os.path.dirname(path), SHARED_MODEL_PREFIX)
+        for stale_path in glob.glob(glob.escape(prefix) + "*.pt*"):
+            if stale_path.startswith(path):
+                continue
+            try:
+                os.remove(stale_path)
+            except OSError as e:
+                logger.warning("Unable to remove the stale shared model %s: %s", stale_path, e)
+
+    @staticmethod
+    def _save(model, path):
+        """Saves the model to the shared file, returning whether it could be shared."""
+        if not isinstance(model, torch.nn.Module) or isinstance(model, torch.jit.ScriptModule):
+            logger.info("Model of type %s is not shared between workers.", type(model).__name__)
+            return False
+
+        temporary_path = "{}.{}.tmp".format(path, os.getpid())
+        try:
+            torch.save(model, temporary_path)
+            os.replace(temporary_path, path)
+            return True
+        except Exception as e:  # pylint: disable=broad-except
+            logger.warning("Unable to share the model between workers: %s", e)
+            if os.path.exists(temporary_path):
+                os.remove(temporary_path)
+            return False
@@ -16,28 +16,32 @@ from __future__ import absolute_import
 import os
 import signal
 import subprocess
+import tempfile
+import threading
+import time
+import urllib.request
 
-import pkg_resources
 import psutil
 import logging
 from retrying import retry
 
 import sagemaker_pytorch_serving_container
-from sagemaker_pytorch_serving_container import ts_environment
-from sagemaker_inference import environment, utils, model_server
+from sagemaker_pytorch_serving_container import (
+    batch_controller,
+    compile_cache,
+    cpu_topology,
+    ts_environment,
+    ts_parameters,
+)
+from sagemaker_inference import environment, parameters, utils, model_server
 
 logger = logging.getLogger()
 
 TS_CONFIG_FILE = os.path.join("/etc", "sagemaker-ts.properties")
-DEFAULT_TS_CONFIG_FILE = pkg_resources.resource_filename(
-    sagemaker_pytorch_serving_container.__name__, "/etc/default-ts.properties"
-)
-MME_TS_CONFIG_FILE = pkg_resources.resource_filename(
-    sagemaker_pytorch_serving_container.__name__, "/etc/mme-ts.properties"
-)
-DEFAULT_TS_LOG_FILE = pkg_resources.resource_filename(
-    sagemaker_pytorch_serving_container.__name__, "/etc/log4j2.xml"
-)
+PACKAGE_ETC_DIR = os.path.join(os.path.dirname(sagemaker_pytorch_serving_container.__file__), "etc")
+DEFAULT_TS_CONFIG_FILE = os.path.join(PACKAGE_ETC_DIR, "default-ts.properties")
+MME_TS_CONFIG_FILE = os.path.join(PACKAGE_ETC_DIR, "mme-ts.properties")
+DEFAULT_TS_LOG_FILE = os.path.join(PACKAGE_ETC_DIR, "log4j2.xml")
 DEFAULT_TS_MODEL_NAME = "model"
 DEFAULT_HANDLER_SERVICE = "sagemaker_pytorch_serving_container.handler_service"
 
@@ -46,6 +50,9 @@ MODEL_STORE = "/" if ENABLE_MULTI_MODEL else os.path.join(os.getcwd(), ".sagemak
 
 PYTHON_PATH_ENV = "PYTHONPATH"
 TS_NAMESPACE = "org.pytorch.serve.ModelServer"
+# Written by ``torchserve --start`` with the pid of the TorchServe frontend.
+TS_PID_FILE = os.path.join(tempfile.gettempdir(), ".model_server.pid")
+READINESS_POLL_INTERVAL = 0.5
 
 
 def start_torchserve(handler_service=DEFAULT_HANDLER_SERVICE):
@@ -73,6 +80,10 @@ def start_torchserve(handler_service=DEFAULT_HANDLER_SERVICE):
 
     _set_python_path()
 
+    _set_compile_cache()
+
+    _tune_cpu_threads()
+
     _create_torchserve_config_file(handler_service)
 
     if os.path.exists(model_server.REQUIREMENTS_PATH):
@@ -97,12 +108,15 @@ def start_torchserve(handler_service=DEFAULT_HANDLER_SERVICE):
     print(ts_torchserve_cmd)
 
     logger.info(ts_torchserve_cmd)
-    subprocess.Popen(ts_torchserve_cmd)
+    launcher = subprocess.Popen(ts_torchserve_cmd)
 
-    ts_process = _retrieve_ts_server_process()
+    ts_process = _find_ts_server_process(launcher)
 
     _add_sigterm_handler(ts_process)
 
+    if _wait_for_ready(ts_process):
+        _start_batch_controller(handler_service)
+
     ts_process.wait()
 
 
@@ -117,6 +131,41 @@ def _set_python_path():
         os.environ[PYTHON_PATH_ENV] = environment.code_dir
 
 
+def _set_compile_cache():
+    # Exported before TorchServe starts, so that every worker shares the compile cache.
+    # With multi-model endpoints, the models are not known yet and share a cache per torch version.
+    compile_cache.configure_compile_cache(None if ENABLE_MULTI_MODEL else environment.model_dir)
+
+
+def _tune_cpu_threads():
+    # With SAGEMAKER_TS_AUTO_TUNE_THREADS, the workers and their threads are planned from the CPU
+    # topology, so that together they do not oversubscribe the cores. The plan is exported before
+    # TorchServe starts: the worker count goes into the generated configuration, and the workers
+    # inherit the thread settings. Settings configured explicitly are kept.
+    ts_env = ts_environment.TorchServeEnvironment()
+    if not ts_env.auto_tune_threads:
+        return
+    if ENABLE_MULTI_MODEL:
+        # Each model loaded would get the planned workers and threads, oversubscribing the cores
+        # as soon as two models are loaded.
+        logger.warning("SAGEMAKER_TS_AUTO_TUNE_THREADS is not supported on multi-model endpoints.")
+        return
+
+    topology = cpu_topology.read_cpu_topology()
+    plan = cpu_topology.plan_workers(topology, ts_env.configured_workers, ts_env.threads_per_worker)
+    logger.info("Planned %s for %s", plan, topology)
+
+    intra_op_threads = str(plan.intra_op_threads)
+    for name, value in (
+        (parameters.MODEL_SERVER_WORKERS_ENV, str(plan.workers)),
+        (ts_parameters.MODEL_SERVER_INTRA_OP_THREADS, intra_op_threads),
+        (ts_parameters.MODEL_SERVER_INTER_OP_THREADS, str(plan.inter_op_threads)),
+        ("OMP_NUM_THREADS", intra_op_threads),
+        ("MKL_NUM_THREADS", intra_op_threads),
+    ):
+        os.environ.setdefault(name, value)
+
+
 def _create_torchserve_config_file(handler_service):
     configuration_properties = _generate_ts_config_properties(handler_service)
 
@@ -136,13 +185,17 @@ def _generate_ts_config_properties(handler_service):
     ts_env = ts_environment.TorchServeEnvironment()
 
     if ts_env.is_env_set() and not ENABLE_MULTI_MODEL:
+        # The models block overrides default_workers_per_model, so the workers configured through
+        # SAGEMAKER_MODEL_SERVER_WORKERS, or planned by _tune_cpu_threads, are used unless
+        # SAGEMAKER_TS_MIN_WORKERS or SAGEMAKER_TS_MAX_WORKERS are set.
+        min_workers, max_workers = ts_env.model_workers
         models_string = f'''{{\\
         "{DEFAULT_TS_MODEL_NAME}": {{\\
             "1.0": {{\\
                 "defaultVersion": true,\\
                 "marName": "{DEFAULT_TS_MODEL_NAME}.mar",\\
-                "minWorkers": {ts_env._min_workers},\\
-                "maxWorkers": {ts_env._max_workers},\\
+                "minWorkers": {min_workers},\\
+                "maxWorkers": {max_workers},\\
                 "batchSize": {ts_env._batch_size},\\
                 "maxBatchDelay": {ts_env._max_batch_delay},\\
                 "responseTimeout": {ts_env._response_timeout}\\
@@ -178,6 +231,92 @@ def _add_sigterm_handler(ts_process):
     signal.signal(signal.SIGTERM, _terminate)
 
 
+def _find_ts_server_process(launcher):
+    # ``torchserve --start`` starts the frontend in the background, writes its pid file and exits,
+    # so the frontend is known once the launcher is done. The process table is only scanned if
+    # the pid file cannot be used.
+    launcher.wait()
+    return _read_ts_server_process() or _retrieve_ts_server_process()
+
+
+def _read_ts_server_process():
+    try:
+        with open(TS_PID_FILE) as pid_file:
+            pid = int(pid_file.read().strip())
+        process = psutil.Process(pid)
+        if TS_NAMESPACE in process.cmdline():
+            return process
+    except (OSError, ValueError, psutil.Error) as e:
+        logger.info("Unable to use the TorchServe pid file %s: %s", TS_PID_FILE, e)
+    return None
+
+
+def _wait_for_ready(ts_process):
+    """Waits until the ping endpoint reports that the model workers are up, or until the
+    model server exits.
+
+    Returns:
+        bool: whether the model server became ready.
+    """
+    env = environment.Environment()
+    url = "http://127.0.0.1:{}/ping".format(env.inference_http_port)
+    # Do not send the probe through a proxy configured in the environment.
+    opener = urllib.request.build_opener(urllib.request.ProxyHandler({}))
+    start = time.monotonic()
+    while True:
+        try:
+            with opener.open(url, timeout=READINESS_POLL_INTERVAL) as response:
+                if response.status == 200:
+                    logger.info("Torchserve is ready after %.1f seconds", time.monotonic() - start)
+                    return True
+        except OSError:
+            pass
+
+        try:
+            ts_process.wait(timeout=READINESS_POLL_INTERVAL)
+        except psutil.TimeoutExpired:
+            continue
+        logger.error("Torchserve exited before it was ready")
+        return False
+
+
+def _start_batch_controller(handler_service=DEFAULT_HANDLER_SERVICE):
+    # With SAGEMAKER_TS_ADAPTIVE_BATCHING, the batch size and delay of the model of a single model
+    # endpoint are adapted to the traffic, from the batches the workers record.
+    ts_env = ts_environment.TorchServeEnvironment()
+    if not ts_env.adaptive_batching or ENABLE_MULTI_MODEL:
+        return None
+    if ts_env.pin_cores:
+        # The workers of the previous version hold every core slot while the model is registered
+        # again with new settings, which would leave the workers of the new version unpinned.
+        logger.warning("SAGEMAKER_TS_ADAPTIVE_BATCHING is not supported with SAGEMAKER_TS_PIN_CORES.")
+        return None
+
+    env = environment.Environment()
+    model_workers = ts_env.model_workers
+    controller = batch_controller.AdaptiveBatchController(
+        latency_slo=ts_env.latency_slo,
+        max_batch_size=ts_env.max_adaptive_batch_size,
+        settings=batch_controller.BatchSettings(ts_env.batch_size, ts_env.max_batch_delay),
+        workers=model_workers[1] if model_workers else 1,
+        min_interval=ts_env.adaptive_batching_interval,
+    )
+    actuator = batch_controller.ManagementApiActuator(
+        DEFAULT_TS_MODEL_NAME,
+        environment.model_dir,
+        "http://127.0.0.1:{}".format(env.management_http_port),
+        handler_service + ":handle",
+    )
+    thread = threading.Thread(
+        target=batch_controller.run_controller,
+        args=(controller, batch_controller.BatchStatsReader(), actuator),
+        name="batch-controller",
+        daemon=True,
+    )
+    thread.start()
+    return thread
+
+
 # retry for 10 seconds
 @retry(stop_max_delay=10 * 1000)
 def _retrieve_ts_server_process():
@@ -16,6 +16,7 @@ characteristics, environment variables and configuration settings.
 
 from __future__ import absolute_import
 
+from sagemaker_inference import parameters
 from sagemaker_pytorch_serving_container import ts_parameters
 
 import os
@@ -28,6 +29,14 @@ DEFAULT_TS_MAX_BATCH_DELAY = 100
 DEFAULT_TS_MIN_WORKERS = 1
 DEFAULT_TS_MAX_WORKERS = 1
 DEFAULT_TS_RESPONSE_TIMEOUT = 60
+DEFAULT_TS_LATENCY_SLO = 200
+DEFAULT_TS_MAX_ADAPTIVE_BATCH_SIZE = 32
+DEFAULT_TS_ADAPTIVE_BATCHING_INTERVAL = 900
+
+
+def _get_optional_int(name):
+    value = os.environ.get(name)
+    return int(value) if value else None
 
 
 class TorchServeEnvironment():
@@ -45,6 +54,18 @@ class TorchServeEnvironment():
         min_workers (int): Minimum number of workers that torchserve is allowed to scale down to
         max_workers (int): Minimum number of workers that torchserve is allowed to scale up to
         response_timeout (int): Time delay after which inference will timeout in absence of a response
+        preload_model (bool): Whether workers load the model once and share it in memory
+        auto_tune_threads (bool): Whether the workers and their threads are planned from the CPU topology
+        threads_per_worker (int): Number of intra-op threads wanted per worker when planning the workers
+        intra_op_threads (int): Number of threads each worker uses within an operator
+        inter_op_threads (int): Number of threads each worker uses to run operators in parallel
+        pin_cores (bool): Whether each worker is pinned to its own cores and NUMA node
+        configured_workers (int): Number of workers per model configured explicitly, if any
+        model_workers (tuple): Minimum and maximum number of workers TorchServe is configured with, if known
+        adaptive_batching (bool): Whether the batch size and delay are adapted to the traffic
+        latency_slo (int): Latency objective in milliseconds the batch size and delay are adapted within
+        max_adaptive_batch_size (int): Largest batch size the batch size is adapted to
+        adaptive_batching_interval (int): Minimum time in seconds between two changes of the batch size and delay
     """
     def __init__(self):
         self._batch_size = int(os.environ.get(ts_parameters.MODEL_SERVER_BATCH_SIZE, DEFAULT_TS_BATCH_SIZE))
@@ -54,6 +75,23 @@ class TorchServeEnvironment():
         self._max_workers = int(os.environ.get(ts_parameters.MODEL_SERVER_MAX_WORKERS, DEFAULT_TS_MAX_WORKERS))
         self._response_timeout = int(os.environ.get(ts_parameters.MODEL_SERVER_RESPONSE_TIMEOUT,
                                                     DEFAULT_TS_RESPONSE_TIMEOUT))
+        self._preload_model = os.environ.get(ts_parameters.MODEL_SERVER_PRELOAD_MODEL, "false") == "true"
+        self._auto_tune_threads = os.environ.get(ts_parameters.MODEL_SERVER_AUTO_TUNE_THREADS, "false") == "true"
+        self._threads_per_worker = _get_optional_int(ts_parameters.MODEL_SERVER_THREADS_PER_WORKER)
+        self._intra_op_threads = _get_optional_int(ts_parameters.MODEL_SERVER_INTRA_OP_THREADS)
+        self._inter_op_threads = _get_optional_int(ts_parameters.MODEL_SERVER_INTER_OP_THREADS)
+        self._pin_cores = os.environ.get(ts_parameters.MODEL_SERVER_PIN_CORES, "false") == "true"
+        workers = os.environ.get(parameters.MODEL_SERVER_WORKERS_ENV, "")
+        self._model_server_workers = int(workers) if workers.isdigit() else None
+        self._configured_workers = self._model_server_workers
+        if self._configured_workers is None and ts_parameters.MODEL_SERVER_MAX_WORKERS in os.environ:
+            self._configured_workers = self._max_workers
+        self._adaptive_batching = os.environ.get(ts_parameters.MODEL_SERVER_ADAPTIVE_BATCHING, "false") == "true"
+        self._latency_slo = int(os.environ.get(ts_parameters.MODEL_SERVER_LATENCY_SLO, DEFAULT_TS_LATENCY_SLO))
+        self._max_adaptive_batch_size = int(os.environ.get(ts_parameters.MODEL_SERVER_MAX_ADAPTIVE_BATCH_SIZE,
+                                                           DEFAULT_TS_MAX_ADAPTIVE_BATCH_SIZE))
+        self._adaptive_batching_interval = int(os.environ.get(ts_parameters.MODEL_SERVER_ADAPTIVE_BATCHING_INTERVAL,
+                                                              DEFAULT_TS_ADAPTIVE_BATCHING_INTERVAL))
 
     def is_env_set(self):  # type: () -> bool
         """bool: whether or not the environment variables have been set"""
@@ -92,3 +130,93 @@ class TorchServeEnvironment():
         """int: time delay after which inference will timeout in absense of a response
         """
         return self._response_timeout
+
+    @property
+    def preload_model(self):  # type() -> bool
+        """bool: whether the model is loaded once and shared in memory between workers
+        """
+        return self._preload_model
+
+    @property
+    def auto_tune_threads(self):  # type() -> bool
+        """bool: whether the workers and their threads are planned from the CPU topology
+        """
+        return self._auto_tune_threads
+
+    @property
+    def threads_per_worker(self):  # type() -> Optional[int]
+        """int: number of intra-op threads wanted per worker when planning the workers
+        """
+        return self._threads_per_worker
+
+    @property
+    def intra_op_threads(self):  # type() -> Optional[int]
+        """int: number of threads each worker uses within an operator
+        """
+        return self._intra_op_threads
+
+    @property
+    def inter_op_threads(self):  # type() -> Optional[int]
+        """int: number of threads each worker uses to run operators in parallel
+        """
+        return self._inter_op_threads
+
+    @property
+    def pin_cores(self):  # type() -> bool
+        """bool: whether each worker is pinned to its own cores and NUMA node
+        """
+        return self._pin_cores
+
+    @property
+    def configured_workers(self):  # type() -> Optional[int]
+        """int: number of workers per model set through SAGEMAKER_MODEL_SERVER_WORKERS,
+        or else SAGEMAKER_TS_MAX_WORKERS
+        """
+        return self._configured_workers
+
+    @property
+    def model_workers(self):  # type() -> Optional[Tuple[int, int]]
+        """tuple: minimum and maximum number of workers the model of a single model endpoint is
+        registered with: SAGEMAKER_TS_MIN_WORKERS and SAGEMAKER_TS_MAX_WORKERS when the TorchServe
+        environment variables are set, completed with SAGEMAKER_MODEL_SERVER_WORKERS, or else
+        SAGEMAKER_MODEL_SERVER_WORKERS. None if TorchServe's own default, one worker per vCPU or
+        GPU, applies.
+        """
+        workers = self._model_server_workers
+        if not self.is_env_set():
+            return (workers, workers) if workers is not None else None
+
+        min_workers, max_workers = self._min_workers, self._max_workers
+        if workers is None:
+            return min_workers, max_workers
+        min_workers_set = ts_parameters.MODEL_SERVER_MIN_WORKERS in os.environ
+        max_workers_set = ts_parameters.MODEL_SERVER_MAX_WORKERS in os.environ
+        if not min_workers_set:
+            min_workers = workers if not max_workers_set else min(workers, max_workers)
+        if not max_workers_set:
+            max_workers = max(workers, min_workers)
+        return min_workers, max_workers
+
+    @property
+    def adaptive_batching(self):  # type() -> bool
+        """bool: whether the batch size and delay are adapted to the traffic
+        """
+        return self._adaptive_batching
+
+    @property
+    def latency_slo(self):  # type() -> int
+        """int: latency objective in milliseconds the batch size and delay are adapted within
+        """
+        return self._latency_slo
+
+    @property
+    def max_adaptive_batch_size(self):  # type() -> int
+        """int: largest batch size the batch size is adapted to
+        """
+        return self._max_adaptive_batch_size
+
+    @property
+    def adaptive_batching_interval(self):  # type() -> int
+        """int: minimum time in seconds between two changes of the batch size and delay
+        """
+        return self._adaptive_batching_interval
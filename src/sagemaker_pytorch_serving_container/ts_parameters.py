@@ -19,3 +19,13 @@ MODEL_SERVER_MAX_BATCH_DELAY = "SAGEMAKER_TS_MAX_BATCH_DELAY"  # type: str
 MODEL_SERVER_MIN_WORKERS = "SAGEMAKER_TS_MIN_WORKERS"  # type: str
 MODEL_SERVER_MAX_WORKERS = "SAGEMAKER_TS_MAX_WORKERS"  # type: str
 MODEL_SERVER_RESPONSE_TIMEOUT = "SAGEMAKER_TS_RESPONSE_TIMEOUT"  # type: str
+MODEL_SERVER_PRELOAD_MODEL = "SAGEMAKER_TS_PRELOAD_MODEL"  # type: str
+MODEL_SERVER_AUTO_TUNE_THREADS = "SAGEMAKER_TS_AUTO_TUNE_THREADS"  # type: str
+MODEL_SERVER_THREADS_PER_WORKER = "SAGEMAKER_TS_THREADS_PER_WORKER"  # type: str
+MODEL_SERVER_INTRA_OP_THREADS = "SAGEMAKER_TS_INTRA_OP_THREADS"  # type: str
+MODEL_SERVER_INTER_OP_THREADS = "SAGEMAKER_TS_INTER_OP_THREADS"  # type: str
+MODEL_SERVER_PIN_CORES = "SAGEMAKER_TS_PIN_CORES"  # type: str
+MODEL_SERVER_ADAPTIVE_BATCHING = "SAGEMAKER_TS_ADAPTIVE_BATCHING"  # type: str
+MODEL_SERVER_LATENCY_SLO = "SAGEMAKER_TS_LATENCY_SLO"  # type: str
+MODEL_SERVER_MAX_ADAPTIVE_BATCH_SIZE = "SAGEMAKER_TS_MAX_ADAPTIVE_BATCH_SIZE"  # type: str
+MODEL_SERVER_ADAPTIVE_BATCHING_INTERVAL = "SAGEMAKER_TS_ADAPTIVE_BATCHING_INTERVAL"  # type: str
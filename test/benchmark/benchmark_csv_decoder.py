@@ -0,0 +1,59 @@
+# Copyright 2019-2020 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the 'License'). You
+# may not use this file except in compliance with the License. A copy of
+# the License is located at
+#
+#     http://aws.amazon.com/apache2.0/
+#
+# or in the 'license' file accompanying this file. This file is
+# distributed on an 'AS IS' BASIS, WITHOUT WARRANTIES OR CONDITIONS OF
+# ANY KIND, either express or implied. See the License for the specific
+# language governing permissions and limitations under the License.
+"""Micro-benchmark of decoding numeric CSV payloads.
+
+Compares ``np.genfromtxt`` with ``decoder._csv_to_numpy`` given a dtype,
+which parses strictly numeric CSV with ``np.loadtxt``, for rows of 1k, 10k
+and 100k columns.
+
+Usage:
+    python test/benchmark/benchmark_csv_decoder.py [--rows N]
+"""
+from __future__ import absolute_import
+
+import argparse
+import timeit
+
+import numpy as np
+from six import StringIO
+
+from sagemaker_inference import decoder
+
+COLUMNS = (1000, 10000, 100000)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=4, help="rows per payload")
+    parser.add_argument("--number", type=int, default=3, help="payloads per repetition")
+    parser.add_argument("--repeat", type=int, default=3, help="number of repetitions")
+    args = parser.parse_args()
+
+    for columns in COLUMNS:
+        rows = np.random.rand(args.rows, columns)
+        payload = "\n".join(",".join(repr(value) for value in row) for row in rows.tolist()) + "\n"
+
+        def genfromtxt():
+            np.genfromtxt(StringIO(payload), dtype=np.float32, delimiter=",")
+
+        def csv_to_numpy():
+            decoder._csv_to_numpy(payload, dtype=np.float32)
+
+        for name, request in (("genfromtxt", genfromtxt), ("_csv_to_numpy", csv_to_numpy)):
+            best = min(timeit.repeat(request, number=args.number, repeat=args.repeat))
+            print("{:>6} columns {:<14} {:9.2f} ms/request".format(
+                columns, name, best / args.number * 1e3))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+# Copyright 2019-2020 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the 'License'). You
+# may not use this file except in compliance with the License. A copy of
+# the License is located at
+#
+#     http://aws.amazon.com/apache2.0/
+#
+# or in the 'license' file accompanying this file. This file is
+# distributed on an 'AS IS' BASIS, WITHOUT WARRANTIES OR CONDITIONS OF
+# ANY KIND, either express or implied. See the License for the specific
+# language governing permissions and limitations under the License.
+"""Micro-benchmark of the per-request overhead of calling the inference handlers.
+
+Compares the dispatch table used by ``Transformer._run_handler_function`` with
+inspecting the handler signature on every call, for a request going through
+``transform_fn``, ``input_fn``, ``predict_fn`` and ``output_fn``.
+
+Usage:
+    python test/benchmark/benchmark_handler_dispatch.py [--number N]
+"""
+from __future__ import absolute_import
+
+import argparse
+from inspect import signature
+import timeit
+
+from sagemaker_inference.transformer import Transformer
+
+
+def input_fn(input_data, content_type):
+    return input_data
+
+
+def predict_fn(data, model, context):
+    return data
+
+
+def output_fn(prediction, accept):
+    return prediction
+
+
+def _run_handler_function_uncached(transformer, func, *argv):
+    num_func_input = len(signature(func).parameters)
+    if num_func_input == len(argv):
+        return func(*argv)
+    return func(*(argv + (transformer._context,)))
+
+
+def _transform_fn_uncached(transformer):
+    def transform_fn(model, input_data, content_type, accept):
+        data = _run_handler_function_uncached(transformer, input_fn, input_data, content_type)
+        prediction = _run_handler_function_uncached(transformer, predict_fn, data, model)
+        return _run_handler_function_uncached(transformer, output_fn, prediction, accept)
+
+    return transform_fn
+
+
+def _transformer():
+    transformer = Transformer()
+    transformer._context = object()
+    transformer._input_fn = input_fn
+    transformer._predict_fn = predict_fn
+    transformer._output_fn = output_fn
+    transformer._transform_fn = transformer._default_transform_fn
+    transformer._bind_handler_functions()
+    return transformer
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--number", type=int, default=100000, help="requests per repetition")
+    parser.add_argument("--repeat", type=int, default=5, help="number of repetitions")
+    args = parser.parse_args()
+
+    transformer = _transformer()
+    uncached_transform_fn = _transform_fn_uncached(transformer)
+
+    def uncached():
+        _run_handler_function_uncached(
+            transformer, uncached_transform_fn, "model", "data", "content_type", "accept"
+        )
+
+    def cached():
+        transformer._run_handler_function(
+            transformer._transform_fn, "model", "data", "content_type", "accept"
+        )
+
+    for name, request in (("signature per call", uncached), ("dispatch table", cached)):
+        best = min(timeit.repeat(request, number=args.number, repeat=args.repeat))
+        print("{:<20} {:8.2f} us/request".format(name, best / args.number * 1e6))
+
+
+if __name__ == "__main__":
+    main()
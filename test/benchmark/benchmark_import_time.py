@@ -0,0 +1,77 @@
+# Copyright 2019-2020 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the 'License'). You
+# may not use this file except in compliance with the License. A copy of
+# the License is located at
+#
+#     http://aws.amazon.com/apache2.0/
+#
+# or in the 'license' file accompanying this file. This file is
+# distributed on an 'AS IS' BASIS, WITHOUT WARRANTIES OR CONDITIONS OF
+# ANY KIND, either express or implied. See the License for the specific
+# language governing permissions and limitations under the License.
+"""Startup benchmark of importing the handler service in a fresh interpreter.
+
+Runs ``python -X importtime`` on the module a TorchServe worker imports at boot,
+and reports the total import time, the slowest top-level imports, and whether
+the optional modules loaded on first use (scipy, boto3, pkg_resources) were
+imported.
+
+Usage:
+    python test/benchmark/benchmark_import_time.py [--module M] [--repeat N]
+"""
+from __future__ import absolute_import
+
+import argparse
+import re
+import subprocess
+import sys
+
+IMPORT_TIME_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+LAZY_MODULES = ("scipy", "boto3", "pkg_resources")
+
+
+def _import_times(module):
+    """Returns the cumulative import time in microseconds and the depth of every
+    module imported when importing ``module`` in a fresh interpreter.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import {}".format(module)],
+        stderr=subprocess.PIPE,
+        check=True,
+        universal_newlines=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        match = IMPORT_TIME_LINE.match(line)
+        if match:
+            times[match.group(4)] = (int(match.group(2)), len(match.group(3)) // 2)
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--module",
+        default="sagemaker_pytorch_serving_container.handler_service",
+        help="module to import",
+    )
+    parser.add_argument("--repeat", type=int, default=5, help="number of interpreters to start")
+    parser.add_argument("--top", type=int, default=10, help="number of imports to show")
+    args = parser.parse_args()
+
+    runs = [_import_times(args.module) for _ in range(args.repeat)]
+    best = min(runs, key=lambda times: times[args.module][0])
+
+    print("{}: {:.1f} ms (best of {})".format(args.module, best[args.module][0] / 1e3, args.repeat))
+    imports = [(name, time) for name, (time, depth) in best.items() if depth == 1]
+    for name, time in sorted(imports, key=lambda item: -item[1])[: args.top]:
+        print("  {:<60} {:8.1f} ms".format(name, time / 1e3))
+    for name in LAZY_MODULES:
+        loaded = name in best
+        print("{} imported: {}{}".format(
+            name, loaded, " ({:.1f} ms)".format(best[name][0] / 1e3) if loaded else ""))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+# Copyright 2019-2020 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the 'License'). You
+# may not use this file except in compliance with the License. A copy of
+# the License is located at
+#
+#     http://aws.amazon.com/apache2.0/
+#
+# or in the 'license' file accompanying this file. This file is
+# distributed on an 'AS IS' BASIS, WITHOUT WARRANTIES OR CONDITIONS OF
+# ANY KIND, either express or implied. See the License for the specific
+# language governing permissions and limitations under the License.
+"""Micro-benchmark of decoding a JSON payload of floats into a tensor.
+
+Compares ``json.loads`` + ``np.array`` + ``torch.FloatTensor`` with the
+``default_input_fn`` path, which parses with orjson when it is installed and
+builds a float32 array directly.
+
+Usage:
+    python test/benchmark/benchmark_json_decoder.py [--size N]
+"""
+from __future__ import absolute_import
+
+import argparse
+import json
+import timeit
+
+import numpy as np
+import torch
+
+from sagemaker_inference import content_types, decoder
+from sagemaker_pytorch_serving_container.default_pytorch_inference_handler import (
+    DefaultPytorchInferenceHandler,
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, default=100000, help="floats per payload")
+    parser.add_argument("--number", type=int, default=20, help="payloads per repetition")
+    parser.add_argument("--repeat", type=int, default=5, help="number of repetitions")
+    args = parser.parse_args()
+
+    payload = json.dumps(np.random.rand(args.size).tolist()).encode("utf-8")
+    handler = DefaultPytorchInferenceHandler()
+    handler._device = torch.device("cpu")
+
+    def stdlib():
+        torch.FloatTensor(np.array(json.loads(payload)))
+
+    def default_input_fn():
+        handler.default_input_fn(payload, content_types.JSON)
+
+    print("orjson installed: {}".format(decoder.orjson is not None))
+    for name, request in (("json + FloatTensor", stdlib), ("default_input_fn", default_input_fn)):
+        best = min(timeit.repeat(request, number=args.number, repeat=args.repeat))
+        print("{:<20} {:8.2f} ms/request".format(name, best / args.number * 1e3))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,368 @@
+# Copyright 2019-2020 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"). You
+# may not use this file except in compliance with the License. A copy of
+# the License is located at
+#
+#     http://aws.amazon.com/apache2.0/
+#
+# or in the "license" file accompanying this file. This file is
+# distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF
+# ANY KIND, either express or implied. See the License for the specific
+# language governing permissions and limitations under the License.
+from __future__ import absolute_import
+
+import io
+import json
+import os
+import random
+import statistics
+import tempfile
+import threading
+import urllib.parse
+
+from mock import MagicMock, Mock, patch
+import pytest
+
+from sagemaker_pytorch_serving_container import batch_controller
+from sagemaker_pytorch_serving_container.batch_controller import AdaptiveBatchController, BatchSettings
+
+MANAGEMENT_ADDRESS = "http://127.0.0.1:8081"
+REGISTERED = {
+    "modelName": "model",
+    "modelVersion": "1.0",
+    "modelUrl": "/opt/ml/model",
+    "minWorkers": 2,
+    "maxWorkers": 4,
+    "responseTimeout": 60,
+}
+
+
+def _model_latency(batch_size):
+    return 10.0 + 2.0 * batch_size
+
+
+def _arrivals(rate, duration, seed=0):
+    generator = random.Random(seed)
+    arrivals = []
+    arrival = generator.expovariate(rate)
+    while arrival < duration:
+        arrivals.append(arrival)
+        arrival += generator.expovariate(rate)
+    return arrivals
+
+
+def _controller(settings, **kwargs):
+    kwargs.setdefault("min_interval", 30)
+    kwargs.setdefault("min_batches", 50)
+    return AdaptiveBatchController(latency_slo=100, max_batch_size=32, settings=settings, **kwargs)
+
+
+def _observe(controller, rate, duration, batch_size=1, start=0.0):
+    now = start
+    while now < start + duration:
+        now += batch_size / rate
+        controller.observe_batch(now, batch_size, _model_latency(batch_size))
+    return now
+
+
+def test_estimate_latency():
+    controller = _controller(BatchSettings(1, 1))
+    assert controller.estimate_latency(4) is None
+
+    controller.observe_batch(0, 2, _model_latency(2))
+    assert controller.estimate_latency(2) == 14
+    assert controller.estimate_latency(4) == 28
+
+    controller.observe_batch(1, 8, _model_latency(8))
+    assert controller.estimate_latency(8) == 26
+    assert controller.estimate_latency(16) == 42
+    assert controller.estimate_latency(1) == 14
+
+
+def test_recommend_waits_for_batches():
+    controller = _controller(BatchSettings(16, 50))
+    now = _observe(controller, rate=20, duration=1)
+
+    assert controller.recommend(now) is None
+
+
+def test_recommend_small_batches_at_low_traffic():
+    controller = _controller(BatchSettings(16, 50))
+    now = _observe(controller, rate=20, duration=10)
+
+    assert controller.recommend(now) == BatchSettings(1, 1)
+
+
+def test_recommend_larger_batches_when_saturated():
+    controller = _controller(BatchSettings(4, 10))
+    now = _observe(controller, rate=1000, duration=10, batch_size=4)
+    controller.observe_batch(now, 8, _model_latency(8))
+
+    # 8 requests take 26ms, so batches of 8 keep up with 300 requests per second at most.
+    settings = controller.recommend(now)
+
+    assert settings.batch_size == 16
+    assert 1 <= settings.max_batch_delay <= 100
+
+
+def test_recommend_keeps_close_settings():
+    controller = _controller(BatchSettings(1, 5))
+    now = _observe(controller, rate=20, duration=10)
+
+    assert controller.recommend(now) is None
+
+
+def test_recommend_min_interval():
+    controller = _controller(BatchSettings(16, 50), min_interval=60)
+    now = _observe(controller, rate=20, duration=10)
+    controller.set_settings(BatchSettings(8, 50), now)
+
+    now = _observe(controller, rate=20, duration=30, start=now)
+    assert controller.recommend(now) is None
+
+    now = _observe(controller, rate=20, duration=40, start=now)
+    assert controller.recommend(now) == BatchSettings(1, 1)
+
+
+def test_simulate_fixed_settings():
+    result = batch_controller.simulate([0.0, 0.001, 0.002, 1.0], _model_latency, BatchSettings(2, 10))
+
+    assert result.batch_sizes == [2, 1, 1]
+    assert result.latencies[0] == _model_latency(2) + 1
+    assert result.settings == [(0.0, BatchSettings(2, 10))]
+
+
+def test_simulate_adaptive_beats_fixed_at_low_traffic():
+    arrivals = _arrivals(rate=20, duration=300)
+    settings = BatchSettings(16, 50)
+
+    fixed = batch_controller.simulate(arrivals, _model_latency, settings)
+    adaptive = batch_controller.simulate(arrivals, _model_latency, settings, controller=_controller(settings))
+
+    assert statistics.median(adaptive.latencies) < statistics.median(fixed.latencies) / 2
+    assert adaptive.settings[-1][1].batch_size == 1
+
+
+def test_simulate_adaptive_beats_fixed_at_peak_traffic():
+    arrivals = _arrivals(rate=400, duration=300)
+    settings = BatchSettings(1, 1)
+
+    fixed = batch_controller.simulate(arrivals, _model_latency, settings)
+    adaptive = batch_controller.simulate(arrivals, _model_latency, settings, controller=_controller(settings))
+
+    # Single requests are handled at 83 requests per second, far from the 400 arriving.
+    fixed_end = arrivals[-1] + fixed.latencies[-1] / 1000
+    adaptive_end = arrivals[-1] + adaptive.latencies[-1] / 1000
+    assert adaptive_end < fixed_end / 3
+    assert adaptive.settings[-1][1].batch_size > 8
+
+
+def test_record_and_read_batches(tmpdir):
+    path = str(tmpdir.join("batches.log"))
+    reader = batch_controller.BatchStatsReader(path)
+    assert reader.read() == []
+
+    batch_controller.record_batch(4, 12.5, path)
+    batch_controller.record_batch(2, 8.0, path)
+    with open(path, "a") as f:
+        f.write("123.0 3")
+
+    batches = reader.read()
+    assert [(size, latency) for _, size, latency in batches] == [(4, 12.5), (2, 8.0)]
+
+    with open(path, "a") as f:
+        f.write(" 9.0\n")
+    assert reader.read()[0][1:] == (3, 9.0)
+    assert reader.read() == []
+
+
+@patch("sagemaker_pytorch_serving_container.batch_controller.MAX_BATCH_STATS_FILE_SIZE", 10)
+def test_read_batches_truncates_file(tmpdir):
+    path = str(tmpdir.join("batches.log"))
+    reader = batch_controller.BatchStatsReader(path)
+    batch_controller.record_batch(4, 12.5, path)
+
+    assert len(reader.read()) == 1
+    assert tmpdir.join("batches.log").size() == 0
+
+    batch_controller.record_batch(2, 8.0, path)
+    assert reader.read()[0][1:] == (2, 8.0)
+
+
+def _response(body):
+    response = MagicMock()
+    response.__enter__.return_value = io.BytesIO(json.dumps(body).encode("utf-8"))
+    return response
+
+
+def _actuator(tmpdir):
+    model_dir = tmpdir.mkdir("model")
+    model_dir.join("model.pt").write("model")
+    model_dir.mkdir("MAR-INF").join("MANIFEST.json").write("{}")
+    staging_dir = str(tmpdir.join("versions"))
+    actuator = batch_controller.ManagementApiActuator(
+        "model", str(model_dir), MANAGEMENT_ADDRESS, "handler_service:handle", staging_dir=staging_dir, sleep=Mock()
+    )
+    return actuator, str(model_dir), staging_dir
+
+
+@patch("urllib.request.OpenerDirector.open")
+def test_management_api_actuator(opener_open, tmpdir):
+    opener_open.side_effect = [_response([REGISTERED]), MagicMock(), MagicMock(), MagicMock(), MagicMock()]
+    actuator, model_dir, staging_dir = _actuator(tmpdir)
+
+    actuator.apply(BatchSettings(8, 20))
+
+    version_dir = os.path.join(staging_dir, "1.1")
+    requests = [call[0][0] for call in opener_open.call_args_list]
+    assert requests[0] == MANAGEMENT_ADDRESS + "/models/model"
+    assert requests[1].get_method() == "POST"
+    assert requests[1].full_url == MANAGEMENT_ADDRESS + "/models?" + urllib.parse.urlencode({
+        "url": version_dir,
+        "model_name": "model",
+        "handler": "handler_service:handle",
+        "batch_size": 8,
+        "max_batch_delay": 20,
+        "response_timeout": 60,
+        "initial_workers": 2,
+        "synchronous": "true",
+    })
+    assert (requests[2].get_method(), requests[2].full_url) == (
+        "PUT", MANAGEMENT_ADDRESS + "/models/model/1.1?min_worker=2&max_worker=4"
+    )
+    assert (requests[3].get_method(), requests[3].full_url) == (
+        "PUT", MANAGEMENT_ADDRESS + "/models/model/1.1/set-default"
+    )
+    assert (requests[4].get_method(), requests[4].full_url) == ("DELETE", MANAGEMENT_ADDRESS + "/models/model/1.0")
+    actuator._sleep.assert_called_once_with(60)
+
+    assert os.readlink(os.path.join(version_dir, "model.pt")) == os.path.join(model_dir, "model.pt")
+    with open(os.path.join(version_dir, "MAR-INF", "MANIFEST.json")) as f:
+        assert json.load(f)["model"] == {
+            "modelName": "model", "modelVersion": "1.1", "handler": "handler_service:handle"
+        }
+
+
+@patch("urllib.request.OpenerDirector.open")
+def test_management_api_actuator_settings(opener_open, tmpdir):
+    opener_open.side_effect = [_response([REGISTERED]), MagicMock(), MagicMock(), MagicMock()]
+    actuator, _, _ = _actuator(tmpdir)
+
+    actuator.apply(BatchSettings(8, 20), response_timeout=120, workers=(3, 3))
+
+    requests = [call[0][0] for call in opener_open.call_args_list]
+    assert "&response_timeout=120&initial_workers=3&" in requests[1].full_url
+    assert [request.get_method() for request in requests[1:]] == ["POST", "PUT", "DELETE"]
+    assert requests[2].full_url.endswith("/set-default")
+    actuator._sleep.assert_called_once_with(60)
+
+
+def test_management_api_actuator_default_staging_dir():
+    actuator = batch_controller.ManagementApiActuator("a/b", "/opt/ml/model", MANAGEMENT_ADDRESS, "handler")
+
+    assert actuator._staging_dir == os.path.join(
+        tempfile.gettempdir(), batch_controller.MODEL_VERSIONS_DIRNAME, "a%2Fb"
+    )
+
+
+@patch("urllib.request.OpenerDirector.open")
+def test_management_api_actuator_unregisters_staged_version(opener_open, tmpdir):
+    actuator, _, staging_dir = _actuator(tmpdir)
+    registered = dict(REGISTERED, modelVersion="1.1", modelUrl=os.path.join(staging_dir, "1.1"), maxWorkers=2)
+    opener_open.side_effect = [_response([registered]), MagicMock(), MagicMock(), MagicMock()]
+    os.makedirs(registered["modelUrl"])
+
+    actuator.apply(BatchSettings(8, 20))
+
+    requests = [call[0][0] for call in opener_open.call_args_list]
+    assert [request.get_method() for request in requests[1:]] == ["POST", "PUT", "DELETE"]
+    assert requests[2].full_url == MANAGEMENT_ADDRESS + "/models/model/1.2/set-default"
+    assert requests[3].full_url == MANAGEMENT_ADDRESS + "/models/model/1.1"
+    assert os.path.exists(os.path.join(staging_dir, "1.2"))
+    assert not os.path.exists(registered["modelUrl"])
+
+
+@patch("urllib.request.OpenerDirector.open")
+def test_management_api_actuator_register_failure(opener_open, tmpdir):
+    opener_open.side_effect = [_response([REGISTERED]), OSError("refused")]
+    actuator, _, staging_dir = _actuator(tmpdir)
+
+    with pytest.raises(OSError):
+        actuator.apply(BatchSettings(8, 20))
+
+    assert opener_open.call_count == 2
+    assert not os.path.exists(os.path.join(staging_dir, "1.1"))
+    actuator._sleep.assert_not_called()
+
+
+@patch("urllib.request.OpenerDirector.open")
+def test_management_api_actuator_set_default_failure(opener_open, tmpdir):
+    opener_open.side_effect = [_response([REGISTERED]), MagicMock(), MagicMock(), OSError("refused"), MagicMock()]
+    actuator, _, staging_dir = _actuator(tmpdir)
+
+    with pytest.raises(OSError):
+        actuator.apply(BatchSettings(8, 20))
+
+    request = opener_open.call_args[0][0]
+    assert (request.get_method(), request.full_url) == ("DELETE", MANAGEMENT_ADDRESS + "/models/model/1.1")
+    assert not os.path.exists(os.path.join(staging_dir, "1.1"))
+    actuator._sleep.assert_not_called()
+
+
+def test_run_controller():
+    controller = Mock(settings=BatchSettings(1, 1), arrival_rate=100.0)
+    controller.recommend.return_value = BatchSettings(8, 20)
+    reader = Mock()
+    reader.read.return_value = [(1.0, 4, 12.0)]
+    actuator = Mock()
+    stop_event = Mock(spec=threading.Event)
+    stop_event.wait.side_effect = [False, True]
+
+    batch_controller.run_controller(controller, reader, actuator, interval=5, stop_event=stop_event)
+
+    stop_event.wait.assert_called_with(5)
+    controller.observe_batch.assert_called_once_with(1.0, 4, 12.0)
+    actuator.apply.assert_called_once_with(BatchSettings(8, 20))
+    assert controller.set_settings.call_args[0][0] == BatchSettings(8, 20)
+
+
+@patch("urllib.request.OpenerDirector.open")
+def test_management_api_actuator_workers(opener_open, tmpdir):
+    actuator, _, _ = _actuator(tmpdir)
+
+    opener_open.return_value = _response([dict(REGISTERED, workers=[{"id": "9000"}, {"id": "9001"}])])
+    assert actuator.workers() == 2
+    opener_open.return_value = _response([dict(REGISTERED, workers=[])])
+    assert actuator.workers() is None
+
+
+def test_run_controller_reads_workers():
+    controller = batch_controller.AdaptiveBatchController(latency_slo=100, max_batch_size=8,
+                                                          settings=BatchSettings(1, 1))
+    reader = Mock()
+    reader.read.return_value = []
+    actuator = Mock()
+    actuator.workers.side_effect = [3, None, OSError("refused")]
+    stop_event = Mock(spec=threading.Event)
+    stop_event.wait.side_effect = [False, False, False, True]
+
+    batch_controller.run_controller(controller, reader, actuator, stop_event=stop_event)
+
+    assert actuator.workers.call_count == 3
+    assert controller.workers == 3
+
+
+def test_run_controller_keeps_settings_on_failure():
+    controller = Mock(settings=BatchSettings(1, 1), arrival_rate=100.0)
+    controller.recommend.return_value = BatchSettings(8, 20)
+    reader = Mock()
+    reader.read.return_value = []
+    actuator = Mock()
+    actuator.apply.side_effect = OSError("refused")
+    stop_event = Mock(spec=threading.Event)
+    stop_event.wait.side_effect = [False, True]
+
+    batch_controller.run_controller(controller, reader, actuator, stop_event=stop_event)
+
+    assert controller.set_settings.call_args[0][0] == BatchSettings(1, 1)
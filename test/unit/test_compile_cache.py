@@ -0,0 +1,116 @@
+# Copyright 2019-2020 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"). You
+# may not use this file except in compliance with the License. A copy of
+# the License is located at
+#
+#     http://aws.amazon.com/apache2.0/
+#
+# or in the "license" file accompanying this file. This file is
+# distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF
+# ANY KIND, either express or implied. See the License for the specific
+# language governing permissions and limitations under the License.
+from __future__ import absolute_import
+
+import os
+
+from mock import patch
+import pytest
+
+from sagemaker_pytorch_serving_container import compile_cache
+
+
+@pytest.fixture(name="model_dir")
+def fixture_model_dir(tmpdir):
+    tmpdir.join("model.pt").write("weights")
+    tmpdir.mkdir("code").join("inference.py").write("code")
+    return str(tmpdir)
+
+
+@patch.dict(os.environ, {}, clear=True)
+def test_configure_compile_cache(model_dir):
+    cache_dir = compile_cache.configure_compile_cache(model_dir)
+
+    assert os.path.isdir(cache_dir)
+    assert os.path.dirname(cache_dir) == os.path.join(model_dir, "compile_cache")
+    assert os.path.basename(cache_dir) == "torch-{}-{}".format(
+        compile_cache._torch_version(), compile_cache.model_fingerprint(model_dir)
+    )
+    assert os.environ["TORCHINDUCTOR_CACHE_DIR"] == os.path.join(cache_dir, "inductor")
+    assert os.environ["TRITON_CACHE_DIR"] == os.path.join(cache_dir, "triton")
+    assert os.environ["TORCHINDUCTOR_FX_GRAPH_CACHE"] == "1"
+
+
+def test_configure_compile_cache_dir_env(model_dir, tmpdir):
+    cache_base_dir = str(tmpdir.mkdir("cache"))
+    environ = {
+        compile_cache.COMPILE_CACHE_DIR_ENV: cache_base_dir,
+        "TORCHINDUCTOR_CACHE_DIR": "/explicit",
+    }
+    with patch.dict(os.environ, environ, clear=True):
+        cache_dir = compile_cache.configure_compile_cache(model_dir)
+
+        assert os.path.dirname(cache_dir) == cache_base_dir
+        assert os.environ["TORCHINDUCTOR_CACHE_DIR"] == "/explicit"
+
+
+@patch.dict(os.environ, {}, clear=True)
+@patch("os.access", return_value=False)
+def test_configure_compile_cache_read_only_model_dir(access, model_dir):
+    with patch.object(compile_cache, "DEFAULT_COMPILE_CACHE_DIR", os.path.join(model_dir, "tmp")):
+        cache_dir = compile_cache.configure_compile_cache(model_dir)
+
+    assert os.path.dirname(cache_dir) == os.path.join(model_dir, "tmp")
+
+
+@patch.dict(os.environ, {}, clear=True)
+def test_configure_compile_cache_multi_model(tmpdir):
+    with patch.object(compile_cache, "DEFAULT_COMPILE_CACHE_DIR", str(tmpdir)):
+        cache_dir = compile_cache.configure_compile_cache()
+
+    assert cache_dir == os.path.join(str(tmpdir), "torch-{}".format(compile_cache._torch_version()))
+
+
+@patch.dict(os.environ, {}, clear=True)
+@patch("os.makedirs", side_effect=PermissionError)
+def test_configure_compile_cache_not_writable(makedirs, model_dir):
+    assert compile_cache.configure_compile_cache(model_dir) is None
+    assert "TORCHINDUCTOR_CACHE_DIR" not in os.environ
+
+
+def test_model_fingerprint(model_dir):
+    fingerprint = compile_cache.model_fingerprint(model_dir)
+
+    os.makedirs(os.path.join(model_dir, "compile_cache"))
+    with open(os.path.join(model_dir, "compile_cache", "graph"), "w") as f:
+        f.write("compiled")
+    os.makedirs(os.path.join(model_dir, "MAR-INF"))
+    with open(os.path.join(model_dir, "MAR-INF", "MANIFEST.json"), "w") as f:
+        f.write("{}")
+    assert compile_cache.model_fingerprint(model_dir) == fingerprint
+
+    with open(os.path.join(model_dir, "model.pt"), "a") as f:
+        f.write("retrained")
+    assert compile_cache.model_fingerprint(model_dir) != fingerprint
+
+
+def test_model_fingerprint_ignores_mtimes(model_dir):
+    fingerprint = compile_cache.model_fingerprint(model_dir)
+    mtime_fingerprint = compile_cache.model_fingerprint(model_dir, mtimes=True)
+
+    os.utime(os.path.join(model_dir, "model.pt"), (0, 0))
+
+    assert compile_cache.model_fingerprint(model_dir) == fingerprint
+    assert compile_cache.model_fingerprint(model_dir, mtimes=True) != mtime_fingerprint
+
+
+@patch("sagemaker_pytorch_serving_container.compile_cache.MAX_HASHED_FILE_SIZE", 4)
+def test_model_fingerprint_small_file_content(model_dir):
+    with open(os.path.join(model_dir, "cfg"), "w") as f:
+        f.write("ab")
+    fingerprint = compile_cache.model_fingerprint(model_dir)
+
+    with open(os.path.join(model_dir, "cfg"), "w") as f:
+        f.write("cd")
+
+    assert compile_cache.model_fingerprint(model_dir) != fingerprint
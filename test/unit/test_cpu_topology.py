@@ -0,0 +1,215 @@
+# Copyright 2019-2020 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"). You
+# may not use this file except in compliance with the License. A copy of
+# the License is located at
+#
+#     http://aws.amazon.com/apache2.0/
+#
+# or in the "license" file accompanying this file. This file is
+# distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF
+# ANY KIND, either express or implied. See the License for the specific
+# language governing permissions and limitations under the License.
+from __future__ import absolute_import
+
+import os
+
+from mock import patch
+import pytest
+
+from sagemaker_pytorch_serving_container import cpu_topology
+from sagemaker_pytorch_serving_container.cpu_topology import CpuTopology, PhysicalCore, WorkerPlan
+
+
+def _write(root, path, content):
+    path = os.path.join(str(root), path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write(content)
+
+
+@pytest.fixture(name="sys_dir")
+def fixture_sys_dir(tmpdir):
+    # 2 NUMA nodes with 2 cores each, and 2 hyperthreads per core.
+    for cpu in range(8):
+        _write(tmpdir, "devices/system/cpu/cpu{}/topology/physical_package_id".format(cpu), str(cpu // 2 % 2))
+        _write(tmpdir, "devices/system/cpu/cpu{}/topology/core_id".format(cpu), str(cpu % 2))
+    _write(tmpdir, "devices/system/node/node0/cpulist", "0-1,4-5\n")
+    _write(tmpdir, "devices/system/node/node1/cpulist", "2-3,6-7\n")
+    return str(tmpdir)
+
+
+@patch("os.sched_getaffinity", return_value=set(range(8)))
+def test_read_cpu_topology(sched_getaffinity, sys_dir, tmpdir):
+    _write(sys_dir, "fs/cgroup/cpu.max", "max 100000\n")
+    for gpu in ("0000:00:1e.0", "0000:00:1f.0"):
+        _write(tmpdir, "proc/driver/nvidia/gpus/{}/information".format(gpu), "")
+
+    topology = cpu_topology.read_cpu_topology(sys_dir, os.path.join(str(tmpdir), "proc"))
+
+    assert topology == CpuTopology(
+        cpus=frozenset(range(8)),
+        cpu_quota=None,
+        physical_cores=4,
+        numa_nodes=[frozenset({0, 1, 4, 5}), frozenset({2, 3, 6, 7})],
+        gpus=2,
+    )
+
+
+@patch("os.sched_getaffinity", return_value={0, 4})
+def test_read_cpu_topology_affinity(sched_getaffinity, sys_dir):
+    topology = cpu_topology.read_cpu_topology(sys_dir, sys_dir)
+
+    assert topology.physical_cores == 1
+    assert topology.numa_nodes == [frozenset({0, 4})]
+    assert topology.gpus == 0
+
+
+@patch("os.sched_getaffinity", return_value={0, 1})
+def test_read_cpu_topology_no_sysfs(sched_getaffinity, tmpdir):
+    topology = cpu_topology.read_cpu_topology(str(tmpdir), str(tmpdir))
+
+    assert topology == CpuTopology(
+        cpus=frozenset({0, 1}), cpu_quota=None, physical_cores=2, numa_nodes=[frozenset({0, 1})], gpus=0
+    )
+
+
+@pytest.mark.parametrize(
+    "files, cpu_quota",
+    [
+        ({"fs/cgroup/cpu.max": "250000 100000"}, 2.5),
+        ({"fs/cgroup/cpu.max": "max 100000"}, None),
+        ({"fs/cgroup/cpu/cpu.cfs_quota_us": "150000", "fs/cgroup/cpu/cpu.cfs_period_us": "100000"}, 1.5),
+        ({"fs/cgroup/cpu/cpu.cfs_quota_us": "-1", "fs/cgroup/cpu/cpu.cfs_period_us": "100000"}, None),
+        ({}, None),
+    ],
+)
+def test_read_cpu_quota(tmpdir, files, cpu_quota):
+    for path, content in files.items():
+        _write(tmpdir, path, content)
+
+    assert cpu_topology._read_cpu_quota(str(tmpdir)) == cpu_quota
+
+
+def _topology(physical_cores=48, cpu_quota=None, numa_nodes=2, gpus=0):
+    cpus = frozenset(range(physical_cores * 2))
+    return CpuTopology(cpus, cpu_quota, physical_cores, [cpus] * numa_nodes, gpus)
+
+
+@pytest.mark.parametrize(
+    "topology, workers, threads_per_worker, plan",
+    [
+        (_topology(), None, None, WorkerPlan(2, 24, 1)),
+        (_topology(), None, 4, WorkerPlan(12, 4, 1)),
+        (_topology(), 5, None, WorkerPlan(5, 9, 1)),
+        (_topology(cpu_quota=7.5), None, None, WorkerPlan(2, 4, 1)),
+        (_topology(cpu_quota=0.5), None, None, WorkerPlan(1, 1, 1)),
+        (_topology(physical_cores=1), None, None, WorkerPlan(1, 1, 1)),
+        (_topology(gpus=8), None, None, WorkerPlan(8, 6, 1)),
+        (_topology(physical_cores=4), 16, None, WorkerPlan(16, 1, 1)),
+    ],
+)
+def test_plan_workers(topology, workers, threads_per_worker, plan):
+    assert cpu_topology.plan_workers(topology, workers, threads_per_worker) == plan
+
+
+def test_parse_cpulist():
+    assert cpu_topology._parse_cpulist("0-2,5,7-8") == frozenset({0, 1, 2, 5, 7, 8})
+    assert cpu_topology._parse_cpulist("") == frozenset()
+
+
+@patch("os.sched_getaffinity", return_value=set(range(8)))
+def test_read_physical_cores(sched_getaffinity, sys_dir):
+    assert cpu_topology.read_physical_cores(sys_dir) == [
+        PhysicalCore(0, (0, 4)), PhysicalCore(0, (1, 5)), PhysicalCore(1, (2, 6)), PhysicalCore(1, (3, 7))
+    ]
+
+
+def test_read_physical_cores_no_sysfs(tmpdir):
+    assert cpu_topology.read_physical_cores(str(tmpdir), frozenset({1, 0})) == [
+        PhysicalCore(0, (0,)), PhysicalCore(0, (1,))
+    ]
+
+
+CORES = [PhysicalCore(node, (cpu,)) for node, cpu in ((0, 0), (0, 1), (0, 2), (1, 3), (1, 4), (1, 5))]
+
+
+@pytest.mark.parametrize(
+    "workers, slot, cores",
+    [
+        (1, 0, CORES),
+        (2, 0, CORES[:3]),
+        (2, 1, CORES[3:]),
+        (4, 3, CORES[4:]),
+        (8, 7, CORES[1:2]),
+    ],
+)
+def test_assign_cores(workers, slot, cores):
+    assert cpu_topology.assign_cores(CORES, workers, slot) == cores
+
+
+def test_claim_worker_slot(tmpdir):
+    slot, first_lock = cpu_topology._claim_worker_slot(2, str(tmpdir))
+    assert slot == 0
+
+    slot, second_lock = cpu_topology._claim_worker_slot(2, str(tmpdir))
+    assert slot == 1
+
+    assert cpu_topology._claim_worker_slot(2, str(tmpdir)) == (None, None)
+
+    first_lock.close()
+    slot, _ = cpu_topology._claim_worker_slot(2, str(tmpdir))
+    assert slot == 0
+
+
+@patch.object(cpu_topology, "_worker_slot_lock", None)
+@patch("sagemaker_pytorch_serving_container.cpu_topology._prefer_numa_node")
+@patch("os.sched_setaffinity")
+@patch("os.sched_getaffinity", return_value=set(range(8)))
+def test_pin_worker(sched_getaffinity, sched_setaffinity, prefer_numa_node, sys_dir, tmpdir):
+    lock_dir = str(tmpdir.mkdir("locks"))
+    _, first_lock = cpu_topology._claim_worker_slot(1, lock_dir)
+
+    cpus = cpu_topology.pin_worker(2, lock_dir, sys_dir)
+
+    assert cpus == frozenset({2, 3})
+    sched_setaffinity.assert_called_once_with(0, cpus)
+    prefer_numa_node.assert_called_once_with(1)
+    assert cpu_topology._worker_slot_lock is not None
+
+
+@patch.object(cpu_topology, "_worker_slot_lock", None)
+@patch("sagemaker_pytorch_serving_container.cpu_topology._prefer_numa_node")
+@patch("os.sched_setaffinity")
+@patch("os.sched_getaffinity", return_value=set(range(8)))
+def test_pin_worker_cpu_quota(sched_getaffinity, sched_setaffinity, prefer_numa_node, sys_dir, tmpdir):
+    _write(sys_dir, "fs/cgroup/cpu.max", "150000 100000")
+
+    cpus = cpu_topology.pin_worker(1, str(tmpdir), sys_dir)
+
+    assert cpus == frozenset({0, 1})
+    prefer_numa_node.assert_called_once_with(0)
+
+
+@patch.object(cpu_topology, "_worker_slot_lock", None)
+@patch("os.sched_setaffinity")
+@patch("os.sched_getaffinity", return_value=set(range(8)))
+def test_pin_worker_no_free_slot(sched_getaffinity, sched_setaffinity, sys_dir, tmpdir):
+    _, lock = cpu_topology._claim_worker_slot(1, str(tmpdir))
+
+    assert cpu_topology.pin_worker(1, str(tmpdir), sys_dir) is None
+    sched_setaffinity.assert_not_called()
+
+
+@patch("ctypes.util.find_library", return_value=None)
+def test_prefer_numa_node_without_libnuma(find_library):
+    assert cpu_topology._prefer_numa_node(0) is False
+
+
+@patch("ctypes.CDLL")
+@patch("ctypes.util.find_library", return_value="libnuma.so.1")
+def test_prefer_numa_node(find_library, cdll):
+    cdll.return_value.numa_available.return_value = 0
+
+    assert cpu_topology._prefer_numa_node(1) is True
+    cdll.return_value.numa_set_preferred.assert_called_once_with(1)
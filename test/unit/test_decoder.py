@@ -12,6 +12,9 @@
 # language governing permissions and limitations under the License.
 from __future__ import absolute_import
 
+import json
+import struct
+
 from mock import Mock, patch
 import numpy as np
 import pytest
@@ -20,6 +23,8 @@ from six import BytesIO
 
 from sagemaker_inference import content_types, decoder, errors
 
+requires_orjson = pytest.mark.skipif(decoder.orjson is None, reason="orjson is not installed")
+
 
 @pytest.mark.parametrize(
     "target",
@@ -35,6 +40,65 @@ def test_npy_to_numpy(target):
     np.testing.assert_equal(actual, np.array(target))
 
 
+@pytest.mark.parametrize(
+    "target",
+    (
+        np.arange(12, dtype=np.float32).reshape(3, 4),
+        np.asfortranarray(np.arange(12).reshape(3, 4)),
+        np.array(42),
+        np.zeros((2, 8, 8, 3), dtype=np.uint8),
+        np.array(["42", "6", "9"]),
+    ),
+)
+def test_npy_to_numpy_zero_copy(target):
+    buffer = BytesIO()
+    np.save(buffer, target)
+    input_data = bytearray(buffer.getvalue())
+
+    actual = decoder._npy_to_numpy(input_data)
+
+    np.testing.assert_equal(actual, target)
+    assert actual.dtype == target.dtype
+    assert not actual.flags.owndata
+    assert actual.flags.writeable
+    assert np.shares_memory(actual, np.frombuffer(input_data, dtype=np.uint8))
+
+
+def test_npy_to_numpy_bytes_read_only():
+    buffer = BytesIO()
+    np.save(buffer, [42, 6, 9])
+
+    actual = decoder._npy_to_numpy(buffer.getvalue())
+
+    np.testing.assert_equal(actual, [42, 6, 9])
+    assert not actual.flags.writeable
+
+
+def test_npy_to_numpy_version_2():
+    buffer = BytesIO()
+    np.lib.format.write_array(buffer, np.arange(3), version=(2, 0))
+
+    actual = decoder._npy_to_numpy(buffer.getvalue())
+
+    np.testing.assert_equal(actual, np.arange(3))
+
+
+def test_npy_to_numpy_object_dtype():
+    buffer = BytesIO()
+    np.save(buffer, np.array([{"42": 6}, None], dtype=object))
+
+    with patch("numpy.load", wraps=np.load) as load:
+        actual = decoder._npy_to_numpy(buffer.getvalue())
+
+    load.assert_called_once()
+    assert actual.tolist() == [{"42": 6}, None]
+
+
+def test_npy_to_numpy_invalid_payload():
+    with pytest.raises(ValueError):
+        decoder._npy_to_numpy(b"not a npy payload")
+
+
 @pytest.mark.parametrize(
     "target, expected",
     [
@@ -53,6 +117,29 @@ def test_json_to_numpy(target, expected):
     np.testing.assert_equal(decoder._json_to_numpy(target, dtype=float), expected.astype(float))
 
 
+@pytest.mark.parametrize(
+    "loads",
+    [
+        pytest.param(decoder._orjson_loads, marks=requires_orjson),
+        decoder._stdlib_json_loads,
+    ],
+)
+@pytest.mark.parametrize("target", ["[[42, 6.5], [9, 1e3]]", b"[[42, 6.5], [9, 1e3]]", bytearray(b"[[42, 6.5]]")])
+def test_json_to_numpy_backend(loads, target):
+    with patch("sagemaker_inference.decoder._json_loads", loads):
+        actual = decoder._json_to_numpy(target, dtype=np.float32)
+
+    np.testing.assert_equal(actual, np.array(json.loads(target), dtype=np.float32))
+    assert actual.dtype == np.float32
+    assert actual.flags.c_contiguous
+
+
+@requires_orjson
+@pytest.mark.parametrize("target", ["[NaN, 1.0]", "[-Infinity]"])
+def test_orjson_loads_fallback(target):
+    assert json.dumps(decoder._orjson_loads(target)) == json.dumps(json.loads(target))
+
+
 @pytest.mark.parametrize(
     "target, expected",
     [
@@ -66,6 +153,34 @@ def test_csv_to_numpy(target, expected):
     np.testing.assert_equal(actual, expected)
 
 
+@pytest.mark.parametrize(
+    "target, expected",
+    [
+        ("42\n6\n9\n", np.array([42, 6, 9], dtype=np.float32)),
+        ("42,6,9\n", np.array([42, 6, 9], dtype=np.float32)),
+        ("4.2, 6\n\n9,1e3\n", np.array([[4.2, 6], [9, 1e3]], dtype=np.float32)),
+    ],
+)
+def test_csv_to_numpy_numeric(target, expected):
+    with patch("numpy.genfromtxt") as genfromtxt:
+        actual = decoder._csv_to_numpy(target, dtype=np.float32)
+
+    genfromtxt.assert_not_called()
+    np.testing.assert_equal(actual, expected)
+    assert actual.dtype == np.float32
+
+
+def test_csv_to_numpy_missing_values():
+    actual = decoder._csv_to_numpy("42,,9\n6,a,1\n", dtype=np.float32)
+
+    np.testing.assert_equal(actual, np.array([[42, np.nan, 9], [6, np.nan, 1]], dtype=np.float32))
+
+
+def test_csv_to_numpy_bad_columns():
+    with pytest.raises(ValueError):
+        decoder._csv_to_numpy("42,6,9\n6,9\n", dtype=np.float32)
+
+
 @pytest.mark.parametrize(
     "target",
     [
@@ -86,6 +201,44 @@ def test_npz_to_sparse(target):
     np.testing.assert_equal(actual, expected)
 
 
+def _safetensors(header, data=b""):
+    header_bytes = json.dumps(header).encode("utf-8")
+    return struct.pack("<Q", len(header_bytes)) + header_bytes + data
+
+
+def test_safetensors_to_numpy():
+    data = np.arange(6, dtype=np.float32).tobytes() + np.array([4, 2], dtype=np.int8).tobytes()
+    payload = bytearray(_safetensors(
+        {
+            "__metadata__": {"format": "pt"},
+            "input_ids": {"dtype": "F32", "shape": [2, 3], "data_offsets": [0, 24]},
+            "mask": {"dtype": "I8", "shape": [2], "data_offsets": [24, 26]},
+        },
+        data,
+    ))
+
+    actual = decoder._safetensors_to_numpy(payload)
+
+    assert list(actual) == ["input_ids", "mask"]
+    np.testing.assert_equal(actual["input_ids"], np.arange(6, dtype=np.float32).reshape(2, 3))
+    np.testing.assert_equal(actual["mask"], np.array([4, 2], dtype=np.int8))
+    assert np.shares_memory(actual["input_ids"], np.frombuffer(payload, dtype=np.uint8))
+
+
+@pytest.mark.parametrize(
+    "payload",
+    [
+        _safetensors({"x": {"dtype": "BF16", "shape": [1], "data_offsets": [0, 2]}}, b"42"),
+        _safetensors({"x": {"dtype": "F32", "shape": [2], "data_offsets": [0, 4]}}, b"4269"),
+        _safetensors({"x": {"dtype": "F32", "shape": [2], "data_offsets": [0, 8]}}, b"4269"),
+        struct.pack("<Q", 42) + b"{}",
+    ],
+)
+def test_safetensors_to_numpy_invalid_payload(payload):
+    with pytest.raises(ValueError):
+        decoder._safetensors_to_numpy(payload)
+
+
 def test_decode_error():
     with pytest.raises(errors.UnsupportedFormatError):
         decoder.decode(42, content_types.OCTET_STREAM)
@@ -98,3 +251,12 @@ def test_decode(content_type):
         decoder.decode(42, content_type)
 
         mock_decoder.assert_called_once_with(42)
+
+
+@pytest.mark.parametrize("content_type", [content_types.JSON, content_types.CSV])
+def test_decode_dtype(content_type):
+    mock_decoder = Mock()
+    with patch.dict(decoder._decoder_map, {content_type: mock_decoder}, clear=True):
+        decoder.decode(42, content_type, dtype=np.float32)
+
+        mock_decoder.assert_called_once_with(42, dtype=np.float32)
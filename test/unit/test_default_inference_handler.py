@@ -51,3 +51,8 @@ def test_default_model_fn():
 def test_predict_fn():
     with pytest.raises(NotImplementedError):
         DefaultInferenceHandler().default_predict_fn("data", "model")
+
+
+def test_default_post_model_fn():
+    model = Mock()
+    assert DefaultInferenceHandler().default_post_model_fn(model) is model
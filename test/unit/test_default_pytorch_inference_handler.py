@@ -15,17 +15,20 @@ from __future__ import absolute_import
 import csv
 import json
 import os
+import struct
 
 import mock
 import numpy as np
 import pytest
+import scipy.sparse
 import torch
 import torch.nn as nn
-from sagemaker_inference import content_types, errors
+from sagemaker_inference import content_types, decoder, encoder, errors
+from sagemaker_inference.transformer import Transformer
 from six import StringIO, BytesIO
 from torch.autograd import Variable
 
-from sagemaker_pytorch_serving_container import default_pytorch_inference_handler
+from sagemaker_pytorch_serving_container import compile_cache, default_pytorch_inference_handler
 
 device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
 
@@ -96,10 +99,106 @@ def test_default_model_fn_no_model_file(inference_handler, listdir_return_value)
         mock_os.path.splitext = os.path.splitext
         with mock.patch("torch.jit.load") as mock_torch_load:
             mock_torch_load.return_value = DummyModel()
-            with pytest.raises(ValueError, match=r"Exactly one .pth or .pt file is required for PyTorch models: .*"):
+            with pytest.raises(ValueError,
+                               match=r"Exactly one .pth or .pt file is required for PyTorch models: .*"):
                 inference_handler.default_model_fn("model_dir")
 
 
+@pytest.fixture(name="model_dir")
+def fixture_model_dir(tmpdir):
+    return str(tmpdir)
+
+
+@pytest.mark.parametrize("save", [torch.save, lambda model, path: torch.jit.save(torch.jit.script(model), path)])
+def test_default_model_fn_saved_model(inference_handler, model_dir, save):
+    model = nn.Linear(4, 2)
+    save(model, os.path.join(model_dir, "model.pth"))
+
+    with mock.patch("torch.load", wraps=torch.load) as torch_load:
+        loaded_model = inference_handler.default_model_fn(model_dir)
+
+    if isinstance(loaded_model, torch.jit.ScriptModule):
+        torch_load.assert_not_called()
+    else:
+        assert torch_load.call_args.kwargs["mmap"] is True
+    assert torch.equal(loaded_model.weight.cpu(), model.weight)
+
+
+def test_default_model_fn_state_dict(inference_handler, model_dir):
+    torch.save(nn.Linear(4, 2).state_dict(), os.path.join(model_dir, "model.pt"))
+
+    with pytest.raises(default_pytorch_inference_handler.ModelLoadError, match=r".* only holds a state dict.*"):
+        inference_handler.default_model_fn(model_dir)
+
+
+def _save_safetensors(tensors, path):
+    payload = encoder.encode({name: tensor.numpy() for name, tensor in tensors.items()}, content_types.SAFETENSORS)
+    with open(path, "wb") as f:
+        f.write(payload)
+
+
+def test_load_state_dict_safetensors(model_dir):
+    model = nn.Linear(4, 2)
+    path = os.path.join(model_dir, "model.safetensors")
+    _save_safetensors(model.state_dict(), path)
+
+    state_dict = default_pytorch_inference_handler.load_state_dict(path)
+
+    assert sorted(state_dict) == ["bias", "weight"]
+    loaded_model = nn.Linear(4, 2)
+    loaded_model.load_state_dict(state_dict)
+    assert torch.equal(loaded_model.weight, model.weight)
+    assert torch.equal(loaded_model.bias, model.bias)
+
+
+def test_load_state_dict_safetensors_bfloat16(model_dir):
+    weight = torch.rand(3, 2).to(torch.bfloat16)
+    header = json.dumps({"weight": {"dtype": "BF16", "shape": [3, 2], "data_offsets": [0, 12]}}).encode("utf-8")
+    path = os.path.join(model_dir, "model.safetensors")
+    with open(path, "wb") as f:
+        f.write(struct.pack("<Q", len(header)) + header + weight.view(torch.uint8).numpy().tobytes())
+
+    state_dict = default_pytorch_inference_handler.load_state_dict(path, map_location="cpu")
+
+    assert state_dict["weight"].dtype == torch.bfloat16
+    assert torch.equal(state_dict["weight"], weight)
+
+
+def test_load_state_dict_torch_save(model_dir):
+    model = nn.Linear(4, 2)
+    path = os.path.join(model_dir, "model.pt")
+    torch.save(model.state_dict(), path)
+
+    state_dict = default_pytorch_inference_handler.load_state_dict(path)
+
+    assert torch.equal(state_dict["weight"], model.weight)
+
+
+def test_default_model_fn_safetensors(inference_handler, model_dir):
+    _save_safetensors(nn.Linear(4, 2).state_dict(), os.path.join(model_dir, "model.safetensors"))
+
+    with mock.patch("sagemaker_pytorch_serving_container.default_pytorch_inference_handler._load_model") as load:
+        with pytest.raises(default_pytorch_inference_handler.ModelLoadError,
+                           match=r".* only holds .safetensors state dicts.*"):
+            inference_handler.default_model_fn(model_dir)
+
+    load.assert_not_called()
+
+
+def test_default_model_fn_safetensors_and_model_file(inference_handler, model_dir):
+    model = nn.Linear(4, 2)
+    torch.save(model, os.path.join(model_dir, "model.pth"))
+    _save_safetensors(model.state_dict(), os.path.join(model_dir, "model.safetensors"))
+
+    loaded_model = inference_handler.default_model_fn(model_dir)
+
+    assert torch.equal(loaded_model.weight.cpu(), model.weight)
+
+
+def _getenv(environ):
+    return lambda key, default=None: environ.get(key, default)
+
+
 def _produce_runtime_error(x, **kwargs):
     raise RuntimeError("dummy runtime error")
 
@@ -155,6 +254,80 @@ def test_default_input_fn_npy(inference_handler, tensor):
     assert torch.equal(tensor, deserialized_np_array)
 
 
+@pytest.mark.skipif(torch.cuda.is_available(), reason="tensors are copied to the gpu")
+def test_default_input_fn_npy_shares_memory(inference_handler):
+    stream = BytesIO()
+    np.save(stream, np.arange(6, dtype=np.float32).reshape(2, 3))
+    payload = bytearray(stream.getvalue())
+
+    deserialized_tensor = inference_handler.default_input_fn(payload, content_types.NPY)
+    deserialized_tensor[0, 0] = 42
+
+    assert deserialized_tensor.shape == (2, 3)
+    assert 42 in np.frombuffer(payload[-24:], dtype=np.float32)
+
+
+@pytest.mark.parametrize(
+    "matrix_format, layout",
+    [("csr", torch.sparse_csr), ("csc", torch.sparse_csr), ("coo", torch.sparse_coo)],
+)
+def test_default_input_fn_npz(inference_handler, matrix_format, layout):
+    matrix = scipy.sparse.random(4, 1000, density=0.01, format=matrix_format, dtype=np.float32, random_state=42)
+    stream = BytesIO()
+    scipy.sparse.save_npz(stream, matrix)
+
+    deserialized_tensor = inference_handler.default_input_fn(stream.getvalue(), content_types.NPZ)
+
+    assert deserialized_tensor.layout == layout
+    assert deserialized_tensor.is_cuda == torch.cuda.is_available()
+    assert deserialized_tensor.dtype == torch.float32
+    assert deserialized_tensor._nnz() == matrix.nnz
+    np.testing.assert_array_equal(deserialized_tensor.to_dense().cpu().numpy(), matrix.toarray())
+
+
+def test_default_predict_fn_sparse(inference_handler):
+    matrix = scipy.sparse.random(4, 10, density=0.2, format="csr", dtype=np.float32, random_state=42)
+    weight = torch.rand(10, 3)
+    sparse_tensor = inference_handler._sparse_to_tensor(matrix)
+
+    prediction = inference_handler.default_predict_fn(sparse_tensor, lambda x: torch.sparse.mm(x, weight))
+    batch_prediction = inference_handler.default_batch_predict_fn(
+        [sparse_tensor, sparse_tensor], lambda x: torch.sparse.mm(x, weight))
+
+    expected = torch.from_numpy(matrix.toarray()) @ weight
+    assert torch.allclose(prediction.cpu(), expected)
+    assert len(batch_prediction) == 2
+    assert all(torch.allclose(output.cpu(), expected) for output in batch_prediction)
+
+
+def test_default_output_fn_sparse(inference_handler):
+    tensor = torch.eye(3).to_sparse_csr()
+
+    output = inference_handler.default_output_fn(tensor, content_types.JSON)
+
+    assert json.loads(output) == torch.eye(3).tolist()
+
+
+class DummyMultiInputModel(nn.Module):
+    def forward(self, input_ids, scale):
+        return input_ids * scale, input_ids.sum()
+
+
+def test_default_safetensors_round_trip(inference_handler):
+    payload = encoder.encode({"input_ids": np.arange(6, dtype=np.float32).reshape(2, 3),
+                              "scale": np.array(2, dtype=np.int64)}, content_types.SAFETENSORS)
+
+    data = inference_handler.default_input_fn(payload, content_types.SAFETENSORS)
+    prediction = inference_handler.default_predict_fn(data, DummyMultiInputModel())
+    output = inference_handler.default_output_fn(prediction, content_types.SAFETENSORS)
+
+    assert sorted(data) == ["input_ids", "scale"]
+    assert data["input_ids"].is_cuda == torch.cuda.is_available()
+    actual = decoder.decode(output, content_types.SAFETENSORS)
+    np.testing.assert_equal(actual["output_0"], np.arange(0, 12, 2, dtype=np.float32).reshape(2, 3))
+    np.testing.assert_equal(actual["output_1"], np.array(15, dtype=np.float32))
+
+
 def test_default_input_fn_bad_content_type(inference_handler):
     with pytest.raises(errors.UnsupportedFormatError):
         inference_handler.default_input_fn("", "application/not_supported")
@@ -203,7 +376,7 @@ def test_default_predict_fn_gpu_gpu(inference_handler, tensor):
 def test_default_output_fn_json(inference_handler, tensor):
     output = inference_handler.default_output_fn(tensor, content_types.JSON)
 
-    assert json.dumps(tensor.cpu().numpy().tolist()) == output
+    np.testing.assert_array_equal(np.array(json.loads(output), dtype=np.float32), tensor.cpu().numpy())
 
 
 def test_default_output_fn_csv_long(inference_handler):
@@ -220,11 +393,18 @@ def test_default_output_fn_csv_float(inference_handler):
     assert '1.0,2.0,3.0\n4.0,5.0,6.0\n'.encode("utf-8") == output
 
 
+def test_default_output_fn_npy(inference_handler, tensor):
+    output = inference_handler.default_output_fn(tensor, content_types.NPY)
+
+    np.testing.assert_array_equal(np.load(BytesIO(output)), tensor.cpu().numpy())
+    assert np.load(BytesIO(output)).dtype == np.float32
+
+
 def test_default_output_fn_multiple_content_types(inference_handler, tensor):
     accept = ", ".join(["application/unsupported", content_types.JSON, content_types.CSV])
     output = inference_handler.default_output_fn(tensor, accept)
 
-    assert json.dumps(tensor.cpu().numpy().tolist()) == output
+    np.testing.assert_array_equal(np.array(json.loads(output), dtype=np.float32), tensor.cpu().numpy())
 
 
 def test_default_output_fn_bad_accept(inference_handler):
@@ -264,8 +444,329 @@ def test_eia_default_model_fn_error(eia_inference_handler):
 def test_eia_default_predict_fn(eia_inference_handler, tensor):
     model = DummyModel()
     with mock.patch("sagemaker_pytorch_serving_container.default_pytorch_inference_handler.os") as mock_os:
-        mock_os.getenv.return_value = "true"
+        mock_os.getenv.side_effect = _getenv({
+            default_pytorch_inference_handler.INFERENCE_ACCELERATOR_PRESENT_ENV: "true"})
         with mock.patch("torch.jit.optimized_execution") as mock_torch:
             mock_torch.__enter__.return_value = "dummy"
             eia_inference_handler.default_predict_fn(tensor, model)
         mock_torch.assert_called_once()
+
+
+def test_default_batch_predict_fn(inference_handler):
+    model = DummyModel()
+    data = [torch.rand(1, 3).to(device), torch.rand(2, 3).to(device)]
+
+    with mock.patch.object(inference_handler, "default_predict_fn",
+                           wraps=inference_handler.default_predict_fn) as predict_fn:
+        predictions = inference_handler.default_batch_predict_fn(data, model)
+
+    predict_fn.assert_called_once()
+    assert len(predictions) == 2
+    for tensor, prediction in zip(data, predictions):
+        assert torch.equal(model(tensor), prediction)
+
+
+def test_default_batch_predict_fn_incompatible_shapes(inference_handler):
+    model = DummyModel()
+    data = [torch.rand(1, 3).to(device), torch.rand(1, 4).to(device)]
+
+    with mock.patch.object(inference_handler, "default_predict_fn",
+                           wraps=inference_handler.default_predict_fn) as predict_fn:
+        predictions = inference_handler.default_batch_predict_fn(data, model)
+
+    assert predict_fn.call_count == 2
+    for tensor, prediction in zip(data, predictions):
+        assert torch.equal(model(tensor), prediction)
+
+
+def test_default_batch_predict_fn_unbatched_inputs(inference_handler):
+    model = nn.Softmax(dim=0)
+    data = [torch.tensor([1.0, 2.0, 3.0]), torch.tensor([4.0, 5.0, 6.0])]
+
+    with mock.patch.object(inference_handler, "default_predict_fn",
+                           wraps=inference_handler.default_predict_fn) as predict_fn:
+        predictions = inference_handler.default_batch_predict_fn(data, model)
+
+    assert predict_fn.call_count == 2
+    for tensor, prediction in zip(data, predictions):
+        assert torch.allclose(model(tensor), prediction.cpu())
+
+
+def test_default_batch_predict_fn_batched_prediction_failure(inference_handler):
+    def model(tensor):
+        if tensor.shape[0] > 1:
+            raise RuntimeError("batched inputs are not supported")
+        return tensor * 2
+
+    data = [torch.rand(1, 3), torch.rand(1, 3)]
+
+    with mock.patch.object(inference_handler, "default_predict_fn",
+                           wraps=inference_handler.default_predict_fn) as predict_fn:
+        predictions = inference_handler.default_batch_predict_fn(data, model)
+        assert predict_fn.call_count == 3
+        inference_handler.default_batch_predict_fn(data, model)
+        assert predict_fn.call_count == 5
+
+    for tensor, prediction in zip(data, predictions):
+        assert torch.equal(tensor.to(device) * 2, prediction)
+
+
+def test_default_batch_predict_fn_bad_input(inference_handler):
+    model = nn.Linear(3, 2).to(device)
+    data = [torch.rand(1, 3), torch.rand(1, 3), torch.rand(1, 3)]
+
+    with mock.patch.object(inference_handler, "default_predict_fn",
+                           wraps=inference_handler.default_predict_fn) as predict_fn:
+        predict_fn.side_effect = [RuntimeError("bad batch"), "first", "second", RuntimeError("bad input")]
+        predictions = inference_handler.default_batch_predict_fn(data, model)
+
+    assert predictions[:2] == ["first", "second"]
+    assert isinstance(predictions[2], RuntimeError)
+    assert inference_handler._batch_predictions is True
+
+
+def test_default_batch_predict_fn_unsplittable_output(inference_handler):
+    model = mock.Mock(return_value=torch.tensor(1.0))
+    data = [torch.rand(1, 3), torch.rand(1, 3)]
+
+    with mock.patch.object(inference_handler, "default_predict_fn", side_effect=model) as predict_fn:
+        predictions = inference_handler.default_batch_predict_fn(data, model)
+        assert predict_fn.call_count == 3
+        inference_handler.default_batch_predict_fn(data, model)
+        assert predict_fn.call_count == 5
+
+    assert len(predictions) == 2
+
+
+@pytest.mark.parametrize("output_type", [tuple, dict])
+def test_default_batch_predict_fn_split_output(inference_handler, output_type):
+    def model(tensor):
+        if output_type is tuple:
+            return tensor * 2, tensor.sum(dim=1)
+        return {"doubled": tensor * 2, "sum": tensor.sum(dim=1)}
+
+    data = [torch.rand(1, 3).to(device), torch.rand(2, 3).to(device)]
+
+    with mock.patch.object(inference_handler, "default_predict_fn",
+                           wraps=inference_handler.default_predict_fn) as predict_fn:
+        predictions = inference_handler.default_batch_predict_fn(data, model)
+
+    predict_fn.assert_called_once()
+    for tensor, prediction in zip(data, predictions):
+        expected = model(tensor)
+        if output_type is dict:
+            assert list(prediction) == ["doubled", "sum"]
+            prediction, expected = tuple(prediction.values()), tuple(expected.values())
+        assert all(torch.allclose(value, expected_value) for value, expected_value in zip(prediction, expected))
+
+
+def test_default_post_model_fn(inference_handler):
+    model = nn.Linear(2, 2)
+    model.train()
+
+    prepared_model = inference_handler.default_post_model_fn(model)
+
+    assert prepared_model.training is False
+    assert next(prepared_model.parameters()).device.type == device.type
+
+
+@mock.patch("importlib.import_module")
+@mock.patch("sagemaker_inference.transformer.find_spec", return_value=mock.Mock())
+@mock.patch("sagemaker_inference.environment.Environment")
+def test_user_model_fn_and_predict_fn_model_left_as_is(env, find_spec, import_module, inference_handler):
+    env.return_value.model_warmup_payloads_dir = None
+    model = nn.Linear(2, 2)
+    model.train()
+    user_module = mock.Mock(spec=["model_fn", "predict_fn"])
+    user_module.model_fn.return_value = model
+    user_module.predict_fn.side_effect = lambda data, model: model.training
+    import_module.return_value = user_module
+
+    transformer = Transformer(default_inference_handler=inference_handler)
+    transformer.validate_and_initialize(model_dir="/opt/ml/model")
+
+    assert transformer._model is model
+    assert transformer._predict_fn(torch.rand(1, 2), transformer._model) is True
+
+
+def test_default_post_model_fn_not_a_module(inference_handler):
+    model = object()
+    assert inference_handler.default_post_model_fn(model) is model
+
+
+@pytest.mark.parametrize("optimization", [None, "none", "freeze", "compile"])
+def test_default_optimize_model_fn_not_applicable(inference_handler, optimization):
+    model = object()
+    environ = {default_pytorch_inference_handler.OPTIMIZATION_ENV: optimization} if optimization else {}
+    with mock.patch.dict(os.environ, environ, clear=True):
+        assert inference_handler.default_optimize_model_fn(model) is model
+
+
+def test_default_optimize_model_fn_none(inference_handler):
+    model = nn.Linear(2, 2)
+    with mock.patch.dict(os.environ, {}, clear=True):
+        assert inference_handler.default_optimize_model_fn(model) is model
+
+
+def test_default_optimize_model_fn_invalid(inference_handler):
+    with mock.patch.dict(os.environ, {default_pytorch_inference_handler.OPTIMIZATION_ENV: "fast"}):
+        with pytest.raises(ValueError):
+            inference_handler.default_optimize_model_fn(nn.Linear(2, 2))
+
+
+def test_default_optimize_model_fn_freeze(inference_handler, tensor):
+    model = torch.jit.script(nn.Linear(9, 2).eval())
+    with mock.patch.dict(os.environ, {default_pytorch_inference_handler.OPTIMIZATION_ENV: "freeze"}):
+        optimized_model = inference_handler.default_optimize_model_fn(model)
+
+    assert isinstance(optimized_model, torch.jit.ScriptModule)
+    assert not list(optimized_model.parameters())
+    assert torch.allclose(optimized_model(tensor), model(tensor))
+
+
+def test_default_optimize_model_fn_freeze_eager_model(inference_handler):
+    model = nn.Linear(2, 2)
+    with mock.patch.dict(os.environ, {default_pytorch_inference_handler.OPTIMIZATION_ENV: "freeze"}):
+        assert inference_handler.default_optimize_model_fn(model) is model
+
+
+@mock.patch("torch.compile")
+def test_default_optimize_model_fn_compile(compile, inference_handler, tmpdir):
+    model = nn.Linear(2, 2)
+    environ = {
+        default_pytorch_inference_handler.OPTIMIZATION_ENV: "compile",
+        default_pytorch_inference_handler.COMPILE_MODE_ENV: "max-autotune",
+        compile_cache.COMPILE_CACHE_DIR_ENV: str(tmpdir.join("cache")),
+    }
+    model_dir = tmpdir.mkdir("model")
+    model_dir.join("model.pt").write("model")
+    context = mock.Mock(system_properties={"model_dir": str(model_dir)})
+    with mock.patch.dict(os.environ, environ, clear=True):
+        assert inference_handler.default_optimize_model_fn(model, context) == compile.return_value
+        cache_dir = os.path.join(str(tmpdir.join("cache")), compile_cache._cache_key(str(model_dir)))
+        assert os.environ["TORCHINDUCTOR_CACHE_DIR"] == os.path.join(cache_dir, "inductor")
+        assert os.environ["TRITON_CACHE_DIR"] == os.path.join(cache_dir, "triton")
+        assert os.environ["TORCHINDUCTOR_FX_GRAPH_CACHE"] == "1"
+
+    compile.assert_called_once_with(model, mode="max-autotune", backend="inductor")
+
+
+@mock.patch("torch.compile")
+def test_default_optimize_model_fn_compile_cache_configured(compile, inference_handler, tmpdir):
+    environ = {
+        default_pytorch_inference_handler.OPTIMIZATION_ENV: "compile",
+        "TORCHINDUCTOR_CACHE_DIR": str(tmpdir),
+    }
+    with mock.patch.dict(os.environ, environ, clear=True):
+        with mock.patch.object(compile_cache, "DEFAULT_COMPILE_CACHE_DIR", str(tmpdir)):
+            inference_handler.default_optimize_model_fn(nn.Linear(2, 2))
+        assert os.environ["TORCHINDUCTOR_CACHE_DIR"] == str(tmpdir)
+
+
+@mock.patch("torch.compile")
+def test_default_optimize_model_fn_compile_torchscript_model(compile, inference_handler):
+    model = torch.jit.script(nn.Linear(2, 2))
+    with mock.patch.dict(os.environ, {default_pytorch_inference_handler.OPTIMIZATION_ENV: "compile"}):
+        assert inference_handler.default_optimize_model_fn(model) is model
+
+    compile.assert_not_called()
+
+
+def test_default_predict_fn_inference_mode(inference_handler, tensor):
+    model = inference_handler.default_post_model_fn(nn.Linear(9, 2))
+    prediction = inference_handler.default_predict_fn(tensor, model)
+
+    assert prediction.is_inference()
+
+
+@pytest.mark.parametrize(
+    "execution_mode, grad_enabled, inference_mode_enabled, autocast_enabled",
+    [
+        (None, False, True, False),
+        ("inference_mode", False, True, False),
+        ("no_grad", False, False, False),
+        ("no_grad,bf16_autocast", False, False, True),
+        ("inference_mode, bf16_autocast, channels_last", False, True, True),
+    ],
+)
+def test_default_predict_context(inference_handler, execution_mode, grad_enabled, inference_mode_enabled,
+                                 autocast_enabled):
+    environ = {default_pytorch_inference_handler.EXECUTION_MODE_ENV: execution_mode} if execution_mode else {}
+    with mock.patch.dict(os.environ, environ, clear=True):
+        with inference_handler.default_predict_context():
+            assert torch.is_grad_enabled() == grad_enabled
+            assert torch.is_inference_mode_enabled() == inference_mode_enabled
+            assert torch.is_autocast_enabled(device.type) == autocast_enabled
+
+
+@pytest.mark.parametrize("accept", [content_types.JSON, content_types.NPY, content_types.SAFETENSORS])
+@mock.patch.dict(os.environ, {default_pytorch_inference_handler.EXECUTION_MODE_ENV: "bf16_autocast"})
+def test_default_predict_and_output_fn_bf16_autocast(inference_handler, accept):
+    model = inference_handler.default_post_model_fn(nn.Linear(3, 2))
+    tensor = torch.rand(4, 3)
+
+    prediction = inference_handler.default_predict_fn(tensor, model)
+    output = inference_handler.default_output_fn(prediction, accept)
+    dict_output = inference_handler.default_output_fn({"logits": prediction}, content_types.SAFETENSORS)
+
+    assert prediction.dtype == torch.bfloat16
+    assert output
+    assert decoder.decode(bytes(dict_output), content_types.SAFETENSORS)["logits"].dtype == np.float32
+
+
+def test_default_user_predict_context(inference_handler):
+    model = nn.Linear(3, 2)
+
+    with mock.patch.dict(os.environ, {}, clear=True):
+        with inference_handler.default_user_predict_context():
+            prediction = model(torch.rand(1, 3))
+            prediction.sum().backward()
+            prediction.detach().mul_(2)
+
+    assert model.weight.grad is not None
+
+
+def test_default_user_predict_context_execution_mode(inference_handler):
+    with mock.patch.dict(os.environ, {default_pytorch_inference_handler.EXECUTION_MODE_ENV: "inference_mode"}):
+        with inference_handler.default_user_predict_context():
+            assert torch.is_inference_mode_enabled()
+
+
+def _grad_modes(chunks):
+    for _ in range(chunks):
+        yield torch.is_grad_enabled(), torch.is_inference_mode_enabled()
+
+
+@mock.patch.dict(os.environ, {default_pytorch_inference_handler.EXECUTION_MODE_ENV: "inference_mode"})
+def test_default_predict_fn_streaming_model(inference_handler, tensor):
+    model = mock.Mock(side_effect=lambda data: _grad_modes(2))
+
+    chunks = inference_handler.default_predict_fn(tensor, model)
+
+    assert list(chunks) == [(False, True), (False, True)]
+
+
+@mock.patch.dict(os.environ, {default_pytorch_inference_handler.EXECUTION_MODE_ENV: "inference_mode"})
+def test_user_predict_fn_streaming(inference_handler):
+    transformer = Transformer(default_inference_handler=inference_handler)
+    predict_fn = transformer._with_predict_context(lambda data, model: _grad_modes(data))
+
+    assert list(predict_fn(2, None)) == [(False, True), (False, True)]
+
+
+@pytest.mark.parametrize("execution_mode", ["fast", "inference_mode,no_grad"])
+def test_default_predict_context_invalid_execution_mode(inference_handler, execution_mode):
+    with mock.patch.dict(os.environ, {default_pytorch_inference_handler.EXECUTION_MODE_ENV: execution_mode}):
+        with pytest.raises(ValueError):
+            with inference_handler.default_predict_context():
+                pass
+
+
+@mock.patch.dict(os.environ, {default_pytorch_inference_handler.EXECUTION_MODE_ENV: "channels_last"})
+def test_default_predict_fn_channels_last(inference_handler):
+    model = inference_handler.default_post_model_fn(nn.Conv2d(3, 4, 3))
+    tensor = torch.rand(2, 3, 8, 8)
+
+    inference_handler.default_predict_fn(tensor, mock.Mock(side_effect=model))
+
+    assert model.weight.is_contiguous(memory_format=torch.channels_last)
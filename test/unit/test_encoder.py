@@ -12,12 +12,18 @@
 # language governing permissions and limitations under the License.
 from __future__ import absolute_import
 
+import json
+import os
+import struct
+
 from mock import Mock, patch
 import numpy as np
 import pytest
 from six import BytesIO
 
-from sagemaker_inference import content_types, encoder, errors
+from sagemaker_inference import content_types, decoder, encoder, errors, parameters
+
+requires_orjson = pytest.mark.skipif(encoder.orjson is None, reason="orjson is not installed")
 
 
 @pytest.mark.parametrize(
@@ -36,6 +42,44 @@ def test_array_to_npy(target):
     np.testing.assert_equal(np.load(BytesIO(actual), allow_pickle=True), np.array(target))
 
 
+@pytest.mark.parametrize(
+    "target",
+    [
+        np.arange(12, dtype=np.float32).reshape(3, 4),
+        np.asfortranarray(np.arange(12).reshape(3, 4)),
+        np.arange(24).reshape(4, 6)[::2, 1:],
+        np.array(42),
+        np.zeros((0, 3)),
+        np.zeros(3, dtype=[("42", "<i4"), ("6", "<f8")]),
+    ],
+)
+def test_array_to_npy_matches_np_save(target):
+    expected = BytesIO()
+    np.save(expected, target)
+
+    assert encoder._array_to_npy(target) == expected.getvalue()
+
+
+def test_array_to_npy_caches_header():
+    encoder._npy_header.cache_clear()
+
+    encoder._array_to_npy(np.zeros((2, 3), dtype=np.float32))
+    encoder._array_to_npy(np.ones((2, 3), dtype=np.float32))
+    encoder._array_to_npy(np.ones((3, 2), dtype=np.float32))
+
+    cache_info = encoder._npy_header.cache_info()
+    assert (cache_info.hits, cache_info.misses) == (1, 2)
+
+
+def test_array_to_npy_tensor():
+    tensor = Mock()
+    tensor.detach.return_value.cpu.return_value.numpy.return_value = np.array([4.2, 6.9])
+
+    actual = encoder._array_to_npy(tensor)
+
+    np.testing.assert_equal(np.load(BytesIO(actual)), np.array([4.2, 6.9]))
+
+
 @pytest.mark.parametrize(
     "target, expected",
     [
@@ -58,6 +102,119 @@ def test_array_to_json_exception():
         encoder._array_to_json(lambda x: 3)
 
 
+@pytest.mark.parametrize(
+    "target",
+    [
+        np.arange(6, dtype=np.float32).reshape(2, 3) / 7,
+        np.arange(12, dtype=np.float64).reshape(3, 4).T,
+        np.arange(6, dtype=np.int64),
+        np.array([True, False]),
+        np.array(4.2),
+        np.array(["42", "6", "9"]),
+    ],
+)
+def test_array_to_json_bytes(target):
+    actual = encoder._array_to_json_bytes(target)
+
+    assert isinstance(actual, bytes)
+    np.testing.assert_array_equal(np.array(json.loads(actual), dtype=target.dtype), target)
+
+
+@requires_orjson
+def test_array_to_json_bytes_skips_tolist():
+    target = np.arange(6, dtype=np.float32)
+
+    with patch("sagemaker_inference.encoder._array_to_json") as array_to_json:
+        actual = encoder._array_to_json_bytes(target)
+
+    array_to_json.assert_not_called()
+    assert actual == b"[0.0,1.0,2.0,3.0,4.0,5.0]"
+
+
+@pytest.mark.parametrize("dtype", [np.float32, np.float64])
+def test_array_to_json_bytes_non_finite(dtype):
+    target = np.array([1.5, np.nan, np.inf, -np.inf], dtype=dtype)
+
+    actual = encoder._array_to_json_bytes(target)
+
+    assert actual == encoder._array_to_json(target).encode("utf-8")
+    assert actual == b"[1.5, NaN, Infinity, -Infinity]"
+
+
+def test_array_to_json_bytes_tensor():
+    tensor = Mock()
+    tensor.detach.return_value.cpu.return_value.numpy.return_value = np.array([4.2, 6.9])
+
+    actual = encoder._array_to_json_bytes(tensor)
+
+    assert json.loads(actual) == [4.2, 6.9]
+
+
+@pytest.mark.parametrize(
+    "target, expected",
+    [
+        ([42, 6, 9], b"[42, 6, 9]"),
+        ({42: {"6": 9.0}}, b'{"42": {"6": 9.0}}'),
+    ],
+)
+def test_array_to_json_bytes_objects(target, expected):
+    assert encoder._array_to_json_bytes(target) == expected
+
+
+@patch.dict(os.environ, {parameters.JSON_FLOAT_PRECISION_ENV: "2"})
+def test_array_to_json_bytes_float_precision():
+    actual = encoder._array_to_json_bytes(np.array([[1 / 3, 2 / 3], [42.0, 6.999]], dtype=np.float32))
+
+    assert json.loads(actual) == [[0.33, 0.67], [42.0, 7.0]]
+    assert json.loads(encoder._array_to_json_bytes(np.array([1, 2]))) == [1, 2]
+
+
+@pytest.mark.parametrize(
+    "target, expected",
+    [
+        (
+            {"logits": np.arange(6, dtype=np.float32).reshape(2, 3), "ids": np.array([4, 2])},
+            {"logits": np.arange(6, dtype=np.float32).reshape(2, 3), "ids": np.array([4, 2])},
+        ),
+        (
+            (np.array([True]), np.array(4.2, dtype=np.float16), np.arange(3, dtype=">i4")),
+            {"output_0": np.array([True]), "output_1": np.array(4.2, dtype=np.float16),
+             "output_2": np.arange(3, dtype=np.int32)},
+        ),
+        ([42, 6, 9], {"output": np.array([42, 6, 9])}),
+    ],
+)
+def test_array_to_safetensors(target, expected):
+    actual = encoder._array_to_safetensors(target)
+    header_length = struct.unpack("<Q", actual[:8])[0]
+    header = json.loads(actual[8:8 + header_length])
+    data_start = 8 + header_length
+
+    assert data_start % 8 == 0
+    assert sorted(header) == sorted(expected)
+    for name, array in expected.items():
+        begin, end = header[name]["data_offsets"]
+        assert (data_start + begin) % array.dtype.itemsize == 0
+        assert header[name]["shape"] == list(array.shape)
+        decoded = np.frombuffer(actual[data_start + begin:data_start + end], dtype=array.dtype.newbyteorder("<"))
+        np.testing.assert_equal(decoded.reshape(array.shape), array)
+    assert data_start + max(end for _, end in (h["data_offsets"] for h in header.values())) == len(actual)
+
+
+def test_array_to_safetensors_tensor():
+    tensor = Mock()
+    tensor.detach.return_value.cpu.return_value.numpy.return_value = np.array([4.2, 6.9])
+
+    actual = decoder._safetensors_to_numpy(encoder._array_to_safetensors({"x": tensor}))
+
+    np.testing.assert_equal(actual["x"], np.array([4.2, 6.9]))
+
+
+def test_array_to_safetensors_unsupported_dtype():
+    with pytest.raises(ValueError):
+        encoder._array_to_safetensors({"x": np.array(["42"])})
+
+
 @pytest.mark.parametrize(
     "target, expected",
     [
@@ -29,6 +29,7 @@ from sagemaker_inference import environment, parameters
         parameters.DEFAULT_INVOCATIONS_ACCEPT_ENV: "text/html",
         parameters.BIND_TO_PORT_ENV: "1738",
         parameters.SAFE_PORT_RANGE_ENV: "1111-2222",
+        parameters.BATCHED_INFERENCE_ENV: "true",
     },
     clear=True,
 )
@@ -45,6 +46,34 @@ def test_env():
     assert env.inference_http_port == "1738"
     assert env.management_http_port == "1738"
     assert env.safe_port_range == "1111-2222"
+    assert env.batched_inference is True
+
+
+@patch.dict(os.environ, {}, clear=True)
+def test_env_defaults():
+    env = environment.Environment()
+
+    assert env.batched_inference is False
+    assert env.warmup_input_shapes == []
+    assert env.warmup_input_dtype == "float32"
+    assert env.warmup_batch_sizes == [1]
+
+
+@patch.dict(
+    os.environ,
+    {
+        parameters.WARMUP_INPUT_SHAPES_ENV: "3,224,224; 128",
+        parameters.WARMUP_INPUT_DTYPE_ENV: "int64",
+        parameters.WARMUP_BATCH_SIZES_ENV: "1, 8,32",
+    },
+    clear=True,
+)
+def test_env_warmup():
+    env = environment.Environment()
+
+    assert env.warmup_input_shapes == [(3, 224, 224), (128,)]
+    assert env.warmup_input_dtype == "int64"
+    assert env.warmup_batch_sizes == [1, 8, 32]
 
 
 @pytest.mark.parametrize("sagemaker_program", ["program.py", "program"])
@@ -12,6 +12,10 @@
 # language governing permissions and limitations under the License.
 from __future__ import absolute_import
 
+import os
+import subprocess
+import sys
+
 from mock import patch, Mock
 
 
@@ -22,7 +26,32 @@ def test_hosting_start(Transformer, DefaultPytorchInferenceHandler):
 
     handler_service.HandlerService()
 
-    Transformer.assert_called_with(default_inference_handler=DefaultPytorchInferenceHandler())
+    Transformer.assert_called_with(default_inference_handler=DefaultPytorchInferenceHandler(), model_loader=None)
+
+
+@patch.dict(os.environ, {"SAGEMAKER_TS_PRELOAD_MODEL": "true"})
+@patch('sagemaker_pytorch_serving_container.handler_service.Transformer')
+def test_hosting_start_preload_model(Transformer):
+    from sagemaker_pytorch_serving_container import handler_service
+    from sagemaker_pytorch_serving_container.shared_model import SharedModelLoader
+
+    handler_service.HandlerService()
+
+    assert isinstance(Transformer.call_args.kwargs["model_loader"], SharedModelLoader)
+
+
+@patch.dict(os.environ, {"SAGEMAKER_TS_PRELOAD_MODEL": "true"})
+@patch('sagemaker_pytorch_serving_container.handler_service.Transformer')
+def test_hosting_start_preload_model_multi_model(Transformer):
+    from sagemaker_pytorch_serving_container import handler_service
+
+    handler_service.ENABLE_MULTI_MODEL = True
+    try:
+        handler_service.HandlerService()
+    finally:
+        handler_service.ENABLE_MULTI_MODEL = False
+
+    assert Transformer.call_args.kwargs["model_loader"] is None
 
 
 @patch('sagemaker_pytorch_serving_container.default_pytorch_inference_handler.DefaultPytorchInferenceHandler')
@@ -35,4 +64,185 @@ def test_hosting_start_enable_multi_model(Transformer, DefaultPytorchInferenceHa
     handler_service.ENABLE_MULTI_MODEL = True
     handler = handler_service.HandlerService()
     handler.initialize(context)
+    handler._model_config_thread.join()
     handler_service.ENABLE_MULTI_MODEL = False
+
+
+@patch.dict(os.environ, {"SAGEMAKER_TS_INTRA_OP_THREADS": "6", "SAGEMAKER_TS_INTER_OP_THREADS": "1"})
+@patch('torch.set_num_interop_threads', side_effect=RuntimeError("already started"))
+@patch('torch.set_num_threads')
+@patch('sagemaker_pytorch_serving_container.handler_service.Transformer')
+def test_hosting_initialize_sets_torch_threads(Transformer, set_num_threads, set_num_interop_threads):
+    from sagemaker_pytorch_serving_container import handler_service
+
+    context = Mock()
+    context.system_properties.get.return_value = "/"
+    handler = handler_service.HandlerService()
+    handler.initialize(context)
+    handler.initialize(context)
+
+    set_num_threads.assert_called_once_with(6)
+    set_num_interop_threads.assert_called_once_with(1)
+
+
+@patch.dict(os.environ, {}, clear=True)
+@patch('torch.set_num_interop_threads')
+@patch('torch.set_num_threads')
+@patch('sagemaker_pytorch_serving_container.handler_service.Transformer')
+def test_hosting_initialize_default_torch_threads(Transformer, set_num_threads, set_num_interop_threads):
+    from sagemaker_pytorch_serving_container import handler_service
+
+    context = Mock()
+    context.system_properties.get.return_value = "/"
+    handler_service.HandlerService().initialize(context)
+
+    set_num_threads.assert_not_called()
+    set_num_interop_threads.assert_not_called()
+
+
+@patch.dict(os.environ, {"SAGEMAKER_TS_PIN_CORES": "true", "SAGEMAKER_MODEL_SERVER_WORKERS": "2"}, clear=True)
+@patch('sagemaker_pytorch_serving_container.cpu_topology.pin_worker', return_value=frozenset({0, 1, 2}))
+@patch('torch.set_num_threads')
+@patch('sagemaker_pytorch_serving_container.handler_service.Transformer')
+def test_hosting_initialize_pins_cores(Transformer, set_num_threads, pin_worker):
+    from sagemaker_pytorch_serving_container import handler_service
+
+    context = Mock()
+    context.system_properties.get.return_value = "/"
+    handler_service.HandlerService().initialize(context)
+
+    pin_worker.assert_called_once_with(2)
+    set_num_threads.assert_called_once_with(3)
+
+
+@patch.dict(os.environ, {"SAGEMAKER_TS_PIN_CORES": "true", "SAGEMAKER_MODEL_SERVER_WORKERS": "8",
+                         "SAGEMAKER_TS_MAX_WORKERS": "4"}, clear=True)
+@patch('sagemaker_pytorch_serving_container.cpu_topology.pin_worker', return_value=None)
+@patch('torch.set_num_threads')
+@patch('sagemaker_pytorch_serving_container.handler_service.Transformer')
+def test_hosting_initialize_pins_cores_max_workers(Transformer, set_num_threads, pin_worker):
+    from sagemaker_pytorch_serving_container import handler_service
+
+    context = Mock()
+    context.system_properties.get.return_value = "/"
+    handler_service.HandlerService().initialize(context)
+
+    pin_worker.assert_called_once_with(4)
+    set_num_threads.assert_not_called()
+
+
+@patch.dict(os.environ, {"SAGEMAKER_TS_PIN_CORES": "true"}, clear=True)
+@patch('sagemaker_pytorch_serving_container.cpu_topology.pin_worker')
+@patch('torch.set_num_threads')
+@patch('sagemaker_pytorch_serving_container.handler_service.Transformer')
+def test_hosting_initialize_pins_cores_unknown_workers(Transformer, set_num_threads, pin_worker):
+    from sagemaker_pytorch_serving_container import handler_service
+
+    context = Mock()
+    context.system_properties.get.return_value = "/"
+    handler_service.HandlerService().initialize(context)
+
+    pin_worker.assert_not_called()
+    set_num_threads.assert_not_called()
+
+
+@patch.dict(os.environ, {"SAGEMAKER_TS_PIN_CORES": "true", "SAGEMAKER_MODEL_SERVER_WORKERS": "2"}, clear=True)
+@patch('sagemaker_pytorch_serving_container.model_config.load_model_config', return_value=None)
+@patch('sagemaker_pytorch_serving_container.cpu_topology.pin_worker')
+@patch('torch.set_num_threads')
+@patch('sagemaker_pytorch_serving_container.handler_service.Transformer')
+def test_hosting_initialize_pins_cores_multi_model(Transformer, set_num_threads, pin_worker, load_model_config):
+    from sagemaker_pytorch_serving_container import handler_service
+
+    context = Mock()
+    context.system_properties.get.return_value = "/opt/ml/models/model"
+    handler_service.ENABLE_MULTI_MODEL = True
+    try:
+        handler = handler_service.HandlerService()
+        handler.initialize(context)
+        handler._model_config_thread.join()
+    finally:
+        handler_service.ENABLE_MULTI_MODEL = False
+
+    pin_worker.assert_not_called()
+
+
+@patch.dict(os.environ, {"SAGEMAKER_HANDLER": "custom_handler_service"})
+@patch('sagemaker_pytorch_serving_container.model_config.apply_model_config')
+@patch('sagemaker_pytorch_serving_container.model_config.load_model_config', return_value={"batchSize": 8})
+@patch('sagemaker_pytorch_serving_container.handler_service.Transformer')
+def test_hosting_initialize_multi_model_config(Transformer, load_model_config, apply_model_config):
+    from sagemaker_pytorch_serving_container import handler_service
+
+    context = Mock()
+    context.system_properties.get.return_value = "/opt/ml/models/model"
+    handler_service.ENABLE_MULTI_MODEL = True
+    try:
+        handler = handler_service.HandlerService()
+        handler.initialize(context)
+        handler._model_config_thread.join()
+    finally:
+        handler_service.ENABLE_MULTI_MODEL = False
+
+    load_model_config.assert_called_once_with("/opt/ml/models/model")
+    apply_model_config.assert_called_once_with(
+        context.model_name, {"batchSize": 8}, "http://127.0.0.1:8080", "/opt/ml/models/model", "custom_handler_service"
+    )
+
+
+@patch('sagemaker_pytorch_serving_container.model_config.apply_model_config', side_effect=OSError("refused"))
+@patch('sagemaker_pytorch_serving_container.model_config.load_model_config', return_value={"maxWorkers": 2})
+@patch('sagemaker_pytorch_serving_container.handler_service.Transformer')
+def test_hosting_initialize_multi_model_config_failure(Transformer, load_model_config, apply_model_config):
+    from sagemaker_pytorch_serving_container import handler_service
+
+    context = Mock()
+    context.system_properties.get.return_value = "/opt/ml/models/model"
+    handler_service.ENABLE_MULTI_MODEL = True
+    try:
+        handler = handler_service.HandlerService()
+        handler.initialize(context)
+        handler._model_config_thread.join()
+    finally:
+        handler_service.ENABLE_MULTI_MODEL = False
+
+    apply_model_config.assert_called_once()
+    handler._service.validate_and_initialize.assert_called_once()
+
+
+@patch.dict(os.environ, {"SAGEMAKER_TS_ADAPTIVE_BATCHING": "true"}, clear=True)
+@patch('sagemaker_pytorch_serving_container.batch_controller.record_batch')
+@patch('sagemaker_pytorch_serving_container.handler_service.Transformer')
+def test_hosting_handle_records_batch(Transformer, record_batch):
+    from sagemaker_pytorch_serving_container import handler_service
+
+    handler = handler_service.HandlerService()
+    response = handler.handle([{"body": b"0"}, {"body": b"1"}], Mock())
+
+    assert response is Transformer.return_value.transform.return_value
+    batch_size, latency = record_batch.call_args[0]
+    assert batch_size == 2
+    assert latency >= 0
+
+
+@patch.dict(os.environ, {}, clear=True)
+@patch('sagemaker_pytorch_serving_container.batch_controller.record_batch')
+@patch('sagemaker_pytorch_serving_container.handler_service.Transformer')
+def test_hosting_handle_does_not_record_batch_by_default(Transformer, record_batch):
+    from sagemaker_pytorch_serving_container import handler_service
+
+    handler_service.HandlerService().handle([{"body": b"0"}], Mock())
+
+    record_batch.assert_not_called()
+
+
+def test_import_does_not_load_optional_modules():
+    code = (
+        "import sys\n"
+        "import sagemaker_pytorch_serving_container.handler_service\n"
+        "print(sorted({'boto3', 'pkg_resources', 'scipy'}.intersection(sys.modules)))\n"
+    )
+
+    output = subprocess.check_output([sys.executable, "-c", code])
+
+    assert output.decode("utf-8").strip() == "[]"
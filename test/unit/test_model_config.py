@@ -0,0 +1,141 @@
+# Copyright 2019-2020 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"). You
+# may not use this file except in compliance with the License. A copy of
+# the License is located at
+#
+#     http://aws.amazon.com/apache2.0/
+#
+# or in the "license" file accompanying this file. This file is
+# distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF
+# ANY KIND, either express or implied. See the License for the specific
+# language governing permissions and limitations under the License.
+from __future__ import absolute_import
+
+import io
+import json
+
+from mock import MagicMock, patch
+import pytest
+
+from sagemaker_pytorch_serving_container import model_config
+from sagemaker_pytorch_serving_container.batch_controller import BatchSettings
+
+MANAGEMENT_ADDRESS = "http://127.0.0.1:8080"
+REGISTERED = {
+    "modelName": "model",
+    "minWorkers": 1,
+    "maxWorkers": 1,
+    "batchSize": 1,
+    "maxBatchDelay": 100,
+    "responseTimeout": 120,
+}
+
+
+def test_load_model_config_yaml(tmpdir):
+    tmpdir.mkdir("code").join("model-config.yaml").write(
+        "minWorkers: 2\nmaxWorkers: 4\nbatchSize: 8\nmaxBatchDelay: 50\nhandler:\n  custom: true\n"
+    )
+    tmpdir.join("model-config.json").write(json.dumps({"batchSize": 2}))
+
+    assert model_config.load_model_config(str(tmpdir)) == {
+        "minWorkers": 2, "maxWorkers": 4, "batchSize": 8, "maxBatchDelay": 50
+    }
+
+
+def test_load_model_config_json(tmpdir):
+    tmpdir.join("model-config.json").write(json.dumps({"minWorkers": "2", "responseTimeout": 120}))
+
+    assert model_config.load_model_config(str(tmpdir)) == {"minWorkers": 2, "responseTimeout": 120}
+
+
+def test_load_model_config_missing(tmpdir):
+    assert model_config.load_model_config(str(tmpdir)) is None
+
+
+@pytest.mark.parametrize("content", ["", "null\n"])
+def test_load_model_config_empty(tmpdir, content):
+    tmpdir.join("model-config.yaml").write(content)
+
+    assert model_config.load_model_config(str(tmpdir)) == {}
+
+
+def test_load_model_config_invalid(tmpdir):
+    tmpdir.join("model-config.yaml").write("- batchSize\n")
+
+    with pytest.raises(ValueError):
+        model_config.load_model_config(str(tmpdir))
+
+
+def _response(body):
+    response = MagicMock()
+    response.__enter__.return_value = io.BytesIO(json.dumps(body).encode("utf-8"))
+    return response
+
+
+@patch("urllib.request.OpenerDirector.open")
+def test_apply_model_config_scales_workers(opener_open):
+    opener_open.side_effect = [_response([REGISTERED]), MagicMock()]
+
+    assert model_config.apply_model_config("a/b", {"minWorkers": 2, "maxWorkers": 4}, MANAGEMENT_ADDRESS)
+
+    assert opener_open.call_args_list[0][0][0] == "http://127.0.0.1:8080/models/a%2Fb"
+    request = opener_open.call_args_list[1][0][0]
+    assert request.get_method() == "PUT"
+    assert request.full_url == "http://127.0.0.1:8080/models/a%2Fb?min_worker=2&max_worker=4&synchronous=false"
+
+
+@patch("urllib.request.OpenerDirector.open")
+def test_apply_model_config_min_workers_only(opener_open):
+    opener_open.side_effect = [_response([REGISTERED]), MagicMock()]
+
+    assert model_config.apply_model_config("model", {"minWorkers": 3}, MANAGEMENT_ADDRESS)
+
+    assert opener_open.call_args_list[1][0][0].full_url.endswith("?min_worker=3&max_worker=3&synchronous=false")
+
+
+@patch("sagemaker_pytorch_serving_container.model_config.logger")
+@patch("urllib.request.OpenerDirector.open")
+def test_apply_model_config_already_applied(opener_open, logger):
+    opener_open.side_effect = [_response([REGISTERED])]
+
+    assert not model_config.apply_model_config("model", {"maxWorkers": 1}, MANAGEMENT_ADDRESS)
+
+    assert opener_open.call_count == 1
+    logger.warning.assert_not_called()
+
+
+@patch("sagemaker_pytorch_serving_container.batch_controller.ManagementApiActuator")
+@patch("urllib.request.OpenerDirector.open")
+def test_apply_model_config_registers_new_version(opener_open, actuator):
+    opener_open.side_effect = [_response([REGISTERED])]
+    config = {"maxWorkers": 2, "batchSize": 8, "maxBatchDelay": 50}
+
+    assert model_config.apply_model_config("model", config, MANAGEMENT_ADDRESS, "/opt/ml/models/m", "handler")
+
+    actuator.assert_called_once_with("model", "/opt/ml/models/m", MANAGEMENT_ADDRESS, "handler")
+    actuator.return_value.apply.assert_called_once_with(
+        BatchSettings(8, 50), response_timeout=120, workers=(1, 2)
+    )
+    assert opener_open.call_count == 1
+
+
+@patch("sagemaker_pytorch_serving_container.batch_controller.ManagementApiActuator")
+@patch("urllib.request.OpenerDirector.open")
+def test_apply_model_config_registration_settings_applied(opener_open, actuator):
+    opener_open.side_effect = [_response([REGISTERED])]
+
+    applied = model_config.apply_model_config(
+        "model", {"batchSize": 1, "responseTimeout": 120}, MANAGEMENT_ADDRESS, "/opt/ml/models/m", "handler"
+    )
+
+    assert not applied
+    actuator.assert_not_called()
+
+
+@patch("urllib.request.OpenerDirector.open")
+def test_apply_model_config_registration_settings_without_model_dir(opener_open):
+    opener_open.side_effect = [_response([REGISTERED])]
+
+    with pytest.raises(ValueError):
+        model_config.apply_model_config("model", {"batchSize": 8}, MANAGEMENT_ADDRESS)
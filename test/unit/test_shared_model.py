@@ -0,0 +1,121 @@
+# Copyright 2019-2020 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"). You
+# may not use this file except in compliance with the License. A copy of
+# the License is located at
+#
+#     http://aws.amazon.com/apache2.0/
+#
+# or in the "license" file accompanying this file. This file is
+# distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF
+# ANY KIND, either express or implied. See the License for the specific
+# language governing permissions and limitations under the License.
+from __future__ import absolute_import
+
+import os
+
+from mock import Mock, patch
+import pytest
+import torch
+import torch.nn as nn
+
+from sagemaker_pytorch_serving_container.shared_model import SharedModelLoader
+
+
+class UnpicklableModel(nn.Module):
+    def __init__(self):
+        super(UnpicklableModel, self).__init__()
+        self.linear = nn.Linear(4, 2)
+        self.transform = lambda x: x
+
+
+@pytest.fixture(autouse=True)
+def cpu_only():
+    with patch("torch.cuda.is_available", return_value=False):
+        yield
+
+
+def test_shared_model_loader(tmpdir):
+    model = nn.Linear(4, 2)
+    model_fn = Mock(return_value=model)
+
+    first_worker_model = SharedModelLoader(str(tmpdir))(model_fn, "/opt/ml/model")
+    second_worker_model = SharedModelLoader(str(tmpdir))(model_fn, "/opt/ml/model")
+
+    model_fn.assert_called_once_with("/opt/ml/model")
+    for loaded_model in (first_worker_model, second_worker_model):
+        assert isinstance(loaded_model, nn.Linear)
+        assert torch.equal(loaded_model.weight, model.weight)
+        assert loaded_model.weight.data_ptr() != model.weight.data_ptr()
+    assert [name for name in os.listdir(str(tmpdir)) if name.endswith(".pt")]
+
+
+def test_shared_model_loader_per_model(tmpdir):
+    shared_dir = str(tmpdir.mkdir("shm"))
+    tmpdir.mkdir("first").join("model.pt").write("first")
+    tmpdir.mkdir("second").join("model.pt").write("second")
+    model_fn = Mock(side_effect=lambda model_dir: nn.Linear(4, 2))
+    loader = SharedModelLoader(shared_dir)
+
+    loader(model_fn, str(tmpdir.join("first")))
+    loader(model_fn, str(tmpdir.join("second")))
+
+    assert model_fn.call_count == 2
+
+
+def test_shared_model_loader_linked_model_dir(tmpdir):
+    shared_dir = str(tmpdir.mkdir("shm"))
+    model_dir = tmpdir.mkdir("model")
+    model_dir.join("model.pt").write("model")
+    model_dir.mkdir("MAR-INF").join("MANIFEST.json").write('{"model": {"modelVersion": "1.0"}}')
+    version_dir = tmpdir.mkdir("1.1")
+    version_dir.join("model.pt").mksymlinkto(model_dir.join("model.pt"))
+    version_dir.mkdir("MAR-INF").join("MANIFEST.json").write('{"model": {"modelVersion": "1.1"}}')
+    model_fn = Mock(side_effect=lambda model_dir: nn.Linear(4, 2))
+
+    SharedModelLoader(shared_dir)(model_fn, str(model_dir))
+    SharedModelLoader(shared_dir)(model_fn, str(version_dir))
+
+    model_fn.assert_called_once_with(str(model_dir))
+
+
+def test_shared_model_loader_model_updated_in_place(tmpdir):
+    shared_dir = tmpdir.mkdir("shm")
+    model_dir = tmpdir.mkdir("model")
+    model_dir.join("model.pt").write("v1")
+    model_fn = Mock(side_effect=lambda model_dir: nn.Linear(4, 2))
+
+    SharedModelLoader(str(shared_dir))(model_fn, str(model_dir))
+    first_files = [name for name in os.listdir(str(shared_dir)) if name.endswith(".pt")]
+    model_dir.join("model.pt").write("version 2")
+    model = SharedModelLoader(str(shared_dir))(model_fn, str(model_dir))
+    second_files = [name for name in os.listdir(str(shared_dir)) if name.endswith(".pt")]
+
+    assert model_fn.call_count == 2
+    assert isinstance(model, nn.Linear)
+    assert len(first_files) == len(second_files) == 1
+    assert first_files != second_files
+
+
+@pytest.mark.parametrize(
+    "model",
+    [torch.jit.script(nn.Linear(4, 2)), UnpicklableModel(), {"model": "not a module"}],
+)
+def test_shared_model_loader_not_shared(tmpdir, model):
+    model_fn = Mock(return_value=model)
+    loader = SharedModelLoader(str(tmpdir))
+
+    assert loader(model_fn, "/opt/ml/model") is model
+    assert loader(model_fn, "/opt/ml/model") is model
+    assert model_fn.call_count == 2
+    assert not [name for name in os.listdir(str(tmpdir)) if name.endswith((".pt", ".tmp"))]
+
+
+def test_shared_model_loader_gpu(tmpdir):
+    model_fn = Mock()
+
+    with patch("torch.cuda.is_available", return_value=True):
+        model = SharedModelLoader(str(tmpdir))(model_fn, "/opt/ml/model")
+
+    assert model is model_fn.return_value
+    assert os.listdir(str(tmpdir)) == []
@@ -0,0 +1,105 @@
+# Copyright 2019-2020 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the 'License'). You
+# may not use this file except in compliance with the License. A copy of
+# the License is located at
+#
+#     http://aws.amazon.com/apache2.0/
+#
+# or in the 'license' file accompanying this file. This file is
+# distributed on an 'AS IS' BASIS, WITHOUT WARRANTIES OR CONDITIONS OF
+# ANY KIND, either express or implied. See the License for the specific
+# language governing permissions and limitations under the License.
+from __future__ import absolute_import
+
+import time
+
+from mock import call, Mock, patch
+
+from sagemaker_inference import stage_metrics
+from sagemaker_inference.stage_metrics import LatencyHistogram, StageMetrics, StageTimer
+
+
+def test_stage_timer_accumulates():
+    timer = StageTimer()
+    start = time.perf_counter()
+
+    timer.add(stage_metrics.DECODE, start)
+    first = timer.times[stage_metrics.DECODE]
+    timer.add(stage_metrics.DECODE, start)
+
+    assert timer.times[stage_metrics.DECODE] >= 2 * first > 0
+
+
+def test_latency_histogram_percentiles():
+    histogram = LatencyHistogram()
+    assert histogram.percentile(50) is None
+
+    for value in [1.0] * 90 + [100.0] * 10:
+        histogram.observe(value)
+
+    assert histogram.count == 100
+    assert histogram.sum == 1090.0
+    assert 1.0 <= histogram.percentile(50) < 1.2
+    assert 1.0 <= histogram.percentile(90) < 1.2
+    assert 100.0 <= histogram.percentile(99) < 120.0
+
+
+def test_latency_histogram_overflow():
+    histogram = LatencyHistogram()
+    histogram.observe(1e9)
+
+    assert histogram.percentile(50) == float("inf")
+
+
+def _timer(**times):
+    timer = StageTimer()
+    timer.times.update(times)
+    return timer
+
+
+def test_report_emits_metrics_and_histograms():
+    metrics = StageMetrics()
+    context = Mock(model_name="model")
+
+    metrics.report(context, _timer(decode=0.001, predict_fn=0.02))
+    metrics.report(context, _timer(decode=0.003, predict_fn=0.04))
+
+    context.metrics.add_time.assert_has_calls([call("DecodeTime", 1.0), call("PredictFnTime", 20.0)])
+    histograms = metrics.histograms("model")
+    assert set(histograms) == {"decode", "predict_fn"}
+    assert histograms["predict_fn"].count == 2
+    assert metrics.histograms("other") == {}
+
+
+def test_report_ignores_metric_failures():
+    metrics = StageMetrics()
+    context = Mock(model_name="model")
+    context.metrics.add_time.side_effect = RuntimeError("unknown metric")
+
+    metrics.report(context, _timer(decode=0.001))
+
+    assert metrics.histograms("model")["decode"].count == 1
+
+
+def test_report_without_metrics():
+    metrics = StageMetrics()
+    context = Mock(spec=["model_name"], model_name="model")
+
+    metrics.report(context, _timer(encode=0.001))
+
+    assert metrics.histograms("model")["encode"].count == 1
+
+
+@patch("sagemaker_inference.stage_metrics.logger")
+def test_report_logs_summary(logger):
+    metrics = StageMetrics(summary_interval=0)
+    context = Mock(model_name="model")
+
+    metrics.report(context, _timer(predict_fn=0.01, decode=0.001))
+
+    logger.info.assert_called_once()
+    summary = logger.info.call_args[0][2]
+    assert summary.startswith("decode p50")
+    assert "predict_fn p50" in summary
+    assert "(1 batches)" in summary
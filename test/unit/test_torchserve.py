@@ -15,21 +15,42 @@ import os
 import signal
 import subprocess
 import types
+import urllib.error
 
-from mock import Mock, patch
+from mock import MagicMock, Mock, patch
+import psutil
 import pytest
 
 from sagemaker_inference import environment, model_server
-from sagemaker_pytorch_serving_container import torchserve
+from sagemaker_pytorch_serving_container import batch_controller, cpu_topology, torchserve
 from sagemaker_pytorch_serving_container.torchserve import TS_NAMESPACE
 
 PYTHON_PATH = "python_path"
 DEFAULT_CONFIGURATION = "default_configuration"
 
 
+@patch("sagemaker_pytorch_serving_container.compile_cache.configure_compile_cache")
+def test_set_compile_cache(configure_compile_cache):
+    torchserve._set_compile_cache()
+
+    configure_compile_cache.assert_called_once_with(environment.model_dir)
+
+
+@patch("sagemaker_pytorch_serving_container.compile_cache.configure_compile_cache")
+def test_set_compile_cache_multi_model(configure_compile_cache):
+    torchserve.ENABLE_MULTI_MODEL = True
+    torchserve._set_compile_cache()
+    torchserve.ENABLE_MULTI_MODEL = False
+
+    configure_compile_cache.assert_called_once_with(None)
+
+
+@patch("sagemaker_pytorch_serving_container.torchserve._start_batch_controller")
+@patch("sagemaker_pytorch_serving_container.torchserve._set_compile_cache")
 @patch("subprocess.call")
 @patch("subprocess.Popen")
-@patch("sagemaker_pytorch_serving_container.torchserve._retrieve_ts_server_process")
+@patch("sagemaker_pytorch_serving_container.torchserve._wait_for_ready")
+@patch("sagemaker_pytorch_serving_container.torchserve._find_ts_server_process")
 @patch("sagemaker_pytorch_serving_container.torchserve._add_sigterm_handler")
 @patch("sagemaker_inference.model_server._install_requirements")
 @patch("os.path.exists", return_value=True)
@@ -42,12 +63,16 @@ def test_start_torchserve_default_service_handler(
     install_requirements,
     sigterm,
     retrieve,
+    wait_for_ready,
     subprocess_popen,
     subprocess_call,
+    set_compile_cache,
+    start_batch_controller,
 ):
     torchserve.start_torchserve()
 
     set_python_path.assert_called_once_with()
+    set_compile_cache.assert_called_once_with()
     create_config.assert_called_once_with(torchserve.DEFAULT_HANDLER_SERVICE)
     install_requirements.assert_called_once_with()
 
@@ -65,12 +90,19 @@ def test_start_torchserve_default_service_handler(
     ]
 
     subprocess_popen.assert_called_once_with(ts_model_server_cmd)
+    retrieve.assert_called_once_with(subprocess_popen.return_value)
     sigterm.assert_called_once_with(retrieve.return_value)
+    wait_for_ready.assert_called_once_with(retrieve.return_value)
+    start_batch_controller.assert_called_once_with(torchserve.DEFAULT_HANDLER_SERVICE)
+    retrieve.return_value.wait.assert_called_once_with()
 
 
+@patch("sagemaker_pytorch_serving_container.torchserve._start_batch_controller")
+@patch("sagemaker_pytorch_serving_container.torchserve._set_compile_cache")
 @patch("subprocess.call")
 @patch("subprocess.Popen")
-@patch("sagemaker_pytorch_serving_container.torchserve._retrieve_ts_server_process")
+@patch("sagemaker_pytorch_serving_container.torchserve._wait_for_ready")
+@patch("sagemaker_pytorch_serving_container.torchserve._find_ts_server_process")
 @patch("sagemaker_pytorch_serving_container.torchserve._add_sigterm_handler")
 @patch("sagemaker_inference.model_server._install_requirements")
 @patch("os.path.exists", return_value=True)
@@ -83,14 +115,18 @@ def test_start_torchserve_default_service_handler_multi_model(
     install_requirements,
     sigterm,
     retrieve,
+    wait_for_ready,
     subprocess_popen,
     subprocess_call,
+    set_compile_cache,
+    start_batch_controller,
 ):
     torchserve.ENABLE_MULTI_MODEL = True
     torchserve.start_torchserve()
     torchserve.ENABLE_MULTI_MODEL = False
 
     set_python_path.assert_called_once_with()
+    set_compile_cache.assert_called_once_with()
     create_config.assert_called_once_with(torchserve.DEFAULT_HANDLER_SERVICE)
     exists.assert_called_once_with(model_server.REQUIREMENTS_PATH)
     install_requirements.assert_called_once_with()
@@ -107,7 +143,71 @@ def test_start_torchserve_default_service_handler_multi_model(
     ]
 
     subprocess_popen.assert_called_once_with(ts_model_server_cmd)
+    retrieve.assert_called_once_with(subprocess_popen.return_value)
     sigterm.assert_called_once_with(retrieve.return_value)
+    wait_for_ready.assert_called_once_with(retrieve.return_value)
+    start_batch_controller.assert_called_once_with(torchserve.DEFAULT_HANDLER_SERVICE)
+    retrieve.return_value.wait.assert_called_once_with()
+
+
+@patch("threading.Thread")
+def test_start_batch_controller_disabled(thread):
+    with patch.dict(os.environ, {}, clear=True):
+        assert torchserve._start_batch_controller() is None
+
+    thread.assert_not_called()
+
+
+@patch("threading.Thread")
+def test_start_batch_controller(thread):
+    env = {
+        "SAGEMAKER_TS_ADAPTIVE_BATCHING": "true",
+        "SAGEMAKER_TS_LATENCY_SLO": "100",
+        "SAGEMAKER_TS_BATCH_SIZE": "4",
+        "SAGEMAKER_TS_MAX_BATCH_DELAY": "20",
+        "SAGEMAKER_MODEL_SERVER_WORKERS": "2",
+    }
+    with patch.dict(os.environ, env, clear=True):
+        assert torchserve._start_batch_controller() is thread.return_value
+
+    thread.return_value.start.assert_called_once_with()
+    controller, reader, actuator = thread.call_args[1]["args"]
+    assert thread.call_args[1]["target"] is batch_controller.run_controller
+    assert thread.call_args[1]["daemon"] is True
+    assert controller.settings == batch_controller.BatchSettings(4, 20)
+    assert controller._latency_slo == 100
+    assert controller.workers == 2
+    assert actuator._model_name == torchserve.DEFAULT_TS_MODEL_NAME
+    assert actuator._model_url == environment.model_dir
+    assert actuator._handler == torchserve.DEFAULT_HANDLER_SERVICE + ":handle"
+
+
+@patch("threading.Thread")
+def test_start_batch_controller_default_workers(thread):
+    with patch.dict(os.environ, {"SAGEMAKER_TS_ADAPTIVE_BATCHING": "true"}, clear=True):
+        torchserve._start_batch_controller()
+
+    controller = thread.call_args[1]["args"][0]
+    assert controller.workers == 1
+
+
+@patch("threading.Thread")
+def test_start_batch_controller_pinned_cores(thread):
+    env = {"SAGEMAKER_TS_ADAPTIVE_BATCHING": "true", "SAGEMAKER_TS_PIN_CORES": "true"}
+    with patch.dict(os.environ, env, clear=True):
+        assert torchserve._start_batch_controller() is None
+
+    thread.assert_not_called()
+
+
+@patch("threading.Thread")
+def test_start_batch_controller_multi_model(thread):
+    torchserve.ENABLE_MULTI_MODEL = True
+    with patch.dict(os.environ, {"SAGEMAKER_TS_ADAPTIVE_BATCHING": "true"}, clear=True):
+        assert torchserve._start_batch_controller() is None
+    torchserve.ENABLE_MULTI_MODEL = False
+
+    thread.assert_not_called()
 
 
 @patch.dict(os.environ, {torchserve.PYTHON_PATH_ENV: PYTHON_PATH}, clear=True)
@@ -265,3 +365,146 @@ def test_retrieve_ts_server_process_too_many_servers(process_iter, retry):
         torchserve._retrieve_ts_server_process()
 
     assert "multiple ts model servers are not supported" in str(e.value)
+
+
+def test_find_ts_server_process_pid_file(tmpdir):
+    launcher = Mock()
+    server = Mock()
+    server.cmdline.return_value = ["java", TS_NAMESPACE]
+    pid_file = tmpdir.join(".model_server.pid")
+    pid_file.write("1234")
+
+    with patch.object(torchserve, "TS_PID_FILE", str(pid_file)), \
+            patch("psutil.Process", return_value=server) as process, \
+            patch("sagemaker_pytorch_serving_container.torchserve._retrieve_ts_server_process") as retrieve:
+        assert torchserve._find_ts_server_process(launcher) == server
+
+    launcher.wait.assert_called_once_with()
+    process.assert_called_once_with(1234)
+    retrieve.assert_not_called()
+
+
+@pytest.mark.parametrize("pid, cmdline", [(None, []), ("1234", ["python", "other"]), ("", [])])
+def test_find_ts_server_process_fallback(tmpdir, pid, cmdline):
+    pid_file = tmpdir.join(".model_server.pid")
+    if pid is not None:
+        pid_file.write(pid)
+    server = Mock()
+    server.cmdline.return_value = cmdline
+
+    with patch.object(torchserve, "TS_PID_FILE", str(pid_file)), \
+            patch("psutil.Process", return_value=server), \
+            patch("sagemaker_pytorch_serving_container.torchserve._retrieve_ts_server_process") as retrieve:
+        assert torchserve._find_ts_server_process(Mock()) == retrieve.return_value
+
+
+def _ping_response(status):
+    response = MagicMock()
+    response.__enter__.return_value.status = status
+    return response
+
+
+@patch("urllib.request.OpenerDirector.open")
+def test_wait_for_ready(opener_open):
+    opener_open.side_effect = [
+        urllib.error.URLError("connection refused"),
+        urllib.error.HTTPError("url", 500, "Unhealthy", {}, None),
+        _ping_response(200),
+    ]
+    ts_process = Mock()
+    ts_process.wait.side_effect = psutil.TimeoutExpired(torchserve.READINESS_POLL_INTERVAL)
+
+    assert torchserve._wait_for_ready(ts_process) is True
+
+    assert opener_open.call_count == 3
+    assert ts_process.wait.call_count == 2
+    assert opener_open.call_args[0][0] == "http://127.0.0.1:8080/ping"
+
+
+@patch("urllib.request.OpenerDirector.open", side_effect=urllib.error.URLError("connection refused"))
+def test_wait_for_ready_server_exited(opener_open):
+    ts_process = Mock()
+
+    assert torchserve._wait_for_ready(ts_process) is False
+
+    opener_open.assert_called_once()
+    ts_process.wait.assert_called_once_with(timeout=torchserve.READINESS_POLL_INTERVAL)
+
+
+@pytest.mark.parametrize(
+    "environ, min_workers, max_workers",
+    [
+        ({}, 1, 1),
+        ({"SAGEMAKER_MODEL_SERVER_WORKERS": "2"}, 2, 2),
+        ({"SAGEMAKER_MODEL_SERVER_WORKERS": "2", "SAGEMAKER_TS_MAX_WORKERS": "4"}, 2, 4),
+        ({"SAGEMAKER_MODEL_SERVER_WORKERS": "8", "SAGEMAKER_TS_MAX_WORKERS": "4"}, 4, 4),
+        ({"SAGEMAKER_MODEL_SERVER_WORKERS": "2", "SAGEMAKER_TS_MIN_WORKERS": "3"}, 3, 3),
+    ],
+)
+@patch("sagemaker_inference.utils.read_file", return_value=DEFAULT_CONFIGURATION)
+def test_generate_ts_config_properties_model_workers(read_file, environ, min_workers, max_workers):
+    with patch.dict(os.environ, dict(environ, SAGEMAKER_TS_BATCH_SIZE="4"), clear=True):
+        ts_config_properties = torchserve._generate_ts_config_properties(torchserve.DEFAULT_HANDLER_SERVICE)
+
+    assert '"minWorkers": {},'.format(min_workers) in ts_config_properties
+    assert '"maxWorkers": {},'.format(max_workers) in ts_config_properties
+    assert '"batchSize": 4,' in ts_config_properties
+
+
+TOPOLOGY = cpu_topology.CpuTopology(
+    cpus=frozenset(range(8)), cpu_quota=None, physical_cores=4, numa_nodes=[frozenset(range(8))], gpus=0
+)
+
+
+@patch.dict(os.environ, {}, clear=True)
+@patch("sagemaker_pytorch_serving_container.cpu_topology.read_cpu_topology")
+def test_tune_cpu_threads_disabled(read_cpu_topology):
+    torchserve._tune_cpu_threads()
+
+    read_cpu_topology.assert_not_called()
+    assert os.environ == {}
+
+
+@patch.dict(os.environ, {"SAGEMAKER_TS_AUTO_TUNE_THREADS": "true"}, clear=True)
+@patch("sagemaker_pytorch_serving_container.cpu_topology.read_cpu_topology", return_value=TOPOLOGY)
+def test_tune_cpu_threads(read_cpu_topology):
+    torchserve._tune_cpu_threads()
+
+    assert os.environ["SAGEMAKER_MODEL_SERVER_WORKERS"] == "1"
+    assert os.environ["SAGEMAKER_TS_INTRA_OP_THREADS"] == "4"
+    assert os.environ["SAGEMAKER_TS_INTER_OP_THREADS"] == "1"
+    assert os.environ["OMP_NUM_THREADS"] == "4"
+    assert os.environ["MKL_NUM_THREADS"] == "4"
+
+
+@patch.dict(os.environ, {"SAGEMAKER_TS_AUTO_TUNE_THREADS": "true"}, clear=True)
+@patch("sagemaker_pytorch_serving_container.cpu_topology.read_cpu_topology", return_value=TOPOLOGY)
+def test_tune_cpu_threads_multi_model(read_cpu_topology):
+    torchserve.ENABLE_MULTI_MODEL = True
+    try:
+        torchserve._tune_cpu_threads()
+    finally:
+        torchserve.ENABLE_MULTI_MODEL = False
+
+    read_cpu_topology.assert_not_called()
+    assert "SAGEMAKER_MODEL_SERVER_WORKERS" not in os.environ
+    assert "OMP_NUM_THREADS" not in os.environ
+
+
+@pytest.mark.parametrize(
+    "environ, workers, intra_op_threads",
+    [
+        ({"SAGEMAKER_MODEL_SERVER_WORKERS": "2"}, "2", "2"),
+        ({"SAGEMAKER_TS_MAX_WORKERS": "4"}, "4", "1"),
+        ({"SAGEMAKER_TS_THREADS_PER_WORKER": "1"}, "4", "1"),
+    ],
+)
+@patch("sagemaker_pytorch_serving_container.cpu_topology.read_cpu_topology", return_value=TOPOLOGY)
+def test_tune_cpu_threads_configured_workers(read_cpu_topology, environ, workers, intra_op_threads):
+    environ = dict(environ, SAGEMAKER_TS_AUTO_TUNE_THREADS="true", OMP_NUM_THREADS="3")
+    with patch.dict(os.environ, environ, clear=True):
+        torchserve._tune_cpu_threads()
+
+        assert os.environ["SAGEMAKER_MODEL_SERVER_WORKERS"] == workers
+        assert os.environ["SAGEMAKER_TS_INTRA_OP_THREADS"] == intra_op_threads
+        assert os.environ["OMP_NUM_THREADS"] == "3"
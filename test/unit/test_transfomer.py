@@ -12,7 +12,13 @@
 # language governing permissions and limitations under the License.
 from __future__ import absolute_import
 
+from contextlib import contextmanager
+from inspect import signature
+import io
+import os
+
 from mock import call, Mock, patch
+import numpy as np
 import pytest
 
 try:
@@ -20,7 +26,7 @@ try:
 except ImportError:
     import httplib as http_client
 
-from sagemaker_inference import content_types, environment
+from sagemaker_inference import content_types, environment, parameters
 from sagemaker_inference.default_inference_handler import DefaultInferenceHandler
 from sagemaker_inference.errors import BaseInferenceToolkitError
 from sagemaker_inference.transformer import Transformer
@@ -44,6 +50,8 @@ def test_default_transformer():
     assert transformer._initialized is False
     assert transformer._environment is None
     assert transformer._pre_model_fn is None
+    assert transformer._post_model_fn is None
+    assert transformer._optimize_model_fn is None
     assert transformer._model_warmup_fn is None
     assert transformer._model is None
     assert transformer._model_fn is None
@@ -63,6 +71,8 @@ def test_transformer_with_custom_default_inference_handler():
     assert transformer._initialized is False
     assert transformer._environment is None
     assert transformer._pre_model_fn is None
+    assert transformer._post_model_fn is None
+    assert transformer._optimize_model_fn is None
     assert transformer._model_warmup_fn is None
     assert transformer._model is None
     assert transformer._model_fn is None
@@ -114,7 +124,7 @@ def test_batch_transform(validate, retrieve_content_type_header, run_handler, ac
     request_processor = Mock()
     transform_fn = Mock()
 
-    context.request_processor = [request_processor]
+    context.request_processor = [request_processor, request_processor]
     request_property = {accept_key: ACCEPT}
     request_processor.get_request_properties.return_value = request_property
 
@@ -132,7 +142,7 @@ def test_batch_transform(validate, retrieve_content_type_header, run_handler, ac
         transformer._transform_fn, MODEL, INPUT_DATA, CONTENT_TYPE, ACCEPT
     )
     assert run_handler.call_count == 2
-    context.set_response_content_type.assert_called_with(0, ACCEPT)
+    context.set_response_content_type.assert_has_calls([call(0, ACCEPT), call(1, ACCEPT)])
     assert context.set_response_content_type.call_count == 2
     assert isinstance(result, list)
     assert result == [RESULT, RESULT]
@@ -253,6 +263,280 @@ def test_transform_tuple(validate, retrieve_content_type_header, run_handler):
     assert result[0] == run_handler()[0]
 
 
+@patch("sagemaker_inference.utils.retrieve_content_type_header", return_value=CONTENT_TYPE)
+@patch("sagemaker_inference.transformer.Transformer.validate_and_initialize")
+def test_transform_batched(validate, retrieve_content_type_header):
+    data = [{"body": INPUT_DATA}, {"body": INPUT_DATA}]
+    context = Mock()
+    request_processor = Mock()
+    batch_transform_fn = Mock(return_value=[RESULT, (PROCESSED_RESULT, CONTENT_TYPE)])
+
+    def user_batch_transform_fn(model, input_data_list, content_type_list, accept_list, context):
+        return batch_transform_fn(model, input_data_list, content_type_list, accept_list, context)
+
+    context.request_processor = [request_processor, request_processor]
+    request_processor.get_request_properties.return_value = {"accept": ACCEPT}
+
+    transformer = Transformer()
+    transformer._model = MODEL
+    transformer._transform_fn = Mock()
+    transformer._batch_transform_fn = user_batch_transform_fn
+    transformer._context = context
+
+    result = transformer.transform(data, context)
+
+    batch_transform_fn.assert_called_once_with(
+        MODEL, [INPUT_DATA, INPUT_DATA], [CONTENT_TYPE, CONTENT_TYPE], [ACCEPT, ACCEPT], context
+    )
+    transformer._transform_fn.assert_not_called()
+    context.set_response_content_type.assert_has_calls([call(0, ACCEPT), call(1, CONTENT_TYPE)])
+    assert result == [RESULT, PROCESSED_RESULT]
+
+
+def _stage_transformer(context):
+    def input_fn(input_data, content_type):
+        return PREPROCESSED_DATA
+
+    def predict_fn(data, model):
+        return PREDICT_RESULT
+
+    def batch_predict_fn(data, model):
+        return [PREDICT_RESULT] * len(data)
+
+    def output_fn(prediction, accept):
+        return PROCESSED_RESULT
+
+    transformer = Transformer()
+    transformer._model = MODEL
+    transformer._input_fn = input_fn
+    transformer._predict_fn = predict_fn
+    transformer._batch_predict_fn = batch_predict_fn
+    transformer._output_fn = output_fn
+    transformer._transform_fn = transformer._default_transform_fn
+    transformer._context = context
+    return transformer
+
+
+@patch("sagemaker_inference.stage_metrics.stage_metrics")
+@patch("sagemaker_inference.utils.retrieve_content_type_header", return_value=CONTENT_TYPE)
+@patch("sagemaker_inference.transformer.Transformer.validate_and_initialize")
+def test_transform_times_stages(validate, retrieve_content_type_header, stage_metrics):
+    context = Mock()
+    context.request_processor = [Mock(), Mock()]
+    transformer = _stage_transformer(context)
+
+    result = transformer.transform([{"body": INPUT_DATA}, {"body": INPUT_DATA}], context)
+
+    assert result == [PROCESSED_RESULT, PROCESSED_RESULT]
+    stage_metrics.report.assert_called_once_with(context, transformer._stage_timer)
+    times = transformer._stage_timer.times
+    assert set(times) == {"decode", "input_fn", "predict_fn", "output_fn", "encode", "transform_fn"}
+    assert times["transform_fn"] >= times["input_fn"] + times["predict_fn"] + times["output_fn"]
+
+
+@patch("sagemaker_inference.stage_metrics.stage_metrics")
+@patch("sagemaker_inference.utils.retrieve_content_type_header", return_value=CONTENT_TYPE)
+@patch("sagemaker_inference.transformer.Transformer.validate_and_initialize")
+def test_transform_batched_times_stages(validate, retrieve_content_type_header, stage_metrics):
+    context = Mock()
+    context.request_processor = [Mock(), Mock()]
+    transformer = _stage_transformer(context)
+    transformer._batch_transform_fn = transformer._default_batch_transform_fn
+
+    result = transformer.transform([{"body": INPUT_DATA}, {"body": INPUT_DATA}], context)
+
+    assert result == [PROCESSED_RESULT, PROCESSED_RESULT]
+    stage_metrics.report.assert_called_once_with(context, transformer._stage_timer)
+    assert set(transformer._stage_timer.times) == {
+        "decode", "input_fn", "predict_fn", "output_fn", "encode", "transform_fn"
+    }
+
+
+@patch("sagemaker_inference.stage_metrics.stage_metrics")
+@patch("sagemaker_inference.transformer.Transformer.validate_and_initialize", side_effect=ValueError)
+def test_transform_initialization_failure_is_not_timed(validate, stage_metrics):
+    context = Mock()
+
+    Transformer().transform([{"body": INPUT_DATA}], context)
+
+    stage_metrics.report.assert_not_called()
+
+
+@patch("sagemaker_inference.utils.retrieve_content_type_header", return_value=CONTENT_TYPE)
+@patch("sagemaker_inference.transformer.Transformer.validate_and_initialize")
+def test_transform_batched_wrong_number_of_results(validate, retrieve_content_type_header):
+    data = [{"body": INPUT_DATA}, {"body": INPUT_DATA}]
+    context = Mock()
+    request_processor = Mock()
+
+    context.request_processor = [request_processor, request_processor]
+    request_processor.get_request_properties.return_value = {"accept": ACCEPT}
+
+    transformer = Transformer()
+    transformer._model = MODEL
+    transformer._batch_transform_fn = lambda model, input_data_list, content_type_list, accept_list: [
+        RESULT
+    ]
+    transformer._context = context
+
+    response = transformer.transform(data, context)
+
+    assert "batch_transform_fn returned 1 results for a batch of 2 requests." in str(response)
+    assert len(response) == 2
+    assert context.set_response_status.call_count == 2
+
+
+@patch("sagemaker_inference.transformer.Transformer.validate_and_initialize")
+def test_transform_per_request_headers(validate):
+    data = [{"body": INPUT_DATA}, {"body": INPUT_DATA}]
+    context = Mock()
+    first_request_processor = Mock()
+    second_request_processor = Mock()
+    first_request_processor.get_request_properties.return_value = {
+        "Content-Type": CONTENT_TYPE,
+        "Accept": ACCEPT,
+    }
+    second_request_processor.get_request_properties.return_value = {
+        "Content-Type": content_types.NPY,
+        "Accept": content_types.NPY,
+    }
+    context.request_processor = [first_request_processor, second_request_processor]
+
+    transformer = Transformer()
+    transformer._model = MODEL
+    transformer._transform_fn = Mock()
+    transformer._context = context
+
+    with patch(
+        "sagemaker_inference.transformer.Transformer._run_handler_function",
+        side_effect=lambda func, model, input_data, content_type, accept: content_type,
+    ):
+        result = transformer.transform(data, context)
+
+    assert result == [CONTENT_TYPE, content_types.NPY]
+    context.set_response_content_type.assert_has_calls(
+        [call(0, ACCEPT), call(1, content_types.NPY)]
+    )
+
+
+@patch(
+    "sagemaker_inference.transformer.Transformer._run_handler_function",
+    side_effect=[ValueError("Foo"), RESULT],
+)
+@patch("sagemaker_inference.utils.retrieve_content_type_header", return_value=CONTENT_TYPE)
+@patch("sagemaker_inference.transformer.Transformer.validate_and_initialize")
+def test_transform_per_request_error(validate, retrieve_content_type_header, run_handler):
+    data = [{"body": INPUT_DATA}, {"body": INPUT_DATA}]
+    context = Mock()
+    request_processor = Mock()
+    request_processor.get_request_properties.return_value = {"accept": ACCEPT}
+    context.request_processor = [request_processor, request_processor]
+
+    transformer = Transformer()
+    transformer._model = MODEL
+    transformer._transform_fn = Mock()
+    transformer._context = context
+
+    result = transformer.transform(data, context)
+
+    assert len(result) == 2
+    assert "Foo" in result[0]
+    assert result[1] == RESULT
+    context.set_response_status.assert_called_once_with(
+        code=http_client.INTERNAL_SERVER_ERROR, phrase="Foo", idx=0
+    )
+    context.set_response_content_type.assert_called_once_with(1, ACCEPT)
+
+
+@patch("sagemaker_inference.utils.retrieve_content_type_header", return_value=CONTENT_TYPE)
+@patch("sagemaker_inference.transformer.Transformer.validate_and_initialize")
+def test_transform_batched_per_request_error(validate, retrieve_content_type_header):
+    data = [{"body": INPUT_DATA}, {"body": INPUT_DATA}]
+    context = Mock()
+    request_processor = Mock()
+    request_processor.get_request_properties.return_value = {"accept": ACCEPT}
+    context.request_processor = [request_processor, request_processor]
+
+    def batch_transform_fn(model, input_data_list, content_type_list, accept_list):
+        return [RESULT, ValueError("Foo")]
+
+    transformer = Transformer()
+    transformer._model = MODEL
+    transformer._batch_transform_fn = batch_transform_fn
+    transformer._context = context
+
+    result = transformer.transform(data, context)
+
+    assert result[0] == RESULT
+    assert "Foo" in result[1]
+    context.set_response_content_type.assert_called_once_with(0, ACCEPT)
+    context.set_response_status.assert_called_once_with(
+        code=http_client.INTERNAL_SERVER_ERROR, phrase="Foo", idx=1
+    )
+
+
+@patch("sagemaker_inference.transformer.send_intermediate_predict_response")
+@patch("sagemaker_inference.utils.retrieve_content_type_header", return_value=CONTENT_TYPE)
+@patch("sagemaker_inference.transformer.Transformer.validate_and_initialize")
+def test_transform_stream(validate, retrieve_content_type_header, send_intermediate_response):
+    data = [{"body": INPUT_DATA}, {"body": INPUT_DATA}]
+    context = Mock()
+    context.request_ids = {0: "request-0", 1: "request-1"}
+    request_processor = Mock()
+    request_processor.get_request_properties.return_value = {"accept": ACCEPT}
+    context.request_processor = [request_processor, request_processor]
+
+    def chunks():
+        context.set_response_content_type.assert_called_with(1, ACCEPT)
+        yield b"4"
+        yield b"2"
+        yield b"!"
+
+    transform_fn = Mock(side_effect=[RESULT, chunks()])
+
+    transformer = Transformer()
+    transformer._model = MODEL
+    transformer._transform_fn = lambda model, input_data, content_type, accept: transform_fn()
+    transformer._context = context
+
+    result = transformer.transform(data, context)
+
+    assert result == [RESULT, b"!"]
+    send_intermediate_response.assert_has_calls(
+        [
+            call({1: b"4"}, {1: "request-1"}, "Intermediate Prediction success", http_client.OK, context),
+            call({1: b"2"}, {1: "request-1"}, "Intermediate Prediction success", http_client.OK, context),
+        ]
+    )
+    assert send_intermediate_response.call_count == 2
+
+
+@patch("sagemaker_inference.transformer.send_intermediate_predict_response")
+def test_stream_response_empty(send_intermediate_response):
+    context = Mock(request_ids={0: "request-0"})
+
+    assert Transformer._stream_response(context, 0, (chunk for chunk in [])) == b""
+    send_intermediate_response.assert_not_called()
+
+
+@patch("sagemaker_inference.transformer.send_intermediate_predict_response", None)
+def test_stream_response_not_supported():
+    chunks = (chunk for chunk in [b"4", "2", bytearray(b"!")])
+
+    assert Transformer._stream_response(Mock(), 0, chunks) == b"42!"
+
+
+def test_default_transform_fn_stream():
+    transformer = Transformer()
+    transformer._input_fn = lambda input_data, content_type: input_data
+    transformer._predict_fn = lambda data, model: (token for token in data)
+    transformer._output_fn = lambda prediction, accept: prediction.encode("utf-8")
+
+    result = transformer._default_transform_fn(MODEL, "42!", CONTENT_TYPE, ACCEPT)
+
+    assert list(result) == [b"4", b"2", b"!"]
+
+
 @patch("sagemaker_inference.transformer.Transformer._validate_user_module_and_set_functions")
 @patch("sagemaker_inference.environment.Environment")
 def test_validate_and_initialize(env, validate_user_module):
@@ -277,6 +561,184 @@ def test_validate_and_initialize(env, validate_user_module):
     validate_user_module.assert_called_once_with()
 
 
+@patch("sagemaker_inference.transformer.Transformer._validate_user_module_and_set_functions")
+@patch("sagemaker_inference.environment.Environment")
+def test_validate_and_initialize_post_model_fn(env, validate_user_module):
+    transformer = Transformer()
+
+    prepared_model = Mock()
+    model_fn = Mock(return_value=MODEL)
+    transformer._model_fn = model_fn
+    transformer._post_model_fn = Mock(return_value=prepared_model)
+    transformer._model_warmup_fn = Mock()
+
+    context = Mock()
+    transformer.validate_and_initialize(context=context)
+
+    transformer._post_model_fn.assert_called_once_with(MODEL, context)
+    transformer._model_warmup_fn.assert_called_once_with(environment.model_dir, prepared_model)
+    assert transformer._model == prepared_model
+
+
+@patch("sagemaker_inference.transformer.Transformer._validate_user_module_and_set_functions")
+@patch("sagemaker_inference.environment.Environment")
+def test_validate_and_initialize_optimize_model_fn(env, validate_user_module):
+    transformer = Transformer()
+
+    prepared_model = Mock()
+    optimized_model = Mock()
+    transformer._model_fn = Mock(return_value=MODEL)
+    transformer._post_model_fn = Mock(return_value=prepared_model)
+    transformer._optimize_model_fn = Mock(return_value=optimized_model)
+    transformer._model_warmup_fn = Mock()
+
+    context = Mock()
+    transformer.validate_and_initialize(context=context)
+
+    transformer._optimize_model_fn.assert_called_once_with(prepared_model, context)
+    transformer._model_warmup_fn.assert_called_once_with(environment.model_dir, optimized_model)
+    assert transformer._model == optimized_model
+
+
+def _warmup_transformer(environ, result=RESULT):
+    calls = []
+
+    def transform_fn(model, input_data, content_type, accept):
+        calls.append((model, input_data, content_type, accept))
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    transformer = Transformer()
+    with patch.dict(os.environ, environ, clear=True):
+        transformer._environment = environment.Environment()
+    transformer._model = MODEL
+    transformer._transform_fn = transform_fn
+    transformer._batch_transform_fn = None
+    return transformer, calls
+
+
+def test_warmup_payload_files(tmpdir):
+    tmpdir.join("warmup_payload.json").write("[[1, 2]]")
+    tmpdir.join("warmup_payload.txt").write("ignored")
+    transformer, calls = _warmup_transformer({})
+
+    transformer._warmup(str(tmpdir))
+
+    assert calls == [(MODEL, "[[1, 2]]", content_types.JSON, content_types.JSON)]
+
+
+def test_warmup_synthetic_inputs():
+    transformer, calls = _warmup_transformer(
+        {
+            parameters.WARMUP_INPUT_SHAPES_ENV: "3,4",
+            parameters.WARMUP_BATCH_SIZES_ENV: "1,8",
+            parameters.WARMUP_INPUT_DTYPE_ENV: "float16",
+        }
+    )
+
+    transformer._warmup("model_dir")
+
+    inputs = [np.load(io.BytesIO(input_data)) for _, input_data, _, _ in calls]
+    assert [array.shape for array in inputs] == [(1, 3, 4), (8, 3, 4)]
+    assert all(array.dtype == np.float16 for array in inputs)
+    assert all(content_type == content_types.NPY for _, _, content_type, _ in calls)
+
+
+def test_warmup_synthetic_inputs_batched():
+    batches = []
+
+    def batch_transform_fn(model, input_data_list, content_type_list, accept_list):
+        batches.append(input_data_list)
+        return input_data_list
+
+    transformer, _ = _warmup_transformer(
+        {parameters.WARMUP_INPUT_SHAPES_ENV: "5", parameters.WARMUP_BATCH_SIZES_ENV: "2,4"}
+    )
+    transformer._batch_transform_fn = batch_transform_fn
+
+    transformer._warmup("model_dir")
+
+    assert [len(batch) for batch in batches] == [2, 4]
+    assert all(np.load(io.BytesIO(data)).shape == (1, 5) for batch in batches for data in batch)
+
+
+def test_warmup_consumes_streamed_results():
+    chunks = []
+
+    def stream():
+        for chunk in (b"a", b"b"):
+            chunks.append(chunk)
+            yield chunk
+
+    transformer, _ = _warmup_transformer({parameters.WARMUP_INPUT_SHAPES_ENV: "2"}, stream())
+
+    transformer._warmup("model_dir")
+
+    assert chunks == [b"a", b"b"]
+
+
+def test_warmup_failure_is_logged():
+    transformer, calls = _warmup_transformer(
+        {parameters.WARMUP_INPUT_SHAPES_ENV: "2", parameters.WARMUP_BATCH_SIZES_ENV: "1,2"},
+        ValueError("bad shape"),
+    )
+
+    with patch("sagemaker_inference.transformer.logger") as logger:
+        transformer._warmup("model_dir")
+
+    assert len(calls) == 2
+    assert logger.warning.call_count == 2
+
+
+@pytest.mark.parametrize(
+    "environ",
+    [
+        {parameters.WARMUP_INPUT_SHAPES_ENV: "3,x"},
+        {parameters.WARMUP_INPUT_SHAPES_ENV: "3", parameters.WARMUP_INPUT_DTYPE_ENV: "bfloat16"},
+        {parameters.WARMUP_INPUT_SHAPES_ENV: "3", parameters.WARMUP_BATCH_SIZES_ENV: "one"},
+    ],
+)
+def test_warmup_invalid_settings_are_logged(tmpdir, environ):
+    tmpdir.join("warmup_payload.json").write("[[1, 2]]")
+    transformer, calls = _warmup_transformer(environ)
+
+    with patch("sagemaker_inference.transformer.logger") as logger:
+        transformer._warmup(str(tmpdir))
+
+    logger.warning.assert_called_once()
+    assert "Warmup failed." in logger.warning.call_args[0]
+
+
+def test_warmup_batched_failure_is_logged():
+    def batch_transform_fn(model, input_data_list, content_type_list, accept_list):
+        return [ValueError("bad shape")]
+
+    transformer, _ = _warmup_transformer({parameters.WARMUP_INPUT_SHAPES_ENV: "2"})
+    transformer._batch_transform_fn = batch_transform_fn
+
+    with patch("sagemaker_inference.transformer.logger") as logger:
+        transformer._warmup("model_dir")
+
+    logger.warning.assert_called_once()
+
+
+@patch("sagemaker_inference.transformer.Transformer._validate_user_module_and_set_functions")
+@patch("sagemaker_inference.environment.Environment")
+def test_validate_and_initialize_model_loader(env, validate_user_module):
+    def model_loader(model_fn, model_dir):
+        return model_fn(model_dir), "loaded"
+
+    transformer = Transformer(model_loader=model_loader)
+    transformer._model_fn = Mock(return_value=MODEL)
+
+    context = Mock()
+    transformer.validate_and_initialize(model_dir="model_dir", context=context)
+
+    transformer._model_fn.assert_called_once_with("model_dir", context)
+    assert transformer._model == (MODEL, "loaded")
+
+
 @patch("sagemaker_inference.transformer.Transformer._validate_user_module_and_set_functions")
 @patch("sagemaker_inference.environment.Environment")
 def test_handle_validate_and_initialize_error(env, validate_user_module):
@@ -305,7 +767,7 @@ def test_handle_validate_and_initialize_error(env, validate_user_module):
     assert test_error_message in str(response)
     assert "Traceback (most recent call last)" in str(response)
     context.set_response_status.assert_called_with(
-        code=http_client.INTERNAL_SERVER_ERROR, phrase=test_error_message
+        code=http_client.INTERNAL_SERVER_ERROR, phrase=test_error_message, idx=0
     )
 
 
@@ -341,7 +803,7 @@ def test_handle_validate_and_initialize_user_error(env, validate_user_module):
     assert test_error_message in str(response)
     assert "Traceback (most recent call last)" in str(response)
     context.set_response_status.assert_called_with(
-        code=http_client.FORBIDDEN, phrase=test_error_message
+        code=http_client.FORBIDDEN, phrase=test_error_message, idx=0
     )
 
 
@@ -361,6 +823,8 @@ def test_validate_no_user_module_and_set_functions(find_spec, import_module):
     mock_env.module_name = "foo_module"
 
     default_pre_model_fn = object()
+    default_post_model_fn = object()
+    default_optimize_model_fn = object()
     default_model_warmup_fn = object()
     default_model_fn = object()
     default_input_fn = object()
@@ -368,6 +832,8 @@ def test_validate_no_user_module_and_set_functions(find_spec, import_module):
     default_output_fn = object()
 
     default_inference_handler.default_pre_model_fn = default_pre_model_fn
+    default_inference_handler.default_post_model_fn = default_post_model_fn
+    default_inference_handler.default_optimize_model_fn = default_optimize_model_fn
     default_inference_handler.default_model_warmup_fn = default_model_warmup_fn
     default_inference_handler.default_model_fn = default_model_fn
     default_inference_handler.default_input_fn = default_input_fn
@@ -383,6 +849,8 @@ def test_validate_no_user_module_and_set_functions(find_spec, import_module):
     assert transformer._default_inference_handler == default_inference_handler
     assert transformer._environment == mock_env
     assert transformer._pre_model_fn == default_pre_model_fn
+    assert transformer._post_model_fn == default_post_model_fn
+    assert transformer._optimize_model_fn == default_optimize_model_fn
     assert transformer._model_warmup_fn == default_model_warmup_fn
     assert transformer._model_fn == default_model_fn
     assert transformer._input_fn == default_input_fn
@@ -398,6 +866,8 @@ def test_validate_user_module_and_set_functions(find_spec, import_module):
     mock_env.module_name = "foo_module"
 
     default_pre_model_fn = object()
+    default_post_model_fn = object()
+    default_optimize_model_fn = object()
     default_model_warmup_fn = object()
     default_model_fn = object()
     default_input_fn = object()
@@ -405,6 +875,8 @@ def test_validate_user_module_and_set_functions(find_spec, import_module):
     default_output_fn = object()
 
     default_inference_handler.default_pre_model_fn = default_pre_model_fn
+    default_inference_handler.default_post_model_fn = default_post_model_fn
+    default_inference_handler.default_optimize_model_fn = default_optimize_model_fn
     default_inference_handler.default_model_warmup_fn = default_model_warmup_fn
     default_inference_handler.default_model_fn = default_model_fn
     default_inference_handler.default_input_fn = default_input_fn
@@ -420,6 +892,8 @@ def test_validate_user_module_and_set_functions(find_spec, import_module):
     assert transformer._default_inference_handler == default_inference_handler
     assert transformer._environment == mock_env
     assert transformer._pre_model_fn == default_pre_model_fn
+    assert transformer._post_model_fn == default_post_model_fn
+    assert transformer._optimize_model_fn == default_optimize_model_fn
     assert transformer._model_warmup_fn == default_model_warmup_fn
     assert transformer._model_fn == default_model_fn
     assert transformer._input_fn == default_input_fn
@@ -448,6 +922,219 @@ def test_validate_user_module_and_set_functions_transform_fn(find_spec, import_m
     assert transformer._transform_fn == import_module.return_value.transform_fn
 
 
+@patch(
+    "importlib.import_module",
+    return_value=UserModuleMock(input_fn=None, predict_fn=None, output_fn=None, transform_fn=None),
+)
+@patch("sagemaker_inference.transformer.find_spec", return_value=Mock())
+def test_validate_user_module_and_set_functions_batched_inference(find_spec, import_module):
+    default_inference_handler = Mock()
+    mock_env = Mock()
+    mock_env.batched_inference = True
+
+    transformer = Transformer(default_inference_handler)
+    transformer._environment = mock_env
+    transformer._validate_user_module_and_set_functions()
+
+    assert transformer._batch_predict_fn == default_inference_handler.default_batch_predict_fn
+    assert transformer._batch_transform_fn == transformer._default_batch_transform_fn
+
+
+@patch(
+    "importlib.import_module",
+    return_value=UserModuleMock(input_fn=None, output_fn=None, transform_fn=None),
+)
+@patch("sagemaker_inference.transformer.find_spec", return_value=Mock())
+def test_validate_user_module_and_set_functions_batched_inference_user_predict_fn(
+    find_spec, import_module
+):
+    mock_env = Mock()
+    mock_env.batched_inference = True
+
+    transformer = Transformer(Mock())
+    transformer._environment = mock_env
+    transformer._validate_user_module_and_set_functions()
+
+    assert transformer._batch_predict_fn is None
+    assert transformer._batch_transform_fn is None
+
+
+@patch("importlib.import_module")
+@patch("sagemaker_inference.transformer.find_spec", return_value=Mock())
+def test_validate_user_module_and_set_functions_batch_predict_fn(find_spec, import_module):
+    user_module = UserModuleMock(predict_fn=None, transform_fn=None)
+    user_module.batch_predict_fn = Mock()
+    import_module.return_value = user_module
+    mock_env = Mock()
+    mock_env.batched_inference = False
+
+    transformer = Transformer()
+    transformer._environment = mock_env
+    transformer._validate_user_module_and_set_functions()
+
+    assert transformer._batch_predict_fn == user_module.batch_predict_fn
+    assert transformer._batch_transform_fn == transformer._default_batch_transform_fn
+
+
+@patch("importlib.import_module")
+@patch("sagemaker_inference.transformer.find_spec", return_value=Mock())
+def test_validate_user_module_and_set_functions_batch_transform_fn(find_spec, import_module):
+    user_module = UserModuleMock(input_fn=None, predict_fn=None, output_fn=None, transform_fn=None)
+    user_module.batch_transform_fn = Mock()
+    import_module.return_value = user_module
+
+    transformer = Transformer()
+    transformer._environment = Mock()
+    transformer._validate_user_module_and_set_functions()
+
+    assert transformer._batch_transform_fn == user_module.batch_transform_fn
+
+
+@patch("importlib.import_module")
+@patch("sagemaker_inference.transformer.find_spec", return_value=Mock())
+def test_validate_user_module_batch_transform_fn_error(find_spec, import_module):
+    user_module = UserModuleMock(input_fn=None, output_fn=None, transform_fn=None)
+    user_module.batch_transform_fn = Mock()
+    import_module.return_value = user_module
+
+    with pytest.raises(ValueError) as e:
+        transformer = Transformer()
+        transformer._environment = Mock()
+        transformer._validate_user_module_and_set_functions()
+
+    assert "Cannot use batch_transform_fn implementation in conjunction with" in str(e.value)
+
+
+@patch("importlib.import_module")
+@patch("sagemaker_inference.transformer.find_spec", return_value=Mock())
+def test_validate_user_module_transform_fn_batch_predict_fn_error(find_spec, import_module):
+    user_module = UserModuleMock(input_fn=None, predict_fn=None, output_fn=None)
+    user_module.batch_predict_fn = Mock()
+    import_module.return_value = user_module
+
+    with pytest.raises(ValueError) as e:
+        transformer = Transformer()
+        transformer._environment = Mock()
+        transformer._validate_user_module_and_set_functions()
+
+    assert "Cannot use transform_fn implementation in conjunction with batch_predict_fn" in str(
+        e.value
+    )
+
+
+@pytest.mark.parametrize(
+    "user_functions",
+    [
+        {"predict_fn": Mock()},
+        {"transform_fn": Mock()},
+        {"batch_predict_fn": Mock()},
+        {"batch_transform_fn": Mock()},
+    ],
+)
+@patch("importlib.import_module")
+@patch("sagemaker_inference.transformer.find_spec", return_value=Mock())
+def test_validate_user_module_and_set_functions_user_prediction(find_spec, import_module, user_functions):
+    user_module = Mock(spec=["model_fn"] + list(user_functions), **user_functions)
+    import_module.return_value = user_module
+    default_inference_handler = Mock()
+
+    transformer = Transformer(default_inference_handler)
+    transformer._environment = Mock()
+    transformer._validate_user_module_and_set_functions()
+
+    assert transformer._post_model_fn is None
+    assert transformer._model_fn == user_module.model_fn
+
+
+@patch("importlib.import_module")
+@patch("sagemaker_inference.transformer.find_spec", return_value=Mock())
+def test_validate_user_module_and_set_functions_post_model_fn(find_spec, import_module):
+    user_module = UserModuleMock(transform_fn=None)
+    user_module.post_model_fn = Mock()
+    import_module.return_value = user_module
+
+    transformer = Transformer()
+    transformer._environment = Mock()
+    transformer._validate_user_module_and_set_functions()
+
+    assert transformer._post_model_fn == user_module.post_model_fn
+
+
+@patch("importlib.import_module")
+@patch("sagemaker_inference.transformer.find_spec", return_value=Mock())
+def test_validate_user_module_and_set_functions_optimize_model_fn(find_spec, import_module):
+    user_module = UserModuleMock(transform_fn=None)
+    user_module.optimize_model_fn = Mock()
+    import_module.return_value = user_module
+
+    transformer = Transformer()
+    transformer._environment = Mock()
+    transformer._validate_user_module_and_set_functions()
+
+    assert transformer._optimize_model_fn == user_module.optimize_model_fn
+
+
+@patch("importlib.import_module")
+@patch("sagemaker_inference.transformer.find_spec", return_value=Mock())
+def test_validate_user_module_and_set_functions_predict_context(find_spec, import_module):
+    calls = []
+
+    @contextmanager
+    def default_user_predict_context():
+        calls.append("enter")
+        yield
+        calls.append("exit")
+
+    def predict_fn(data, model, context):
+        calls.append("predict")
+        return data
+
+    user_module = UserModuleMock(transform_fn=None)
+    user_module.predict_fn = predict_fn
+    import_module.return_value = user_module
+
+    transformer = Transformer()
+    transformer._environment = Mock()
+    transformer._default_inference_handler.default_user_predict_context = default_user_predict_context
+    transformer._validate_user_module_and_set_functions()
+    transformer._context = Mock()
+
+    assert len(signature(transformer._predict_fn).parameters) == 3
+    assert transformer._run_handler_function(transformer._predict_fn, "data", "model") == "data"
+    assert calls == ["enter", "predict", "exit"]
+
+
+@patch("importlib.import_module")
+@patch("sagemaker_inference.transformer.find_spec", return_value=Mock())
+def test_validate_user_module_and_set_functions_predict_context_streaming(find_spec, import_module):
+    calls = []
+
+    @contextmanager
+    def default_user_predict_context():
+        calls.append("enter")
+        yield
+        calls.append("exit")
+
+    def predict_fn(data, model):
+        for chunk in data:
+            calls.append(chunk)
+            yield chunk
+
+    user_module = UserModuleMock(transform_fn=None)
+    user_module.predict_fn = predict_fn
+    import_module.return_value = user_module
+
+    transformer = Transformer()
+    transformer._environment = Mock()
+    transformer._default_inference_handler.default_user_predict_context = default_user_predict_context
+    transformer._validate_user_module_and_set_functions()
+
+    chunks = transformer._run_handler_function(transformer._predict_fn, "ab", "model")
+    assert calls == ["enter", "exit"]
+    assert list(chunks) == ["a", "b"]
+    assert calls == ["enter", "exit", "enter", "a", "exit", "enter", "b", "exit", "enter", "exit"]
+
+
 def _assert_value_error_raised():
     with pytest.raises(ValueError) as e:
         transformer = Transformer()
@@ -510,6 +1197,61 @@ def test_default_transform_fn(run_handle_function):
     assert result == PROCESSED_RESULT
 
 
+def test_default_batch_transform_fn():
+    transformer = Transformer()
+    transformer._context = Mock()
+
+    transformer._input_fn = Mock(side_effect=lambda input_data, content_type: input_data + "_in")
+    transformer._batch_predict_fn = Mock(side_effect=lambda data, model: [d + "_pred" for d in data])
+    transformer._output_fn = Mock(side_effect=lambda prediction, accept: (prediction, accept))
+
+    result = transformer._default_batch_transform_fn(
+        MODEL, ["a", "b"], [CONTENT_TYPE, CONTENT_TYPE], [ACCEPT, DEFAULT_ACCEPT]
+    )
+
+    transformer._batch_predict_fn.assert_called_once_with(["a_in", "b_in"], MODEL)
+    assert result == [("a_in_pred", ACCEPT), ("b_in_pred", DEFAULT_ACCEPT)]
+
+
+def test_default_batch_transform_fn_per_request_error():
+    transformer = Transformer()
+    transformer._context = Mock()
+
+    def input_fn(input_data, content_type):
+        if input_data == "bad":
+            raise ValueError("bad input")
+        return input_data
+
+    transformer._input_fn = input_fn
+    transformer._batch_predict_fn = Mock(side_effect=lambda data, model: data)
+    transformer._output_fn = Mock(side_effect=lambda prediction, accept: prediction)
+
+    result = transformer._default_batch_transform_fn(
+        MODEL, ["a", "bad", "b"], [CONTENT_TYPE] * 3, [ACCEPT] * 3
+    )
+
+    transformer._batch_predict_fn.assert_called_once_with(["a", "b"], MODEL)
+    assert result[0] == "a"
+    assert isinstance(result[1], ValueError)
+    assert result[2] == "b"
+
+
+def test_default_batch_transform_fn_predict_error():
+    transformer = Transformer()
+    transformer._context = Mock()
+
+    transformer._input_fn = Mock(side_effect=lambda input_data, content_type: input_data)
+    transformer._batch_predict_fn = Mock(side_effect=ValueError("bad batch"))
+    transformer._output_fn = Mock()
+
+    result = transformer._default_batch_transform_fn(
+        MODEL, ["a", "b"], [CONTENT_TYPE] * 2, [ACCEPT] * 2
+    )
+
+    transformer._output_fn.assert_not_called()
+    assert all(isinstance(r, ValueError) for r in result)
+
+
 def dummy_handler_func(a, b):
     return b
 
@@ -538,3 +1280,50 @@ def test_run_handler_function_raise_error():
         transformer._run_handler_function(dummy_handler_func, a, b, c)
 
     assert "dummy_handler_func takes 2 arguments but 3 were given." in str(e.value)
+
+
+@patch("sagemaker_inference.transformer.signature", wraps=signature)
+def test_run_handler_function_caches_signature(mock_signature):
+    arg1 = Mock()
+    arg2 = Mock()
+    context = Mock()
+    transformer = Transformer()
+    transformer._context = context
+
+    for _ in range(3):
+        assert transformer._run_handler_function(dummy_handler_func, arg1) == context
+        assert transformer._run_handler_function(dummy_handler_func, arg1, arg2) == arg2
+
+    assert mock_signature.call_count == 2
+
+
+def test_run_handler_function_uses_current_context():
+    transformer = Transformer()
+    transformer._context = Mock()
+    transformer._run_handler_function(dummy_handler_func, Mock())
+
+    new_context = Mock()
+    transformer._context = new_context
+
+    assert transformer._run_handler_function(dummy_handler_func, Mock()) == new_context
+
+
+@patch("importlib.import_module", return_value=object())
+@patch("sagemaker_inference.transformer.find_spec", return_value=None)
+def test_validate_user_module_and_set_functions_binds_handlers(find_spec, import_module):
+    def input_fn(input_data, content_type):
+        return input_data
+
+    def predict_fn(data, model, context):
+        return data
+
+    default_inference_handler = Mock()
+    default_inference_handler.default_input_fn = input_fn
+    default_inference_handler.default_predict_fn = predict_fn
+
+    transformer = Transformer(default_inference_handler)
+    transformer._environment = Mock()
+    transformer._validate_user_module_and_set_functions()
+
+    assert transformer._handler_dispatch[(input_fn, 2)] is input_fn
+    assert (predict_fn, 2) in transformer._handler_dispatch
@@ -14,6 +14,7 @@ from __future__ import absolute_import
 
 import os
 from mock import patch
+import pytest
 
 from sagemaker_pytorch_serving_container import ts_environment, ts_parameters
 
@@ -38,3 +39,111 @@ def test_ts_env():
     assert ts_env._max_workers == 4
     assert ts_env._response_timeout == 60
     assert ts_env.is_env_set() is True
+
+
+@patch.dict(os.environ, {ts_parameters.MODEL_SERVER_PRELOAD_MODEL: "true"}, clear=True)
+def test_ts_env_preload_model():
+    assert ts_environment.TorchServeEnvironment().preload_model is True
+
+
+@patch.dict(os.environ, {}, clear=True)
+def test_ts_env_preload_model_default():
+    assert ts_environment.TorchServeEnvironment().preload_model is False
+
+
+@patch.dict(
+    os.environ,
+    {
+        ts_parameters.MODEL_SERVER_AUTO_TUNE_THREADS: "true",
+        ts_parameters.MODEL_SERVER_THREADS_PER_WORKER: "4",
+        ts_parameters.MODEL_SERVER_INTRA_OP_THREADS: "8",
+        ts_parameters.MODEL_SERVER_INTER_OP_THREADS: "1",
+    },
+    clear=True,
+)
+def test_ts_env_threads():
+    ts_env = ts_environment.TorchServeEnvironment()
+
+    assert ts_env.auto_tune_threads is True
+    assert ts_env.threads_per_worker == 4
+    assert ts_env.intra_op_threads == 8
+    assert ts_env.inter_op_threads == 1
+
+
+@patch.dict(os.environ, {}, clear=True)
+def test_ts_env_threads_default():
+    ts_env = ts_environment.TorchServeEnvironment()
+
+    assert ts_env.auto_tune_threads is False
+    assert ts_env.threads_per_worker is None
+    assert ts_env.intra_op_threads is None
+    assert ts_env.inter_op_threads is None
+
+
+@patch.dict(
+    os.environ, {ts_parameters.MODEL_SERVER_PIN_CORES: "true", "SAGEMAKER_MODEL_SERVER_WORKERS": "3"}, clear=True
+)
+def test_ts_env_pin_cores():
+    ts_env = ts_environment.TorchServeEnvironment()
+
+    assert ts_env.pin_cores is True
+    assert ts_env.configured_workers == 3
+
+
+@patch.dict(os.environ, {ts_parameters.MODEL_SERVER_MAX_WORKERS: "4"}, clear=True)
+def test_ts_env_configured_max_workers():
+    ts_env = ts_environment.TorchServeEnvironment()
+
+    assert ts_env.pin_cores is False
+    assert ts_env.configured_workers == 4
+
+
+@patch.dict(os.environ, {}, clear=True)
+def test_ts_env_configured_workers_default():
+    assert ts_environment.TorchServeEnvironment().configured_workers is None
+
+
+@pytest.mark.parametrize(
+    "environ, model_workers",
+    [
+        ({}, None),
+        ({"SAGEMAKER_MODEL_SERVER_WORKERS": "2"}, (2, 2)),
+        ({ts_parameters.MODEL_SERVER_BATCH_SIZE: "4"}, (1, 1)),
+        ({ts_parameters.MODEL_SERVER_BATCH_SIZE: "4", "SAGEMAKER_MODEL_SERVER_WORKERS": "2"}, (2, 2)),
+        ({ts_parameters.MODEL_SERVER_MAX_WORKERS: "4", "SAGEMAKER_MODEL_SERVER_WORKERS": "2"}, (2, 4)),
+        ({ts_parameters.MODEL_SERVER_MAX_WORKERS: "4", "SAGEMAKER_MODEL_SERVER_WORKERS": "8"}, (4, 4)),
+        ({ts_parameters.MODEL_SERVER_MIN_WORKERS: "3", "SAGEMAKER_MODEL_SERVER_WORKERS": "2"}, (3, 3)),
+    ],
+)
+def test_ts_env_model_workers(environ, model_workers):
+    with patch.dict(os.environ, environ, clear=True):
+        assert ts_environment.TorchServeEnvironment().model_workers == model_workers
+
+
+@patch.dict(
+    os.environ,
+    {
+        ts_parameters.MODEL_SERVER_ADAPTIVE_BATCHING: "true",
+        ts_parameters.MODEL_SERVER_LATENCY_SLO: "50",
+        ts_parameters.MODEL_SERVER_MAX_ADAPTIVE_BATCH_SIZE: "16",
+        ts_parameters.MODEL_SERVER_ADAPTIVE_BATCHING_INTERVAL: "300",
+    },
+    clear=True,
+)
+def test_ts_env_adaptive_batching():
+    ts_env = ts_environment.TorchServeEnvironment()
+
+    assert ts_env.adaptive_batching is True
+    assert ts_env.latency_slo == 50
+    assert ts_env.max_adaptive_batch_size == 16
+    assert ts_env.adaptive_batching_interval == 300
+
+
+@patch.dict(os.environ, {}, clear=True)
+def test_ts_env_adaptive_batching_default():
+    ts_env = ts_environment.TorchServeEnvironment()
+
+    assert ts_env.adaptive_batching is False
+    assert ts_env.latency_slo == ts_environment.DEFAULT_TS_LATENCY_SLO
+    assert ts_env.max_adaptive_batch_size == ts_environment.DEFAULT_TS_MAX_ADAPTIVE_BATCH_SIZE
+    assert ts_env.adaptive_batching_interval == ts_environment.DEFAULT_TS_ADAPTIVE_BATCHING_INTERVAL
@@ -12,10 +12,13 @@
 # language governing permissions and limitations under the License.
 from __future__ import absolute_import
 
+from contextlib import contextmanager
+
 from mock import Mock, mock_open, patch
 import pytest
 
 from sagemaker_inference.utils import (
+    generate_in_context,
     parse_accept,
     read_file,
     remove_crlf,
@@ -102,3 +105,24 @@ def test_remove_crlf():
     sanitized_string = "test:  string"
 
     assert sanitized_string == remove_crlf(illegal_string)
+
+
+def test_generate_in_context():
+    calls = []
+
+    @contextmanager
+    def context():
+        calls.append("enter")
+        yield
+        calls.append("exit")
+
+    def chunks():
+        for chunk in ("first", "second"):
+            calls.append(chunk)
+            yield chunk
+
+    generator = generate_in_context(chunks(), context)
+    assert calls == []
+
+    assert list(generator) == ["first", "second"]
+    assert calls == ["enter", "first", "exit", "enter", "second", "exit", "enter", "exit"]